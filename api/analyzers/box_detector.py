@@ -7,10 +7,12 @@ using more advanced techniques than simple range checks.
 
 import numpy as np
 import pandas as pd
-from typing import Dict, Any, Tuple, List, Optional
+from typing import Dict, Any, Tuple, List, Optional, Iterable
 from scipy.signal import argrelextrema
 from scipy.stats import linregress
 
+from .feature_engine import WindowFeatureEngine, get_feature_engine
+
 
 def detect_local_extrema(prices: np.ndarray, order: int = 5) -> Tuple[np.ndarray, np.ndarray]:
     """
@@ -33,7 +35,8 @@ def detect_local_extrema(prices: np.ndarray, order: int = 5) -> Tuple[np.ndarray
 
 
 def identify_support_resistance(df: pd.DataFrame, window: int,
-                                extrema_order: int = 5) -> Dict[str, Any]:
+                                extrema_order: int = 5,
+                                feature_engine: Optional[WindowFeatureEngine] = None) -> Dict[str, Any]:
     """
     Identify support and resistance levels in the given window.
 
@@ -41,6 +44,7 @@ def identify_support_resistance(df: pd.DataFrame, window: int,
         df: DataFrame with price data
         window: Window size to analyze
         extrema_order: Order parameter for extrema detection
+        feature_engine: Optional feature engine shared across windows and analyzers
 
     Returns:
         Dict with support and resistance information
@@ -55,16 +59,18 @@ def identify_support_resistance(df: pd.DataFrame, window: int,
             "is_box_pattern": False
         }
 
-    # Get recent data for the window
-    recent_df = df.iloc[-window:].copy()
-
-    # Get high and low prices
-    highs = recent_df['high'].values
-    lows = recent_df['low'].values
+    # Get high, low and close prices of the window
+    engine = get_feature_engine(df, feature_engine)
+    arrays = engine.window_arrays(window)
+    highs = arrays['high']
+    lows = arrays['low']
+    closes = arrays['close']
+    box_features = engine.box_features(window)
 
-    # Find local maxima and minima
-    high_maxima, _ = detect_local_extrema(highs, order=extrema_order)
-    _, low_minima = detect_local_extrema(lows, order=extrema_order)
+    # Find local maxima and minima (shared with the other windows of the engine)
+    extrema = engine.window_extrema(window, extrema_order)
+    high_maxima = extrema['high_maxima']
+    low_minima = extrema['low_minima']
 
     # Extract the price values at these points
     resistance_points = highs[high_maxima] if len(high_maxima) > 0 else []
@@ -93,16 +99,21 @@ def identify_support_resistance(df: pd.DataFrame, window: int,
             box_height_pct = (main_resistance - main_support) / main_support
 
             # Check if price is contained within the box for most of the window
-            prices_in_box = ((recent_df['close'] >= main_support * 0.98) &
-                             (recent_df['close'] <= main_resistance * 1.02)).mean()
+            prices_in_box = ((closes >= main_support * 0.98) &
+                             (closes <= main_resistance * 1.02)).mean()
 
             # Calculate linear regression of closing prices to check for horizontal trend
-            x = np.arange(len(recent_df))
-            y = recent_df['close'].values
-            slope, _, r_value, _, _ = linregress(x, y)
+            if box_features is not None:
+                slope = box_features['close_slope']
+                avg_price = box_features['close_mean']
+            else:
+                # Windows with missing prices keep the pandas computation
+                recent_close = df['close'].iloc[-window:]
+                x = np.arange(len(recent_close))
+                slope, _, r_value, _, _ = linregress(x, recent_close.values)
+                avg_price = recent_close.mean()
 
             # Normalize slope by average price
-            avg_price = recent_df['close'].mean()
             norm_slope = abs(slope) / avg_price
 
             # Calculate box quality score (higher is better)
@@ -155,6 +166,11 @@ def cluster_price_levels(price_points: np.ndarray, tolerance: float = 0.02) -> n
     """
     Cluster close price levels together.
 
+    Points are sorted and grouped greedily: a cluster starts at its lowest
+    point and takes every following point within `tolerance` of it. Cluster
+    boundaries are found with a binary search per cluster instead of a
+    comparison per point.
+
     Args:
         price_points: Array of price points
         tolerance: Relative tolerance for clustering (as percentage)
@@ -166,37 +182,37 @@ def cluster_price_levels(price_points: np.ndarray, tolerance: float = 0.02) -> n
         return np.array([])
 
     # Sort price points
-    sorted_points = np.sort(price_points)
-
-    # Initialize clusters
-    clusters = []
-    current_cluster = [sorted_points[0]]
-
-    # Cluster points
-    for i in range(1, len(sorted_points)):
-        # Calculate relative difference
-        relative_diff = abs(
-            sorted_points[i] - current_cluster[0]) / current_cluster[0]
-
-        if relative_diff <= tolerance:
-            # Add to current cluster
-            current_cluster.append(sorted_points[i])
-        else:
-            # Start a new cluster
-            clusters.append(current_cluster)
-            current_cluster = [sorted_points[i]]
-
-    # Add the last cluster
-    clusters.append(current_cluster)
-
-    # Calculate average price for each cluster and count points
-    cluster_info = [(np.mean(cluster), len(cluster)) for cluster in clusters]
-
-    # Sort clusters by strength (number of points) in descending order
-    sorted_clusters = sorted(cluster_info, key=lambda x: x[1], reverse=True)
+    sorted_points = np.sort(np.asarray(price_points, dtype=float))
+    n = len(sorted_points)
+
+    # Find where each cluster starts
+    starts = []
+    start = 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        while start < n:
+            starts.append(start)
+            anchor = sorted_points[start]
+            # Binary search on the absolute bound, then settle the rounding at
+            # the boundary with the relative difference itself
+            end = max(start + 1, int(np.searchsorted(sorted_points, anchor + anchor * tolerance, side='right')))
+            while end < n and abs(sorted_points[end] - anchor) / anchor <= tolerance:
+                end += 1
+            while end > start + 1 and not abs(sorted_points[end - 1] - anchor) / anchor <= tolerance:
+                end -= 1
+            start = end
+
+    # Calculate average price for each cluster and count points; np.mean of
+    # each slice keeps the pairwise summation (and rounding) of the cluster means
+    ends = starts[1:] + [n]
+    counts = np.array(ends) - np.array(starts)
+    means = np.array([sorted_points[a:b].mean() for a, b in zip(starts, ends)])
+
+    # Sort clusters by strength (number of points) in descending order; the
+    # stable sort keeps equally strong clusters in price order
+    order = np.argsort(-counts, kind='stable')
 
     # Return just the price levels
-    return np.array([price for price, _ in sorted_clusters])
+    return means[order]
 
 
 def calculate_level_strength(prices: np.ndarray, levels: np.ndarray,
@@ -219,31 +235,48 @@ def calculate_level_strength(prices: np.ndarray, levels: np.ndarray,
     main_level = levels[0]
 
     # Count how many times prices come close to the level
-    touches = 0
-    for price in prices:
-        relative_diff = abs(price - main_level) / main_level
-        if relative_diff <= tolerance:
-            touches += 1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        touches = np.abs(np.asarray(prices, dtype=float) - main_level) / main_level <= tolerance
+    return int(np.count_nonzero(touches))
 
-    return touches
 
-
-def analyze_box_pattern(df: pd.DataFrame, window: int) -> Dict[str, Any]:
+def analyze_box_pattern(df: pd.DataFrame, window: int,
+                        feature_engine: Optional[WindowFeatureEngine] = None) -> Dict[str, Any]:
     """
     Analyze if the stock is forming a box/consolidation pattern.
 
     Args:
         df: DataFrame with price data
         window: Window size to analyze
+        feature_engine: Optional feature engine shared across windows and analyzers
 
     Returns:
         Dict with box pattern analysis results
     """
+    engine = get_feature_engine(df, feature_engine)
+
     # Identify support and resistance
-    sr_analysis = identify_support_resistance(df, window)
+    sr_analysis = identify_support_resistance(df, window, feature_engine=engine)
+
+    box_features = engine.box_features(window) if len(df) >= window else None
+    if box_features is not None:
+        volatility = box_features['volatility']
+        if 'volume' in df.columns:
+            # Check if volume is decreasing or stable
+            is_volume_decreasing = box_features['volume_return_mean'] < 0
+            volume_volatility = box_features['volume_return_std']
+        else:
+            is_volume_decreasing = False
+            volume_volatility = np.nan
+
+        sr_analysis.update({
+            "volatility": round(volatility, 4) if not np.isnan(volatility) else None,
+            "is_volume_decreasing": is_volume_decreasing,
+            "volume_volatility": round(volume_volatility, 4) if not np.isnan(volume_volatility) else None
+        })
 
-    # Calculate additional box pattern metrics
-    if len(df) >= window:
+    # Windows with missing values keep the pandas computation
+    elif len(df) >= window:
         recent_df = df.iloc[-window:].copy()
 
         # Calculate price volatility within the box
@@ -271,9 +304,28 @@ def analyze_box_pattern(df: pd.DataFrame, window: int) -> Dict[str, Any]:
     return sr_analysis
 
 
+def analyze_box_patterns(df: pd.DataFrame, windows: Iterable[int],
+                         feature_engine: Optional[WindowFeatureEngine] = None) -> Dict[int, Dict[str, Any]]:
+    """
+    Analyze box patterns of several windows, detecting the price extrema once.
+
+    Args:
+        df: DataFrame with price data
+        windows: Window sizes to analyze
+        feature_engine: Optional feature engine shared across windows and analyzers
+
+    Returns:
+        Dict mapping each window to its analyze_box_pattern result
+    """
+    windows = list(windows)
+    engine = get_feature_engine(df, feature_engine, windows)
+    return {window: analyze_box_pattern(df, window, engine) for window in windows}
+
+
 def check_box_pattern(df: pd.DataFrame, window: int,
                       box_quality_threshold: float = 0.6,
-                      volatility_threshold: float = 0.09) -> Tuple[bool, Dict[str, Any]]:
+                      volatility_threshold: float = 0.09,
+                      feature_engine: Optional[WindowFeatureEngine] = None) -> Tuple[bool, Dict[str, Any]]:
     """
     Check if a stock is forming a box/consolidation pattern.
 
@@ -282,12 +334,13 @@ def check_box_pattern(df: pd.DataFrame, window: int,
         window: Window size to analyze
         box_quality_threshold: Minimum quality score for a valid box pattern
         volatility_threshold: Maximum allowed volatility
+        feature_engine: Optional feature engine shared across windows and analyzers
 
     Returns:
         Tuple of (is_box_pattern, details)
     """
     # Analyze box pattern
-    analysis = analyze_box_pattern(df, window)
+    analysis = analyze_box_pattern(df, window, feature_engine)
 
     # Check if it's a valid box pattern
     is_box = (
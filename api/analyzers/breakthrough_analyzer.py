@@ -5,38 +5,59 @@ import pandas as pd
 import numpy as np
 from typing import Dict, Any, List, Optional, Tuple
 
-from .technical_indicators import (
-    calculate_all_indicators,
-    calculate_macd,
-    calculate_rsi,
-    calculate_kdj,
-    calculate_bollinger_bands
-)
+from .indicator_engine import IndicatorFrame, INDICATOR_COLUMNS, compute_indicators
 
+# Indicator required by each breakthrough check
+CHECK_INDICATORS = {
+    "MACD": 'macd',
+    "RSI": 'rsi',
+    "KDJ": 'kdj',
+    "布林带": 'bollinger',
+}
 
-def check_macd_signal(df: pd.DataFrame, lookback_period: int = 5) -> Tuple[bool, Dict[str, Any]]:
+
+def _indicator_arrays(df: pd.DataFrame,
+                      indicators: Optional[IndicatorFrame],
+                      name: str) -> Dict[str, np.ndarray]:
+    """
+    Get the columns of an indicator: from the shared IndicatorFrame, from
+    columns the frame already has, or computed for this check alone.
+    """
+    columns = INDICATOR_COLUMNS[name]
+    if indicators is None or not all(column in indicators for column in columns):
+        if all(column in df.columns for column in columns):
+            return {column: pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=float)
+                    for column in columns}
+        indicators = compute_indicators(df, [name])
+    return {column: indicators[column] for column in columns}
+
+
+def _last_change(values: np.ndarray) -> float:
+    """Equivalent of Series.diff().iloc[-1]."""
+    return values[-1] - values[-2]
+
+
+def check_macd_signal(df: pd.DataFrame, lookback_period: int = 5,
+                      indicators: Optional[IndicatorFrame] = None) -> Tuple[bool, Dict[str, Any]]:
     """
     Check for MACD breakthrough signals.
 
     Args:
         df: DataFrame containing price and indicator data
         lookback_period: Period to look back for signal confirmation
+        indicators: Indicators shared between checks (computed if not given)
 
     Returns:
         Tuple of (has_signal, details)
     """
-    if 'macd' not in df.columns or 'macd_signal' not in df.columns:
-        df = calculate_macd(df)
-
     if len(df) < lookback_period + 2:
         return False, {"status": "数据不足", "indicator": "MACD"}
 
     # Get recent data
-    recent_df = df.iloc[-lookback_period-2:].copy()
-
-    # Check for MACD crossover (MACD line crosses above signal line)
-    macd_values = recent_df['macd'].values
-    signal_values = recent_df['macd_signal'].values
+    values = _indicator_arrays(df, indicators, 'macd')
+    macd_values = values['macd'][-lookback_period-2:]
+    signal_values = values['macd_signal'][-lookback_period-2:]
+    hist_values = values['macd_hist'][-lookback_period-2:]
 
     # Check if MACD was below signal line and now crossed above
     crossover = False
@@ -46,10 +67,10 @@ def check_macd_signal(df: pd.DataFrame, lookback_period: int = 5) -> Tuple[bool,
             break
 
     # Check if MACD is increasing
-    macd_increasing = recent_df['macd'].diff().iloc[-1] > 0
+    macd_increasing = _last_change(macd_values) > 0
 
     # Check if histogram is increasing
-    hist_increasing = recent_df['macd_hist'].diff().iloc[-1] > 0
+    hist_increasing = _last_change(hist_values) > 0
 
     # Determine if there's a breakthrough signal
     has_signal = crossover or (macd_increasing and hist_increasing)
@@ -61,15 +82,16 @@ def check_macd_signal(df: pd.DataFrame, lookback_period: int = 5) -> Tuple[bool,
         "crossover": crossover,
         "macd_increasing": macd_increasing,
         "histogram_increasing": hist_increasing,
-        "current_macd": round(float(recent_df['macd'].iloc[-1]), 4),
-        "current_signal": round(float(recent_df['macd_signal'].iloc[-1]), 4),
-        "current_histogram": round(float(recent_df['macd_hist'].iloc[-1]), 4)
+        "current_macd": round(float(macd_values[-1]), 4),
+        "current_signal": round(float(signal_values[-1]), 4),
+        "current_histogram": round(float(hist_values[-1]), 4)
     }
 
     return has_signal, details
 
 
-def check_rsi_signal(df: pd.DataFrame, oversold_threshold: float = 30, overbought_threshold: float = 70) -> Tuple[bool, Dict[str, Any]]:
+def check_rsi_signal(df: pd.DataFrame, oversold_threshold: float = 30, overbought_threshold: float = 70,
+                     indicators: Optional[IndicatorFrame] = None) -> Tuple[bool, Dict[str, Any]]:
     """
     Check for RSI breakthrough signals.
 
@@ -77,22 +99,18 @@ def check_rsi_signal(df: pd.DataFrame, oversold_threshold: float = 30, overbough
         df: DataFrame containing price and indicator data
         oversold_threshold: Threshold for oversold condition
         overbought_threshold: Threshold for overbought condition
+        indicators: Indicators shared between checks (computed if not given)
 
     Returns:
         Tuple of (has_signal, details)
     """
-    if 'rsi' not in df.columns:
-        df = calculate_rsi(df)
-
     if len(df) < 5:
         return False, {"status": "数据不足", "indicator": "RSI"}
 
-    # Get recent data
-    recent_df = df.iloc[-5:].copy()
-
     # Get current RSI and previous RSI
-    current_rsi = recent_df['rsi'].iloc[-1]
-    prev_rsi = recent_df['rsi'].iloc[-2]
+    rsi_values = _indicator_arrays(df, indicators, 'rsi')['rsi']
+    current_rsi = rsi_values[-1]
+    prev_rsi = rsi_values[-2]
 
     # Check for oversold to normal transition (potential bullish signal)
     oversold_to_normal = (prev_rsi < oversold_threshold) and (
@@ -117,31 +135,33 @@ def check_rsi_signal(df: pd.DataFrame, oversold_threshold: float = 30, overbough
     return has_signal, details
 
 
-def check_kdj_signal(df: pd.DataFrame) -> Tuple[bool, Dict[str, Any]]:
+def check_kdj_signal(df: pd.DataFrame,
+                     indicators: Optional[IndicatorFrame] = None) -> Tuple[bool, Dict[str, Any]]:
     """
     Check for KDJ breakthrough signals.
 
     Args:
         df: DataFrame containing price and indicator data
+        indicators: Indicators shared between checks (computed if not given)
 
     Returns:
         Tuple of (has_signal, details)
     """
-    if not all(col in df.columns for col in ['k', 'd', 'j']):
-        if all(col in df.columns for col in ['high', 'low', 'close']):
-            df = calculate_kdj(df)
-        else:
+    if not all(col in df.columns for col in ['k', 'd', 'j']) and \
+            not (indicators is not None and 'k' in indicators):
+        if not all(col in df.columns for col in ['high', 'low', 'close']):
             return False, {"status": "数据不足", "indicator": "KDJ"}
 
     if len(df) < 5:
         return False, {"status": "数据不足", "indicator": "KDJ"}
 
     # Get recent data
-    recent_df = df.iloc[-5:].copy()
+    values = _indicator_arrays(df, indicators, 'kdj')
 
     # Check for golden cross (K line crosses above D line)
-    k_values = recent_df['k'].values
-    d_values = recent_df['d'].values
+    k_values = values['k'][-5:]
+    d_values = values['d'][-5:]
+    j_values = values['j'][-5:]
 
     # Check if K was below D and now crossed above
     golden_cross = False
@@ -151,8 +171,8 @@ def check_kdj_signal(df: pd.DataFrame) -> Tuple[bool, Dict[str, Any]]:
             break
 
     # Check if K and J are both increasing
-    k_increasing = recent_df['k'].diff().iloc[-1] > 0
-    j_increasing = recent_df['j'].diff().iloc[-1] > 0
+    k_increasing = _last_change(k_values) > 0
+    j_increasing = _last_change(j_values) > 0
 
     # Determine if there's a breakthrough signal
     has_signal = golden_cross or (k_increasing and j_increasing)
@@ -164,43 +184,45 @@ def check_kdj_signal(df: pd.DataFrame) -> Tuple[bool, Dict[str, Any]]:
         "golden_cross": golden_cross,
         "k_increasing": k_increasing,
         "j_increasing": j_increasing,
-        "current_k": round(float(recent_df['k'].iloc[-1]), 2),
-        "current_d": round(float(recent_df['d'].iloc[-1]), 2),
-        "current_j": round(float(recent_df['j'].iloc[-1]), 2)
+        "current_k": round(float(k_values[-1]), 2),
+        "current_d": round(float(d_values[-1]), 2),
+        "current_j": round(float(j_values[-1]), 2)
     }
 
     return has_signal, details
 
 
-def check_bollinger_bands_signal(df: pd.DataFrame) -> Tuple[bool, Dict[str, Any]]:
+def check_bollinger_bands_signal(df: pd.DataFrame,
+                                 indicators: Optional[IndicatorFrame] = None) -> Tuple[bool, Dict[str, Any]]:
     """
     Check for Bollinger Bands breakthrough signals.
 
     Args:
         df: DataFrame containing price and indicator data
+        indicators: Indicators shared between checks (computed if not given)
 
     Returns:
         Tuple of (has_signal, details)
     """
-    if not all(col in df.columns for col in ['bb_upper', 'bb_middle', 'bb_lower', 'bb_bandwidth']):
-        df = calculate_bollinger_bands(df)
-
     if len(df) < 5:
         return False, {"status": "数据不足", "indicator": "布林带"}
 
     # Get recent data
-    recent_df = df.iloc[-5:].copy()
+    values = _indicator_arrays(df, indicators, 'bollinger')
+    close = pd.to_numeric(df['close'].iloc[-2:], errors='coerce').to_numpy(dtype=float)
+    upper = values['bb_upper'][-1]
+    middle = values['bb_middle'][-1]
+    bandwidth = values['bb_bandwidth'][-2:]
 
     # Check if price is near upper band
-    close_to_upper = recent_df['close'].iloc[-1] > (recent_df['bb_middle'].iloc[-1] + 0.5 * (
-        recent_df['bb_upper'].iloc[-1] - recent_df['bb_middle'].iloc[-1]))
+    close_to_upper = close[-1] > (middle + 0.5 * (upper - middle))
 
     # Check if bandwidth is expanding (volatility increasing)
-    bandwidth_expanding = recent_df['bb_bandwidth'].diff().iloc[-1] > 0
+    bandwidth_expanding = _last_change(bandwidth) > 0
 
     # Check if price is above middle band and increasing
-    above_middle = recent_df['close'].iloc[-1] > recent_df['bb_middle'].iloc[-1]
-    price_increasing = recent_df['close'].diff().iloc[-1] > 0
+    above_middle = close[-1] > middle
+    price_increasing = _last_change(close) > 0
 
     # Determine if there's a breakthrough signal
     has_signal = (close_to_upper and bandwidth_expanding) or (
@@ -214,19 +236,24 @@ def check_bollinger_bands_signal(df: pd.DataFrame) -> Tuple[bool, Dict[str, Any]
         "bandwidth_expanding": bandwidth_expanding,
         "above_middle": above_middle,
         "price_increasing": price_increasing,
-        "current_bandwidth": round(float(recent_df['bb_bandwidth'].iloc[-1]), 4),
-        "bandwidth_change": round(float(recent_df['bb_bandwidth'].diff().iloc[-1]), 4)
+        "current_bandwidth": round(float(bandwidth[-1]), 4),
+        "bandwidth_change": round(float(_last_change(bandwidth)), 4)
     }
 
     return has_signal, details
 
 
-def analyze_breakthrough(df: pd.DataFrame) -> Dict[str, Any]:
+def analyze_breakthrough(df: pd.DataFrame,
+                         checks: Optional[List[str]] = None,
+                         indicators: Optional[IndicatorFrame] = None) -> Dict[str, Any]:
     """
     Analyze potential breakthrough patterns using multiple technical indicators.
 
     Args:
         df: DataFrame containing price data
+        checks: Indicator checks to run, keys of CHECK_INDICATORS (default: all);
+            only the indicators these checks need are computed
+        indicators: Precomputed indicators to share (computed if not given)
 
     Returns:
         Dict containing breakthrough analysis results
@@ -239,21 +266,34 @@ def analyze_breakthrough(df: pd.DataFrame) -> Dict[str, Any]:
             "status": "无数据"
         }
 
-    # Calculate all indicators
-    df_with_indicators = calculate_all_indicators(df)
+    checks = list(CHECK_INDICATORS) if checks is None else checks
+    has_high_low = all(col in df.columns for col in ['high', 'low'])
+
+    # Calculate the indicators of the enabled checks once, shared by all checks
+    if indicators is None:
+        required = [CHECK_INDICATORS[check] for check in checks
+                    if check != "KDJ" or has_high_low]
+        indicators = compute_indicators(df, required)
+
+    disabled = (False, {"status": "未启用"})
 
     # Check for signals from different indicators
-    macd_signal, macd_details = check_macd_signal(df_with_indicators)
-    rsi_signal, rsi_details = check_rsi_signal(df_with_indicators)
+    macd_signal, macd_details = check_macd_signal(df, indicators=indicators) \
+        if "MACD" in checks else disabled
+    rsi_signal, rsi_details = check_rsi_signal(df, indicators=indicators) \
+        if "RSI" in checks else disabled
 
     # Check KDJ only if high/low data is available
-    if all(col in df.columns for col in ['high', 'low']):
-        kdj_signal, kdj_details = check_kdj_signal(df_with_indicators)
+    if "KDJ" not in checks:
+        kdj_signal, kdj_details = disabled
+    elif has_high_low:
+        kdj_signal, kdj_details = check_kdj_signal(df, indicators=indicators)
     else:
         kdj_signal, kdj_details = False, {
             "status": "无高低价数据", "indicator": "KDJ"}
 
-    bb_signal, bb_details = check_bollinger_bands_signal(df_with_indicators)
+    bb_signal, bb_details = check_bollinger_bands_signal(df, indicators=indicators) \
+        if "布林带" in checks else disabled
 
     # Count positive signals
     signals = {
@@ -3,7 +3,7 @@ Combined Analyzer module for comprehensive stock analysis.
 """
 import pandas as pd
 import math
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 
 from .price_analyzer import analyze_price
 from .volume_analyzer import analyze_volume
@@ -12,6 +12,7 @@ from .window_weight_analyzer import apply_window_weights
 from .enhanced_platform_analyzer import analyze_enhanced_platform, check_enhanced_platform
 from .box_detector import analyze_box_pattern, check_box_pattern
 from .decline_analyzer import analyze_decline_speed, check_decline_pattern
+from .feature_engine import WindowFeatureEngine
 
 
 def analyze_stock(df: pd.DataFrame,
@@ -36,7 +37,8 @@ def analyze_stock(df: pd.DataFrame,
                   use_breakthrough_confirmation: bool = False,
                   breakthrough_confirmation_days: int = 1,
                   use_box_detection: bool = True,
-                  box_quality_threshold: float = 0.3) -> Dict[str, Any]:
+                  box_quality_threshold: float = 0.3,
+                  full_detail: bool = True) -> Dict[str, Any]:
     """
     Analyze a stock for platform periods across multiple time windows,
     including price analysis, volume analysis, breakthrough prediction, position analysis,
@@ -66,6 +68,11 @@ def analyze_stock(df: pd.DataFrame,
         breakthrough_confirmation_days: Number of days to look for confirmation
         use_box_detection: Whether to use box pattern detection
         box_quality_threshold: Minimum quality score for a valid box pattern
+        full_detail: Whether to run every analysis for diagnostics. If False,
+            analysis stops at the first failed platform condition, so stocks
+            that are not platform stocks only carry the results of the checks
+            that ran; is_platform and the results of platform stocks are the
+            same either way
 
     Returns:
         Dict containing comprehensive analysis results
@@ -79,19 +86,39 @@ def analyze_stock(df: pd.DataFrame,
             "selection_reasons": {}
         }
 
-    # Check each window
-    platform_windows = []
-    details = {}
-    selection_reasons = {}
-    volume_analysis_results = {}
-    breakthrough_results = {}
+    # Compute price, volume and box features of every window in one pass
+    max_window = max(windows) if windows else 90
+    feature_engine = WindowFeatureEngine(df, list(windows) + [max_window])
+
+    # The conditions of a platform stock are evaluated from the cheapest to the
+    # most expensive: the per-window checks on the shared features, box
+    # detection (extrema and trend lines), then the decline scan. Without full
+    # detail, evaluation stops at the first condition that fails and the
+    # informational analyses (breakthrough prediction and confirmation, window
+    # weights) only run for platform stocks.
+    platform_windows, details, selection_reasons, volume_analysis_results = _analyze_windows(
+        df, windows, box_threshold, ma_diff_threshold, volatility_threshold,
+        volume_change_threshold, volume_stability_threshold, volume_increase_threshold,
+        use_volume_analysis, use_box_detection, box_quality_threshold, feature_engine,
+        full_detail
+    )
+
+    # 基本平台期判断 - 至少有一个窗口满足价格模式和成交量条件
+    is_basic_platform = len(platform_windows) > 0
+    is_candidate = is_basic_platform
+
+    # 箱体检测 - 使用最大窗口进行箱体检测，以获取更稳定的支撑位和阻力位
+    box_analysis = None
+    if use_box_detection and (is_candidate or full_detail):
+        box_analysis = analyze_box_pattern(df, max_window, feature_engine)
+        is_candidate = is_candidate and box_analysis.get("is_box_pattern", False)
 
     # Perform position analysis if requested
     position_result = None
     decline_result = None
     has_decline_pattern = False
 
-    if use_low_position:
+    if use_low_position and (is_candidate or full_detail):
         if use_rapid_decline_detection:
             # Use enhanced decline analysis with rapid decline detection
             has_decline_pattern, decline_result = check_decline_pattern(
@@ -108,6 +135,8 @@ def analyze_stock(df: pd.DataFrame,
                 "is_low_position": decline_result.get("is_low_position", False),
                 "details": decline_result.get("details", {})
             }
+            is_candidate = (is_candidate and position_result["is_low_position"] and
+                            decline_result.get("is_rapid_decline", False))
         else:
             # Use traditional position analysis
             from .position_analyzer import analyze_position
@@ -117,118 +146,35 @@ def analyze_stock(df: pd.DataFrame,
                 decline_period_days,
                 decline_threshold
             )
+            is_candidate = is_candidate and position_result["is_low_position"]
+
+    if is_candidate and use_box_detection and not full_detail:
+        # Windows that failed a cheap check skipped the remaining ones; platform
+        # stocks get the same window details as with full detail
+        for window in windows:
+            if window not in platform_windows:
+                _, details[window] = check_enhanced_platform(
+                    df, window, box_threshold, ma_diff_threshold, volatility_threshold,
+                    volume_change_threshold, volume_stability_threshold,
+                    box_quality_threshold, use_box_detection, feature_engine
+                )
+                if "volume_analysis" in details[window]:
+                    volume_analysis_results[window]["consolidation_details"] = details[window]["volume_analysis"]
 
     # Perform breakthrough prediction if requested
-    if use_breakthrough_prediction:
+    breakthrough_results = {}
+    if use_breakthrough_prediction and (is_candidate or full_detail):
         breakthrough_analysis = analyze_breakthrough(df)
         breakthrough_results = breakthrough_analysis
 
     # Perform breakthrough confirmation if requested
     confirmation_result = None
-    if use_breakthrough_confirmation:
+    if use_breakthrough_confirmation and (is_candidate or full_detail):
         confirmation_result = check_breakthrough_confirmation(
             df,
             breakthrough_confirmation_days
         )
 
-    # Use enhanced platform analysis if box detection is enabled
-    if use_box_detection:
-        # Perform enhanced platform analysis
-        enhanced_result = analyze_enhanced_platform(
-            df,
-            windows,
-            box_threshold,
-            ma_diff_threshold,
-            volatility_threshold,
-            volume_change_threshold,
-            volume_stability_threshold,
-            box_quality_threshold,
-            use_box_detection
-        )
-
-        # Extract platform windows and details
-        platform_windows = enhanced_result["platform_windows"]
-        details = enhanced_result["details"]
-        selection_reasons = enhanced_result["selection_reasons"]
-
-        # Store volume analysis results for later use
-        for window in windows:
-            if window in details and "volume_analysis" in details[window]:
-                volume_analysis_results[window] = {
-                    "has_consolidation_volume": True,  # Assume true if included in platform windows
-                    "has_breakthrough": False,  # Will be updated later if needed
-                    "consolidation_details": details[window]["volume_analysis"],
-                    "breakthrough_details": {"status": "未分析"}
-                }
-    else:
-        # Use traditional analysis method
-        for window in windows:
-            # Price analysis
-            price_analysis = analyze_price(
-                df, window, box_threshold, ma_diff_threshold, volatility_threshold
-            )
-
-            # Volume analysis if requested and volume data is available
-            if use_volume_analysis and 'volume' in df.columns:
-                volume_analysis = analyze_volume(
-                    df, window, volume_change_threshold,
-                    volume_stability_threshold, volume_increase_threshold
-                )
-                volume_analysis_results[window] = volume_analysis
-            else:
-                volume_analysis = {
-                    "has_consolidation_volume": True,  # Default to True if not using volume analysis
-                    "has_breakthrough": False,
-                    "consolidation_details": {"status": "未分析"},
-                    "breakthrough_details": {"status": "未分析"}
-                }
-
-            # Combine price and volume analysis
-            is_price_platform = price_analysis["is_price_platform"]
-            has_consolidation_volume = volume_analysis["has_consolidation_volume"]
-
-            # A stock is in platform period if price forms a platform and volume shows consolidation
-            is_window_platform = is_price_platform
-            if use_volume_analysis:
-                is_window_platform = is_window_platform and has_consolidation_volume
-
-            # Store details
-            details[window] = {
-                "price_analysis": price_analysis["details"],
-                "volume_analysis": volume_analysis["consolidation_details"] if use_volume_analysis else {"status": "未分析"}
-            }
-
-            # Check for breakthrough
-            has_breakthrough = volume_analysis["has_breakthrough"] if use_volume_analysis else False
-            details[window]["breakthrough"] = volume_analysis["breakthrough_details"] if use_volume_analysis else {
-                "status": "未分析"}
-
-            # Add to platform windows if it meets criteria
-            if is_window_platform:
-                platform_windows.append(window)
-
-                # Create selection reason
-                price_details = price_analysis["details"]
-                volume_details = volume_analysis["consolidation_details"] if use_volume_analysis else {
-                    "status": "未分析"}
-
-                reason = f"{window}日平台期: 价格区间{price_details.get('box_range', 'N/A'):.2f}, "
-                reason += f"均线收敛{price_details.get('ma_diff', 'N/A'):.2f}, "
-                reason += f"波动率{price_details.get('volatility', 'N/A'):.2f}"
-
-                if use_volume_analysis:
-                    reason += f", 成交量变化{volume_details.get('volume_change_ratio', 'N/A'):.2f}"
-
-                    # Add breakthrough information if available
-                    if has_breakthrough:
-                        breakthrough_details = volume_analysis["breakthrough_details"]
-                        reason += f", 成交量突破{breakthrough_details.get('volume_increase_ratio', 'N/A'):.2f}倍"
-
-                selection_reasons[window] = reason
-
-    # 基本平台期判断 - 至少有一个窗口满足价格模式和成交量条件
-    is_basic_platform = len(platform_windows) > 0
-
     # 初始化平台期判断结果
     is_platform = is_basic_platform
 
@@ -252,15 +198,14 @@ def analyze_stock(df: pd.DataFrame,
     # 添加箱体检测结果
     box_analysis_results = {}
     if use_box_detection:
-        # 使用最大窗口进行箱体检测，以获取更稳定的支撑位和阻力位
-        max_window = max(windows) if windows else 90
-        box_analysis = analyze_box_pattern(df, max_window)
-        box_analysis_results = box_analysis
-
         # 如果启用了箱体检测，还需要满足箱体条件
-        is_box_pattern = box_analysis.get("is_box_pattern", False)
+        if box_analysis is not None:
+            box_analysis_results = box_analysis
+            is_box_pattern = box_analysis.get("is_box_pattern", False)
+            platform_judgment_log.append(f"箱体检测: {is_box_pattern}")
+        else:
+            is_box_pattern = False
         is_platform = is_platform and is_box_pattern
-        platform_judgment_log.append(f"箱体检测: {is_box_pattern}")
 
     # 记录最终判断结果
     platform_judgment_log.append(f"最终平台期判断: {is_platform}")
@@ -461,7 +406,7 @@ def analyze_stock(df: pd.DataFrame,
                     selection_reasons[window] += f", {confirmation_reason}"
 
     # Apply window weights if requested
-    if use_window_weights and window_weights:
+    if use_window_weights and window_weights and (is_platform or full_detail):
         # Convert window weights to proper format if needed
         if not isinstance(window_weights, dict):
             # Try to convert from string or other formats
@@ -497,3 +442,129 @@ def analyze_stock(df: pd.DataFrame,
                     selection_reasons[window] += f", 加权得分: {weighted_score:.2f}"
 
     return result
+
+
+def _analyze_windows(df: pd.DataFrame,
+                     windows: List[int],
+                     box_threshold: float,
+                     ma_diff_threshold: float,
+                     volatility_threshold: float,
+                     volume_change_threshold: float,
+                     volume_stability_threshold: float,
+                     volume_increase_threshold: float,
+                     use_volume_analysis: bool,
+                     use_box_detection: bool,
+                     box_quality_threshold: float,
+                     feature_engine: WindowFeatureEngine,
+                     full_detail: bool = True) -> Tuple[List[int], Dict, Dict, Dict]:
+    """
+    Check each window for a platform period.
+
+    Returns:
+        Tuple of (platform_windows, details, selection_reasons, volume_analysis_results)
+    """
+    platform_windows = []
+    details = {}
+    selection_reasons = {}
+    volume_analysis_results = {}
+
+    # Use enhanced platform analysis if box detection is enabled
+    if use_box_detection:
+        # Perform enhanced platform analysis
+        enhanced_result = analyze_enhanced_platform(
+            df,
+            windows,
+            box_threshold,
+            ma_diff_threshold,
+            volatility_threshold,
+            volume_change_threshold,
+            volume_stability_threshold,
+            box_quality_threshold,
+            use_box_detection,
+            feature_engine,
+            full_detail
+        )
+
+        # Extract platform windows and details
+        platform_windows = enhanced_result["platform_windows"]
+        details = enhanced_result["details"]
+        selection_reasons = enhanced_result["selection_reasons"]
+
+        # Store volume analysis results for later use
+        for window in windows:
+            if window in details and "volume_analysis" in details[window]:
+                volume_analysis_results[window] = {
+                    "has_consolidation_volume": True,  # Assume true if included in platform windows
+                    "has_breakthrough": False,  # Will be updated later if needed
+                    "consolidation_details": details[window]["volume_analysis"],
+                    "breakthrough_details": {"status": "未分析"}
+                }
+    else:
+        # Use traditional analysis method
+        for window in windows:
+            # Price analysis
+            price_analysis = analyze_price(
+                df, window, box_threshold, ma_diff_threshold, volatility_threshold,
+                feature_engine
+            )
+
+            # Volume analysis if requested and volume data is available
+            if use_volume_analysis and 'volume' in df.columns:
+                volume_analysis = analyze_volume(
+                    df, window, volume_change_threshold,
+                    volume_stability_threshold, volume_increase_threshold,
+                    feature_engine
+                )
+                volume_analysis_results[window] = volume_analysis
+            else:
+                volume_analysis = {
+                    "has_consolidation_volume": True,  # Default to True if not using volume analysis
+                    "has_breakthrough": False,
+                    "consolidation_details": {"status": "未分析"},
+                    "breakthrough_details": {"status": "未分析"}
+                }
+
+            # Combine price and volume analysis
+            is_price_platform = price_analysis["is_price_platform"]
+            has_consolidation_volume = volume_analysis["has_consolidation_volume"]
+
+            # A stock is in platform period if price forms a platform and volume shows consolidation
+            is_window_platform = is_price_platform
+            if use_volume_analysis:
+                is_window_platform = is_window_platform and has_consolidation_volume
+
+            # Store details
+            details[window] = {
+                "price_analysis": price_analysis["details"],
+                "volume_analysis": volume_analysis["consolidation_details"] if use_volume_analysis else {"status": "未分析"}
+            }
+
+            # Check for breakthrough
+            has_breakthrough = volume_analysis["has_breakthrough"] if use_volume_analysis else False
+            details[window]["breakthrough"] = volume_analysis["breakthrough_details"] if use_volume_analysis else {
+                "status": "未分析"}
+
+            # Add to platform windows if it meets criteria
+            if is_window_platform:
+                platform_windows.append(window)
+
+                # Create selection reason
+                price_details = price_analysis["details"]
+                volume_details = volume_analysis["consolidation_details"] if use_volume_analysis else {
+                    "status": "未分析"}
+
+                reason = f"{window}日平台期: 价格区间{price_details.get('box_range', 'N/A'):.2f}, "
+                reason += f"均线收敛{price_details.get('ma_diff', 'N/A'):.2f}, "
+                reason += f"波动率{price_details.get('volatility', 'N/A'):.2f}"
+
+                if use_volume_analysis:
+                    reason += f", 成交量变化{volume_details.get('volume_change_ratio', 'N/A'):.2f}"
+
+                    # Add breakthrough information if available
+                    if has_breakthrough:
+                        breakthrough_details = volume_analysis["breakthrough_details"]
+                        reason += f", 成交量突破{breakthrough_details.get('volume_increase_ratio', 'N/A'):.2f}倍"
+
+                selection_reasons[window] = reason
+
+    return platform_windows, details, selection_reasons, volume_analysis_results
@@ -7,18 +7,77 @@ including decline speed, concentration, and volatility.
 
 import pandas as pd
 import numpy as np
-from typing import Dict, Any, Tuple, List, Optional
+from typing import Dict, Any, Tuple, List, Optional, Iterable
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+def find_rapid_declines(highs: np.ndarray, lows: np.ndarray,
+                        days: Iterable[int]) -> Dict[int, Tuple[float, Optional[int]]]:
+    """
+    Find the sharpest decline within periods of several lengths in one pass.
+
+    The decline of a period is (max(high) - min(low)) / max(high). Maxima and
+    minima of every period length are read from one sparse table of the
+    extrema of power-of-two spans, so each length costs O(n) instead of a
+    slice and a max/min per start day. Missing prices are skipped like
+    pandas' max()/min() do.
+
+    Args:
+        highs: High prices in date order
+        lows: Low prices in date order
+        days: Period lengths in rows
+
+    Returns:
+        Dict mapping each period length to (max_rapid_decline, start position);
+        the first period wins ties, and a length without any positive decline
+        maps to (0, None)
+    """
+    highs = np.asarray(highs, dtype=float)
+    lows = np.asarray(lows, dtype=float)
+    n = len(highs)
+    days = sorted({int(k) for k in days})
+
+    # Level j holds the extrema of the spans [i, i + 2**j)
+    high_levels = [highs]
+    low_levels = [lows]
+    longest = max((k for k in days if k <= n), default=0)
+    while 2 ** len(high_levels) <= longest:
+        span = 2 ** (len(high_levels) - 1)
+        high_levels.append(np.fmax(high_levels[-1][:-span], high_levels[-1][span:]))
+        low_levels.append(np.fmin(low_levels[-1][:-span], low_levels[-1][span:]))
+
+    results = {}
+    for k in days:
+        if k < 1 or k > n:
+            results[k] = (0, None)
+            continue
+        level = k.bit_length() - 1
+        offset = k - 2 ** level
+        count = n - k + 1
+        window_high = np.fmax(high_levels[level][:count], high_levels[level][offset:offset + count])
+        window_low = np.fmin(low_levels[level][:count], low_levels[level][offset:offset + count])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            declines = (window_high - window_low) / window_high
+
+        # argmax returns the first maximum; NaN declines never count
+        declines = np.where(np.isnan(declines), -np.inf, declines)
+        start = int(np.argmax(declines))
+        if declines[start] > 0:
+            results[k] = (declines[start], start)
+        else:
+            results[k] = (0, None)
+    return results
+
+
 def analyze_decline_speed(df: pd.DataFrame,
                           lookback_days: int = 365,
                           decline_period_days: int = 180,
                           decline_threshold: float = 0.3,
                           rapid_decline_days: int = 30,
-                          rapid_decline_threshold: float = 0.15) -> Dict[str, Any]:
+                          rapid_decline_threshold: float = 0.15,
+                          rapid_decline_profile_days: Optional[Iterable[int]] = None) -> Dict[str, Any]:
     """
     Analyze the decline speed and characteristics of a stock.
 
@@ -29,6 +88,9 @@ def analyze_decline_speed(df: pd.DataFrame,
         decline_threshold: Minimum decline percentage from high to be considered at low position
         rapid_decline_days: Number of days to define a rapid decline
         rapid_decline_threshold: Minimum decline percentage within rapid_decline_days to be considered rapid
+        rapid_decline_profile_days: Further rapid decline periods to measure in
+            the same pass, e.g. for parameter sweeps; their maximum declines are
+            returned in details['rapid_decline_profile'] keyed by period length
 
     Returns:
         Dict containing decline analysis results
@@ -99,23 +161,19 @@ def analyze_decline_speed(df: pd.DataFrame,
         daily_decline_rate = decline_percentage / \
             decline_days if decline_days > 0 else 0
 
-        # Check for rapid decline periods
-        rapid_decline_detected = False
-        max_rapid_decline = 0
+        # Scan for the most rapid decline period
+        profile_days = list(rapid_decline_profile_days or [])
+        rapid_declines = find_rapid_declines(
+            after_high_df['high'].to_numpy(dtype=float),
+            after_high_df['low'].to_numpy(dtype=float),
+            [rapid_decline_days] + profile_days
+        )
+        max_rapid_decline, rapid_start = rapid_declines[rapid_decline_days]
         rapid_decline_start_date = None
         rapid_decline_end_date = None
-
-        # Scan for the most rapid decline period
-        for i in range(len(after_high_df) - rapid_decline_days + 1):
-            window = after_high_df.iloc[i:i+rapid_decline_days]
-            window_high = window['high'].max()
-            window_low = window['low'].min()
-            window_decline = (window_high - window_low) / window_high
-
-            if window_decline > max_rapid_decline:
-                max_rapid_decline = window_decline
-                rapid_decline_start_date = window.iloc[0]['date']
-                rapid_decline_end_date = window.iloc[-1]['date']
+        if rapid_start is not None:
+            rapid_decline_start_date = after_high_df['date'].iloc[rapid_start]
+            rapid_decline_end_date = after_high_df['date'].iloc[rapid_start + rapid_decline_days - 1]
 
         # Determine if there was a rapid decline
         is_rapid_decline = max_rapid_decline >= rapid_decline_threshold
@@ -149,6 +207,10 @@ def analyze_decline_speed(df: pd.DataFrame,
                 "decline_period_satisfied": decline_period_satisfied
             }
         }
+        if profile_days:
+            result["details"]["rapid_decline_profile"] = {
+                days: float(rapid_declines[days][0]) for days in profile_days
+            }
 
         return result
 
@@ -12,6 +12,7 @@ from typing import Dict, Any, Tuple, List, Optional
 from .price_analyzer import analyze_price, check_price_pattern
 from .volume_analyzer import analyze_volume
 from .box_detector import check_box_pattern
+from .feature_engine import WindowFeatureEngine, get_feature_engine
 
 
 def check_enhanced_platform(df: pd.DataFrame, window: int,
@@ -20,7 +21,9 @@ def check_enhanced_platform(df: pd.DataFrame, window: int,
                             volume_change_threshold: float = 0.9,
                             volume_stability_threshold: float = 0.75,
                             box_quality_threshold: float = 0.6,
-                            use_box_detection: bool = True) -> Tuple[bool, Dict[str, Any]]:
+                            use_box_detection: bool = True,
+                            feature_engine: Optional[WindowFeatureEngine] = None,
+                            full_detail: bool = True) -> Tuple[bool, Dict[str, Any]]:
     """
     Check if a stock is in a platform consolidation period using enhanced detection.
 
@@ -34,6 +37,9 @@ def check_enhanced_platform(df: pd.DataFrame, window: int,
         volume_stability_threshold: Maximum allowed volume stability
         box_quality_threshold: Minimum quality score for a valid box pattern
         use_box_detection: Whether to use box pattern detection
+        feature_engine: Optional feature engine shared across windows and analyzers
+        full_detail: Whether to run every check; if False, the volume and box
+            checks only run when the checks before them passed
 
     Returns:
         Tuple of (is_platform, details)
@@ -45,18 +51,22 @@ def check_enhanced_platform(df: pd.DataFrame, window: int,
             "data_points": len(df)
         }
 
+    engine = get_feature_engine(df, feature_engine)
+
     # Check traditional platform period
     is_traditional_platform, traditional_details = check_price_pattern(
-        df, window, box_threshold, ma_diff_threshold, volatility_threshold
+        df, window, box_threshold, ma_diff_threshold, volatility_threshold,
+        engine
     )
 
     # Check volume conditions if data available
     volume_details = {}
     is_volume_ok = True
 
-    if 'volume' in df.columns:
+    if 'volume' in df.columns and (is_traditional_platform or full_detail):
         volume_analysis = analyze_volume(
-            df, window, volume_change_threshold, volume_stability_threshold
+            df, window, volume_change_threshold, volume_stability_threshold,
+            feature_engine=engine
         )
         is_volume_ok = volume_analysis.get('has_consolidation_volume', False)
         volume_details = volume_analysis.get('consolidation_details', {})
@@ -65,9 +75,12 @@ def check_enhanced_platform(df: pd.DataFrame, window: int,
     box_details = {}
     is_box = False
 
-    if use_box_detection:
+    # Box detection finds local extrema and fits trend lines, so it is the
+    # most expensive check of a window
+    if use_box_detection and ((is_traditional_platform and is_volume_ok) or full_detail):
         is_box, box_details = check_box_pattern(
-            df, window, box_quality_threshold, volatility_threshold
+            df, window, box_quality_threshold, volatility_threshold,
+            engine
         )
 
     # Combine results
@@ -113,7 +126,9 @@ def analyze_enhanced_platform(df: pd.DataFrame,
                               volume_change_threshold: float = 0.9,
                               volume_stability_threshold: float = 0.75,
                               box_quality_threshold: float = 0.6,
-                              use_box_detection: bool = True) -> Dict[str, Any]:
+                              use_box_detection: bool = True,
+                              feature_engine: Optional[WindowFeatureEngine] = None,
+                              full_detail: bool = True) -> Dict[str, Any]:
     """
     Analyze a stock for platform periods across multiple time windows using enhanced detection.
 
@@ -127,6 +142,9 @@ def analyze_enhanced_platform(df: pd.DataFrame,
         volume_stability_threshold: Maximum allowed volume stability
         box_quality_threshold: Minimum quality score for a valid box pattern
         use_box_detection: Whether to use box pattern detection
+        feature_engine: Optional feature engine shared across windows and analyzers
+        full_detail: Whether to run every check of every window (see
+            check_enhanced_platform)
 
     Returns:
         Dict containing analysis results
@@ -140,6 +158,9 @@ def analyze_enhanced_platform(df: pd.DataFrame,
             "selection_reasons": {}
         }
 
+    # Compute the features of all windows in one pass
+    engine = get_feature_engine(df, feature_engine, windows)
+
     # Check each window
     platform_windows = []
     details = {}
@@ -149,7 +170,7 @@ def analyze_enhanced_platform(df: pd.DataFrame,
         is_platform, window_details = check_enhanced_platform(
             df, window, box_threshold, ma_diff_threshold, volatility_threshold,
             volume_change_threshold, volume_stability_threshold,
-            box_quality_threshold, use_box_detection
+            box_quality_threshold, use_box_detection, engine, full_detail
         )
 
         details[window] = window_details
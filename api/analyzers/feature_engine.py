@@ -0,0 +1,367 @@
+"""
+Window Feature Engine module for computing platform features of many windows at once.
+
+The price, volume and box analyzers all look at the last `window` rows of the
+same K-line frame. The engine converts the OHLCV columns to NumPy arrays once
+and derives every window statistic from prefix sums and suffix extrema, so the
+features of all windows cost O(n) per stock plus O(1) per window instead of a
+DataFrame copy, rolling means and regressions per window and analyzer.
+
+Windows whose rows contain missing or non-finite values are reported as None so
+that callers fall back to their pandas implementation, which keeps the exact
+NaN semantics of rolling(), pct_change() and std().
+"""
+import numpy as np
+import pandas as pd
+from typing import Dict, Any, List, Optional, Iterable
+from scipy.signal import argrelextrema
+
+# Moving average periods used for MA dispersion
+MA_PERIODS = (5, 10, 20, 30)
+
+# Extra rows needed before a window for volume comparison
+VOLUME_HISTORY_ROWS = 10
+
+
+def _column(df: pd.DataFrame, name: str) -> Optional[np.ndarray]:
+    if name not in df.columns:
+        return None
+    return pd.to_numeric(df[name], errors='coerce').to_numpy(dtype=float)
+
+
+def _prefix_sum(values: np.ndarray) -> np.ndarray:
+    """Prefix sums with a leading zero: sum(values[a:b]) == p[b] - p[a]."""
+    out = np.zeros(len(values) + 1)
+    np.cumsum(values, out=out[1:])
+    return out
+
+
+def _finite_prefix(values: np.ndarray):
+    """Prefix sums of the finite values and prefix counts of the non-finite ones."""
+    finite = np.isfinite(values)
+    return _prefix_sum(np.where(finite, values, 0.0)), _prefix_sum(~finite)
+
+
+def _returns(values: np.ndarray) -> np.ndarray:
+    """Element-wise pct_change; the first element is 0 and never used."""
+    out = np.zeros(len(values))
+    if len(values) > 1:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out[1:] = values[1:] / values[:-1] - 1
+    return out
+
+
+def _window_std(total: np.ndarray, total_sq: np.ndarray, count: np.ndarray) -> np.ndarray:
+    """Sample standard deviation (ddof=1) from window sums; NaN when count < 2."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        var = (total_sq - total * total / count) / (count - 1)
+    std = np.sqrt(np.maximum(var, 0.0))
+    return np.where(count >= 2, std, np.nan)
+
+
+def _window_slope(total: np.ndarray, index_total: np.ndarray,
+                  start: np.ndarray, count: np.ndarray) -> np.ndarray:
+    """
+    Least-squares slope of values against 0..count-1 from window sums.
+
+    index_total is the window sum of j * values[j] with the global row index j.
+    """
+    local_index_total = index_total - start * total
+    x_mean = (count - 1) / 2.0
+    sxx = count * (count * count - 1) / 12.0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (local_index_total - x_mean * total) / sxx
+
+
+class WindowFeatureEngine:
+    """
+    Vectorized multi-window features of one K-line frame.
+
+    Usage:
+        engine = WindowFeatureEngine(df, windows=[80, 100, 120])
+        engine.price_features(80)   # box_range, ma_diff, volatility
+        engine.volume_features(80)  # volume_change_ratio, volume_stability, volume_trend
+        engine.box_features(80)     # close_mean, close_slope, volatility, volume returns
+    """
+
+    def __init__(self, df: pd.DataFrame, windows: Optional[Iterable[int]] = None):
+        """
+        Args:
+            df: DataFrame with K-line data
+            windows: Windows to compute up front (others are computed on demand)
+        """
+        self.n = len(df)
+        self.high = _column(df, 'high')
+        self.low = _column(df, 'low')
+        self.close = _column(df, 'close')
+        self.volume = _column(df, 'volume')
+
+        self._computed = set()
+        self._price = {}
+        self._volume = {}
+        self._box = {}
+        # order -> (local maxima of high, local minima of low) over all rows
+        self._extrema = {}
+
+        self._has_prices = self.high is not None and self.low is not None and self.close is not None
+        if self._has_prices:
+            # Suffix extrema: max(high[k:]) and min(low[k:]) for every k
+            self._suffix_high = np.maximum.accumulate(self.high[::-1])[::-1]
+            self._suffix_low = np.minimum.accumulate(self.low[::-1])[::-1]
+
+            _, bad_high = _finite_prefix(self.high)
+            _, bad_low = _finite_prefix(self.low)
+            self._close_sum, bad_close = _finite_prefix(self.close)
+            self._bad_price = bad_high + bad_low + bad_close
+            self._close_index_sum = _prefix_sum(np.where(np.isfinite(self.close),
+                                                         self.close * np.arange(self.n), 0.0))
+
+            close_returns = _returns(self.close)
+            self._return_sum, self._bad_return = _finite_prefix(close_returns)
+            self._return_sq_sum = _prefix_sum(np.where(np.isfinite(close_returns), close_returns ** 2, 0.0))
+
+        if self.volume is not None:
+            self._volume_sum, self._bad_volume = _finite_prefix(self.volume)
+            finite_volume = np.where(np.isfinite(self.volume), self.volume, 0.0)
+            self._volume_sq_sum = _prefix_sum(finite_volume ** 2)
+            self._volume_index_sum = _prefix_sum(finite_volume * np.arange(self.n))
+
+            volume_returns = _returns(self.volume)
+            self._volume_return_sum, self._bad_volume_return = _finite_prefix(volume_returns)
+            self._volume_return_sq_sum = _prefix_sum(
+                np.where(np.isfinite(volume_returns), volume_returns ** 2, 0.0))
+
+        if windows:
+            self.compute(windows)
+
+    # --- Vectorized computation ---
+
+    def compute(self, windows: Iterable[int]) -> None:
+        """Compute the features of every given window in one vectorized pass."""
+        new_windows = {int(x) for x in windows} - self._computed
+        self._computed.update(new_windows)
+        w = np.array(sorted(x for x in new_windows if 0 < x <= self.n), dtype=int)
+        if len(w) == 0:
+            return
+
+        n = self.n
+        start = n - w
+
+        if self._has_prices:
+            self._compute_price(w, start)
+        if self.volume is not None:
+            self._compute_volume(w, start)
+
+    def _compute_price(self, w: np.ndarray, start: np.ndarray) -> None:
+        n = self.n
+        wf = w.astype(float)
+
+        # Box range from suffix extrema
+        price_high = self._suffix_high[start]
+        price_low = self._suffix_low[start]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            box_range = np.where(price_low > 0, (price_high - price_low) / price_low, np.inf)
+
+        # Latest moving averages; a period is only used when the window covers it
+        ma_by_period = {p: (self._close_sum[n] - self._close_sum[n - p]) / p
+                        for p in MA_PERIODS if p <= n}
+
+        # Daily return volatility over the returns inside the window
+        return_count = wf - 1
+        return_start = start + 1
+        return_sum = self._return_sum[n] - self._return_sum[return_start]
+        return_sq_sum = self._return_sq_sum[n] - self._return_sq_sum[return_start]
+        volatility = _window_std(return_sum, return_sq_sum, return_count)
+
+        # Close trend for the box detector
+        close_sum = self._close_sum[n] - self._close_sum[start]
+        close_index_sum = self._close_index_sum[n] - self._close_index_sum[start]
+        close_slope = _window_slope(close_sum, close_index_sum, start, wf)
+
+        price_ok = (self._bad_price[n] - self._bad_price[start] == 0) & \
+                   (self._bad_return[n] - self._bad_return[return_start] == 0)
+
+        for k, window in enumerate(w.tolist()):
+            if not price_ok[k]:
+                self._price[window] = None
+                self._box[window] = None
+                continue
+
+            ma_values = [ma_by_period[p] for p in MA_PERIODS if p <= window]
+            if len(ma_values) >= 2:
+                ma_std = float(np.std(ma_values))
+                ma_mean = float(np.mean(ma_values))
+                ma_diff = ma_std / ma_mean if ma_mean > 0 else float('inf')
+            else:
+                ma_diff = float('inf')
+
+            self._price[window] = {
+                'box_range': float(box_range[k]),
+                'ma_diff': ma_diff,
+                'volatility': float(volatility[k]) if window >= 3 else float('inf')
+            }
+            self._box[window] = {
+                'close_mean': float(close_sum[k] / window),
+                'close_slope': float(close_slope[k]) if window >= 2 else float('nan'),
+                'volatility': float(volatility[k])
+            }
+
+    def _compute_volume(self, w: np.ndarray, start: np.ndarray) -> None:
+        n = self.n
+        wf = w.astype(float)
+
+        # Recent window and the preceding window (clipped at the first row)
+        recent_sum = self._volume_sum[n] - self._volume_sum[start]
+        recent_sq_sum = self._volume_sq_sum[n] - self._volume_sq_sum[start]
+        recent_index_sum = self._volume_index_sum[n] - self._volume_index_sum[start]
+        previous_start = np.maximum(0, n - 2 * w)
+        previous_count = (start - previous_start).astype(float)
+        previous_sum = self._volume_sum[start] - self._volume_sum[previous_start]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            recent_avg = recent_sum / wf
+            previous_avg = previous_sum / previous_count
+        recent_std = _window_std(recent_sum, recent_sq_sum, wf)
+        slope = _window_slope(recent_sum, recent_index_sum, start, wf)
+
+        # Volume pct_change statistics for the box detector
+        return_count = wf - 1
+        return_start = start + 1
+        volume_return_sum = self._volume_return_sum[n] - self._volume_return_sum[return_start]
+        volume_return_sq_sum = self._volume_return_sq_sum[n] - self._volume_return_sq_sum[return_start]
+        volume_return_std = _window_std(volume_return_sum, volume_return_sq_sum, return_count)
+
+        volume_ok = self._bad_volume[n] - self._bad_volume[previous_start] == 0
+        volume_return_ok = (self._bad_volume[n] - self._bad_volume[start] == 0) & \
+                           (self._bad_volume_return[n] - self._bad_volume_return[return_start] == 0)
+
+        for k, window in enumerate(w.tolist()):
+            if n < window + VOLUME_HISTORY_ROWS:
+                self._volume[window] = {
+                    'volume_change_ratio': float('nan'),
+                    'volume_stability': float('nan'),
+                    'volume_trend': float('nan')
+                }
+            elif not volume_ok[k]:
+                self._volume[window] = None
+            else:
+                avg = float(recent_avg[k])
+                self._volume[window] = {
+                    'volume_change_ratio': avg / float(previous_avg[k]) if previous_avg[k] > 0 else float('nan'),
+                    'volume_stability': float(recent_std[k]) / avg if avg > 0 else float('nan'),
+                    'volume_trend': float(slope[k]) / avg if window >= 5 and avg > 0 else float('nan')
+                }
+
+            box = self._box.get(window)
+            if box is not None:
+                if volume_return_ok[k] and window >= 2:
+                    box['volume_return_mean'] = float(volume_return_sum[k] / return_count[k])
+                    box['volume_return_std'] = float(volume_return_std[k])
+                else:
+                    # Let the box detector use pandas for this window
+                    self._box[window] = None
+
+    # --- Accessors ---
+
+    def _get(self, table: Dict[int, Any], window: int) -> Optional[Dict[str, float]]:
+        if window not in self._computed:
+            self.compute([window])
+        features = table.get(window)
+        return dict(features) if features is not None else None
+
+    def price_features(self, window: int) -> Optional[Dict[str, float]]:
+        """
+        Get box_range, ma_diff and volatility of the last `window` rows.
+
+        Returns:
+            Dict of features, or None if the window is longer than the data or
+            contains missing prices
+        """
+        return self._get(self._price, window)
+
+    def volume_features(self, window: int) -> Optional[Dict[str, float]]:
+        """
+        Get volume_change_ratio, volume_stability and volume_trend of the last `window` rows.
+
+        Returns:
+            Dict of features, or None if unavailable or the rows contain missing volume
+        """
+        return self._get(self._volume, window)
+
+    def box_features(self, window: int) -> Optional[Dict[str, float]]:
+        """
+        Get close_mean, close_slope, volatility, volume_return_mean and
+        volume_return_std of the last `window` rows.
+
+        Returns:
+            Dict of features, or None if unavailable or the rows contain missing values
+        """
+        return self._get(self._box, window)
+
+    def volume_means(self, window: int, previous_window: int) -> Optional[Dict[str, float]]:
+        """
+        Get the average volume of the last `window` rows and of the
+        `previous_window` rows before them (clipped at the first row).
+
+        Returns:
+            Dict with 'recent_avg_volume' and 'previous_avg_volume', or None if
+            unavailable or the rows contain missing volume
+        """
+        n = self.n
+        start = n - window
+        previous_start = max(0, start - previous_window)
+        if self.volume is None or window <= 0 or start <= previous_start:
+            return None
+        if self._bad_volume[n] - self._bad_volume[previous_start] != 0:
+            return None
+        return {
+            'recent_avg_volume': float((self._volume_sum[n] - self._volume_sum[start]) / window),
+            'previous_avg_volume': float((self._volume_sum[start] - self._volume_sum[previous_start])
+                                         / (start - previous_start))
+        }
+
+    def window_extrema(self, window: int, order: int = 5) -> Dict[str, np.ndarray]:
+        """
+        Get the local maxima of high and minima of low within the last `window` rows.
+
+        The extrema are found once over all rows and shared by every window:
+        whether a row at least `order` rows after the window start is an
+        extremum only depends on rows inside the window, so only the first
+        `order` rows of each window are checked again.
+
+        Returns:
+            Dict with 'high_maxima' and 'low_minima' positions relative to the
+            window start, the same as argrelextrema on the window arrays
+        """
+        if order not in self._extrema:
+            self._extrema[order] = (argrelextrema(self.high, np.greater, order=order)[0],
+                                    argrelextrema(self.low, np.less, order=order)[0])
+        high_maxima, low_minima = self._extrema[order]
+
+        start = self.n - window
+        result = {}
+        for name, values, comparator, positions in (('high_maxima', self.high, np.greater, high_maxima),
+                                                    ('low_minima', self.low, np.less, low_minima)):
+            inner = positions[positions >= start + order] - start
+            # Near the window start argrelextrema compares against fewer rows on the left
+            head = values[start:start + min(window, 2 * order + 1)]
+            head_positions = argrelextrema(head, comparator, order=order)[0]
+            result[name] = np.concatenate([head_positions[head_positions < order], inner])
+        return result
+
+    def window_arrays(self, window: int) -> Dict[str, np.ndarray]:
+        """Get views of the high, low and close arrays of the last `window` rows."""
+        return {
+            'high': self.high[-window:],
+            'low': self.low[-window:],
+            'close': self.close[-window:]
+        }
+
+
+def get_feature_engine(df: pd.DataFrame,
+                       feature_engine: Optional[WindowFeatureEngine] = None,
+                       windows: Optional[List[int]] = None) -> WindowFeatureEngine:
+    """Reuse the given feature engine, or build one for the frame."""
+    if feature_engine is not None:
+        return feature_engine
+    return WindowFeatureEngine(df, windows)
@@ -3,14 +3,39 @@ Fundamental Analyzer module for stock fundamental analysis.
 """
 import pandas as pd
 import numpy as np
-import baostock as bs
-from typing import Dict, Any, List, Optional, Tuple
+import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Any, List, Optional, Tuple, Iterator
 import logging
 
+from ..data_fetcher import get_session_pool
+from ..fundamentals_cache import get_fundamentals_cache, FUNDAMENTAL_REPORTS
+
 # 设置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# PE和PB取最近多少天内的最新值
+VALUATION_LOOKBACK_DAYS = 30
+
+# 需要查询的股票数达到该值时才使用多进程并行查询
+PREFETCH_PARALLEL_MIN = 8
+
+# 基本面分析结果中的指标
+FUNDAMENTAL_METRICS = ['avg_revenue_growth', 'avg_profit_growth', 'avg_roe',
+                       'avg_liability_ratio', 'pe_ttm', 'pb_mrq']
+
+# 行业百分位筛选：(指标, 连续性指标, 是否升序排名, 名称, 不连续原因, 缺失原因)
+# 有连续性指标的要求百分位不大于阈值，估值指标要求百分位不小于阈值
+_PERCENTILE_FILTERS = [
+    ('avg_revenue_growth', 'revenue_growth_consistent', False, '营收增长率', '营收增长不连续', '缺少营收增长数据'),
+    ('avg_profit_growth', 'profit_growth_consistent', False, '净利润增长率', '净利润增长不连续', '缺少净利润增长数据'),
+    ('avg_roe', 'roe_consistent', False, 'ROE', 'ROE不连续', '缺少ROE数据'),
+    ('avg_liability_ratio', 'liability_ratio_consistent', True, '资产负债率', '资产负债率不稳定', '缺少资产负债率数据'),
+    ('pe_ttm', None, True, 'PE', None, '缺少PE数据'),
+    ('pb_mrq', None, True, 'PB', None, '缺少PB数据'),
+]
+
 def analyze_fundamentals(stock_list: List[Dict[str, Any]], 
                          use_fundamental_filter: bool = False,
                          revenue_growth_percentile: float = 0.3,
@@ -19,7 +44,8 @@ def analyze_fundamentals(stock_list: List[Dict[str, Any]],
                          liability_percentile: float = 0.3,
                          pe_percentile: float = 0.7,
                          pb_percentile: float = 0.7,
-                         years_to_check: int = 3) -> List[Dict[str, Any]]:
+                         years_to_check: int = 3,
+                         max_workers: int = 1) -> List[Dict[str, Any]]:
     """
     Analyze stocks based on fundamental metrics and filter them according to industry percentiles.
     
@@ -33,6 +59,7 @@ def analyze_fundamentals(stock_list: List[Dict[str, Any]],
         pe_percentile: Required percentile for PE ratio (higher = stricter)
         pb_percentile: Required percentile for PB ratio (higher = stricter)
         years_to_check: Number of consecutive years to check for growth metrics
+        max_workers: Maximum number of processes querying missing fundamentals
     
     Returns:
         List of stocks that pass the fundamental filters
@@ -50,139 +77,119 @@ def analyze_fundamentals(stock_list: List[Dict[str, Any]],
             industry_groups[industry] = []
         industry_groups[industry].append(stock)
     
-    # 获取并计算每个行业内的基本面指标
-    filtered_stocks = []
+    # 一次性获取所有需要比较的股票的基本面数据：优先读缓存，缺失的并行查询
+    fundamentals = load_fundamentals(
+        [stock for stocks in industry_groups.values() if len(stocks) > 1 for stock in stocks],
+        years_to_check, max_workers)
     
-    for industry, stocks in industry_groups.items():
+    # 所有需要比较的股票的基本面指标合并为一张表，按行业分组计算百分位
+    rows = []
+    for group_id, stocks in enumerate(industry_groups.values()):
+        if len(stocks) <= 1:
+            continue
+        logger.info(f"Analyzing {len(stocks)} stocks in industry: {stocks[0].get('industry', 'Unknown')}")
+        for stock in stocks:
+            stock_fundamentals = fundamentals.get(stock['code'])
+            if stock_fundamentals:
+                rows.append(dict(stock_fundamentals, code=stock['code'], industry_group=group_id))
+    
+    thresholds = {
+        'avg_revenue_growth': revenue_growth_percentile,
+        'avg_profit_growth': profit_growth_percentile,
+        'avg_roe': roe_percentile,
+        'avg_liability_ratio': liability_percentile,
+        'pe_ttm': pe_percentile,
+        'pb_mrq': pb_percentile,
+    }
+    passed = _apply_fundamental_filters(pd.DataFrame(rows), thresholds)
+    
+    # 按原始顺序输出：行业内只有一只股票的直接保留，其余保留通过筛选的股票
+    filtered_stocks = []
+    for stocks in industry_groups.values():
         if len(stocks) <= 1:  # 如果行业内只有一只股票，直接保留
             filtered_stocks.extend(stocks)
             continue
-            
-        logger.info(f"Analyzing {len(stocks)} stocks in industry: {industry}")
-        
-        # 获取该行业所有股票的基本面数据
-        industry_fundamentals = []
-        
         for stock in stocks:
-            code = stock['code']
-            try:
-                # 获取基本面数据
-                stock_fundamentals = get_stock_fundamentals(code, years_to_check)
-                if stock_fundamentals:
-                    stock_fundamentals['code'] = code
-                    industry_fundamentals.append(stock_fundamentals)
-            except Exception as e:
-                logger.error(f"Error getting fundamentals for {code}: {str(e)}")
-        
-        if not industry_fundamentals:
-            continue
-            
-        # 转换为DataFrame便于计算行业百分位
-        industry_df = pd.DataFrame(industry_fundamentals)
-        
-        # 计算行业内各指标的百分位
-        for stock in industry_fundamentals:
-            code = stock['code']
-            
-            # 检查是否满足所有基本面条件
-            meets_criteria = True
-            reasons = []
-            
-            # 1. 营收增长率 - 要求位于行业前revenue_growth_percentile
-            if 'revenue_growth_consistent' in stock and not stock['revenue_growth_consistent']:
-                meets_criteria = False
-                reasons.append("营收增长不连续")
-            elif 'avg_revenue_growth' in stock:
-                percentile = calculate_percentile(industry_df, 'avg_revenue_growth', stock['avg_revenue_growth'], ascending=False)
-                if percentile > revenue_growth_percentile:
-                    meets_criteria = False
-                    reasons.append(f"营收增长率行业百分位({percentile:.2f})不达标")
-            else:
-                meets_criteria = False
-                reasons.append("缺少营收增长数据")
-                
-            # 2. 净利润增长率 - 要求位于行业前profit_growth_percentile
-            if 'profit_growth_consistent' in stock and not stock['profit_growth_consistent']:
-                meets_criteria = False
-                reasons.append("净利润增长不连续")
-            elif 'avg_profit_growth' in stock:
-                percentile = calculate_percentile(industry_df, 'avg_profit_growth', stock['avg_profit_growth'], ascending=False)
-                if percentile > profit_growth_percentile:
-                    meets_criteria = False
-                    reasons.append(f"净利润增长率行业百分位({percentile:.2f})不达标")
-            else:
-                meets_criteria = False
-                reasons.append("缺少净利润增长数据")
-                
-            # 3. ROE - 要求位于行业前roe_percentile
-            if 'roe_consistent' in stock and not stock['roe_consistent']:
-                meets_criteria = False
-                reasons.append("ROE不连续")
-            elif 'avg_roe' in stock:
-                percentile = calculate_percentile(industry_df, 'avg_roe', stock['avg_roe'], ascending=False)
-                if percentile > roe_percentile:
-                    meets_criteria = False
-                    reasons.append(f"ROE行业百分位({percentile:.2f})不达标")
-            else:
-                meets_criteria = False
-                reasons.append("缺少ROE数据")
-                
-            # 4. 资产负债率 - 要求位于行业后liability_percentile (较低)
-            if 'liability_ratio_consistent' in stock and not stock['liability_ratio_consistent']:
-                meets_criteria = False
-                reasons.append("资产负债率不稳定")
-            elif 'avg_liability_ratio' in stock:
-                percentile = calculate_percentile(industry_df, 'avg_liability_ratio', stock['avg_liability_ratio'], ascending=True)
-                if percentile > liability_percentile:
-                    meets_criteria = False
-                    reasons.append(f"资产负债率行业百分位({percentile:.2f})不达标")
-            else:
-                meets_criteria = False
-                reasons.append("缺少资产负债率数据")
-                
-            # 5. PE - 要求不在行业前pe_percentile (较高)
-            if 'pe_ttm' in stock:
-                percentile = calculate_percentile(industry_df, 'pe_ttm', stock['pe_ttm'], ascending=True)
-                if percentile < pe_percentile:
-                    meets_criteria = False
-                    reasons.append(f"PE行业百分位({percentile:.2f})过高")
-            else:
-                meets_criteria = False
-                reasons.append("缺少PE数据")
-                
-            # 6. PB - 要求不在行业前pb_percentile (较高)
-            if 'pb_mrq' in stock:
-                percentile = calculate_percentile(industry_df, 'pb_mrq', stock['pb_mrq'], ascending=True)
-                if percentile < pb_percentile:
-                    meets_criteria = False
-                    reasons.append(f"PB行业百分位({percentile:.2f})过高")
-            else:
-                meets_criteria = False
-                reasons.append("缺少PB数据")
-            
-            # 如果满足所有条件，添加到过滤后的列表
-            if meets_criteria:
-                # 找到原始stock对象
-                for original_stock in stocks:
-                    if original_stock['code'] == code:
-                        # 添加基本面分析结果
-                        original_stock['fundamental_analysis'] = {
-                            'avg_revenue_growth': stock.get('avg_revenue_growth'),
-                            'avg_profit_growth': stock.get('avg_profit_growth'),
-                            'avg_roe': stock.get('avg_roe'),
-                            'avg_liability_ratio': stock.get('avg_liability_ratio'),
-                            'pe_ttm': stock.get('pe_ttm'),
-                            'pb_mrq': stock.get('pb_mrq')
-                        }
-                        filtered_stocks.append(original_stock)
-                        break
-            else:
-                # 记录未通过的原因
-                logger.info(f"Stock {code} failed fundamental filter: {', '.join(reasons)}")
+            stock_fundamentals = passed.get(stock['code'])
+            if stock_fundamentals is not None:
+                # 添加基本面分析结果
+                stock['fundamental_analysis'] = {key: stock_fundamentals.get(key) for key in FUNDAMENTAL_METRICS}
+                filtered_stocks.append(stock)
     
     logger.info(f"Fundamental analysis complete. {len(filtered_stocks)} stocks passed out of {len(stock_list)}")
     return filtered_stocks
 
+def _industry_percentiles(table: pd.DataFrame, column: str, ascending: bool) -> pd.Series:
+    """
+    Percentile of every value within its industry, as in calculate_percentile:
+    the share of the industry's valid values ranked strictly better, 1.0 for
+    missing values.
+    """
+    if column not in table.columns:
+        return pd.Series(1.0, index=table.index)
+    values = pd.to_numeric(table[column], errors='coerce')
+    groups = values.groupby(table['industry_group'])
+    ranks = groups.rank(method='min', ascending=ascending)
+    counts = groups.transform('count')
+    return ((ranks - 1) / counts).fillna(1.0)
+
+
+def _apply_fundamental_filters(table: pd.DataFrame,
+                               thresholds: Dict[str, float]) -> Dict[str, Dict[str, Any]]:
+    """
+    Apply the industry percentile filters to the fundamentals table.
+
+    Args:
+        table: One row per stock with 'code', 'industry_group' and the
+            fundamental metrics
+        thresholds: Required percentile per metric column
+
+    Returns:
+        Dictionary mapping the codes of the stocks that pass every filter to
+        their fundamental metrics
+    """
+    if table.empty:
+        return {}
+    
+    passes = pd.Series(True, index=table.index)
+    reasons = pd.Series([[] for _ in range(len(table))], index=table.index, dtype=object)
+    
+    def fail(mask: pd.Series, messages) -> None:
+        nonlocal passes
+        passes &= ~mask
+        for index in table.index[mask.to_numpy()]:
+            reasons[index].append(messages if isinstance(messages, str) else messages[index])
+    
+    for column, consistent_column, ascending, label, inconsistent_reason, missing_reason in _PERCENTILE_FILTERS:
+        present = table[column].notna() if column in table.columns else pd.Series(False, index=table.index)
+        percentiles = _industry_percentiles(table, column, ascending)
+        threshold = thresholds[column]
+        
+        if consistent_column is not None:
+            consistent = table[consistent_column] if consistent_column in table.columns else pd.Series(index=table.index, dtype=object)
+            inconsistent = consistent.notna() & (consistent == False)
+            fail(inconsistent, inconsistent_reason)
+            checked = ~inconsistent & present
+            # 要求位于行业前threshold
+            failed = checked & (percentiles > threshold)
+            fail(failed, {i: f"{label}行业百分位({percentiles[i]:.2f})不达标" for i in table.index[failed.to_numpy()]})
+            fail(~inconsistent & ~present, missing_reason)
+        else:
+            # 估值要求不在行业前(1 - threshold)的最高估值中
+            failed = present & (percentiles < threshold)
+            fail(failed, {i: f"{label}行业百分位({percentiles[i]:.2f})过高" for i in table.index[failed.to_numpy()]})
+            fail(~present, missing_reason)
+    
+    for index in table.index[~passes.to_numpy()]:
+        # 记录未通过的原因
+        logger.info(f"Stock {table.at[index, 'code']} failed fundamental filter: {', '.join(reasons[index])}")
+    
+    metrics = [column for column in FUNDAMENTAL_METRICS if column in table.columns]
+    passed = table.loc[passes, ['code'] + metrics].astype(object)
+    passed = passed.where(passed.notna(), None)
+    return {record['code']: record for record in passed.to_dict('records')}
+
+
 def get_stock_fundamentals(code: str, years_to_check: int = 3) -> Dict[str, Any]:
     """
     Get fundamental data for a stock over multiple years.
@@ -194,93 +201,216 @@ def get_stock_fundamentals(code: str, years_to_check: int = 3) -> Dict[str, Any]
     Returns:
         Dictionary with fundamental metrics
     """
-    # 获取当前年份和季度
-    import datetime
+    return load_fundamentals([{'code': code}], years_to_check).get(code, {})
+
+
+def load_fundamentals(stocks: List[Dict[str, Any]],
+                      years_to_check: int = 3,
+                      max_workers: int = 1) -> Dict[str, Dict[str, Any]]:
+    """
+    Get fundamental data for many stocks.
+
+    Annual reports are read from the fundamentals cache; only missing reports
+    are queried, in parallel worker processes when there are enough of them.
+    PE and PB are taken from the stock's 'kline_data' when it covers the last
+    VALUATION_LOOKBACK_DAYS days and queried otherwise.
+
+    Args:
+        stocks: Stock dictionaries with at least 'code' (optionally 'kline_data')
+        years_to_check: Number of years to check
+        max_workers: Maximum number of prefetch worker processes
+
+    Returns:
+        Dictionary mapping stock codes to their fundamental metrics
+        (empty dictionaries for stocks with insufficient data)
+    """
+    cache = get_fundamentals_cache()
+    years = _report_years(years_to_check)
+    codes = list(dict.fromkeys(stock['code'] for stock in stocks))
+
+    reports: Dict[str, Dict[Tuple[int, str], Optional[Dict[str, Any]]]] = {code: {} for code in codes}
+    for (code, year, report), row in cache.get_reports(codes, years).items():
+        reports[code][(year, report)] = row
+
+    valuations = {}
+    for stock in stocks:
+        valuation = _recent_valuation(stock.get('kline_data'))
+        if valuation is not None:
+            valuations[stock['code']] = valuation
+
+    # 只查询缓存中缺失的财报；已知缺少财报的股票无论估值如何都不达标，不再查询估值
+    jobs = []
+    for code in codes:
+        missing_years = [year for year in years
+                         if any((year, report) not in reports[code] for report in FUNDAMENTAL_REPORTS)]
+        known_missing = any(row is None for row in reports[code].values())
+        need_valuation = code not in valuations and not known_missing
+        if missing_years or need_valuation:
+            jobs.append((code, missing_years, need_valuation))
+
+    if jobs:
+        logger.info(f"Fetching fundamentals for {len(jobs)} stocks ({len(codes) - len(jobs)} fully cached)")
+        for code, fetched in _run_fetch_jobs(jobs, max_workers):
+            cache.save_reports(fetched['reports'])
+            for _, year, _, report, row in fetched['reports']:
+                reports[code][(year, report)] = row
+            if fetched['valuation'] is not None:
+                valuations[code] = fetched['valuation']
+
+    fundamentals = {}
+    for code in codes:
+        try:
+            fundamentals[code] = _compute_fundamentals(
+                code, reports[code], years, valuations.get(code, (None, None)))
+        except Exception as e:
+            logger.error(f"Error getting fundamentals for {code}: {str(e)}")
+            fundamentals[code] = {}
+    return fundamentals
+
+
+def fetch_fundamental_reports(code: str, years: List[int], quarter: int = 4,
+                              need_valuation: bool = True) -> Dict[str, Any]:
+    """
+    Query the reports of a stock from Baostock (also run in prefetch worker processes).
+
+    Args:
+        code: Stock code
+        years: Report years to query
+        quarter: Report quarter
+        need_valuation: Whether to query the latest PE and PB as well
+
+    Returns:
+        Dictionary with 'reports', a list of (code, year, quarter, report, row)
+        tuples for the save_reports of the fundamentals cache, and 'valuation',
+        a (pe_ttm, pb_mrq) tuple or None
+    """
+    reports = []
+    valuation = None
+    pool = get_session_pool()
+    # 查询期间独占进程级的Baostock会话
+    with pool.lease() as client:
+        try:
+            for year in years:
+                for report in FUNDAMENTAL_REPORTS:
+                    reports.append((code, year, quarter, report,
+                                    _query_report(client, report, code, year, quarter)))
+            if need_valuation:
+                valuation = _query_valuation(client, code)
+        except ConnectionError as e:
+            # 已查到的财报照常写入缓存，其余的下次扫描重新查询；会话在下次使用时重新登录
+            logger.warning(str(e))
+            pool.invalidate()
+    return {'reports': reports, 'valuation': valuation}
+
+
+def _run_fetch_jobs(jobs: List[Tuple[str, List[int], bool]],
+                    max_workers: int) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    workers = min(max_workers, len(jobs))
+    if workers <= 1 or len(jobs) < PREFETCH_PARALLEL_MIN:
+        for code, years, need_valuation in jobs:
+            try:
+                yield code, fetch_fundamental_reports(code, years, need_valuation=need_valuation)
+            except Exception as e:
+                logger.error(f"Error getting fundamentals for {code}: {str(e)}")
+        return
+
+    # Baostock每个进程只有一个连接，并行查询需要多个进程，每个进程各自登录
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(fetch_fundamental_reports, code, years, 4, need_valuation): code
+                   for code, years, need_valuation in jobs}
+        for future in as_completed(futures):
+            code = futures[future]
+            try:
+                yield code, future.result()
+            except Exception as e:
+                logger.error(f"Error getting fundamentals for {code}: {str(e)}")
+
+
+def _report_years(years_to_check: int) -> List[int]:
+    # 最近years_to_check年的年报
     current_year = datetime.datetime.now().year
-    
-    # 获取最近几年的财务数据
-    growth_data = []
-    profit_data = []
-    balance_data = []
-    
-    # 获取最近years_to_check年的年报数据
-    for year in range(current_year-years_to_check, current_year):
-        # 获取成长能力数据
-        rs_growth = bs.query_growth_data(code=code, year=year, quarter=4)
-        if rs_growth.error_code != '0':
-            logger.warning(f"Failed to get growth data for {code}, year {year}: {rs_growth.error_msg}")
-            continue
-            
-        growth_list = []
-        while (rs_growth.error_code == '0') and rs_growth.next():
-            growth_list.append(rs_growth.get_row_data())
-        
-        if growth_list:
-            growth_data.append(pd.DataFrame(growth_list, columns=rs_growth.fields))
-        
-        # 获取盈利能力数据
-        rs_profit = bs.query_profit_data(code=code, year=year, quarter=4)
-        if rs_profit.error_code != '0':
-            logger.warning(f"Failed to get profit data for {code}, year {year}: {rs_profit.error_msg}")
-            continue
-            
-        profit_list = []
-        while (rs_profit.error_code == '0') and rs_profit.next():
-            profit_list.append(rs_profit.get_row_data())
-        
-        if profit_list:
-            profit_data.append(pd.DataFrame(profit_list, columns=rs_profit.fields))
-        
-        # 获取偿债能力数据
-        rs_balance = bs.query_balance_data(code=code, year=year, quarter=4)
-        if rs_balance.error_code != '0':
-            logger.warning(f"Failed to get balance data for {code}, year {year}: {rs_balance.error_msg}")
-            continue
-            
-        balance_list = []
-        while (rs_balance.error_code == '0') and rs_balance.next():
-            balance_list.append(rs_balance.get_row_data())
-        
-        if balance_list:
-            balance_data.append(pd.DataFrame(balance_list, columns=rs_balance.fields))
-    
-    # 如果没有足够的数据，返回空字典
-    if len(growth_data) < years_to_check or len(profit_data) < years_to_check or len(balance_data) < years_to_check:
-        logger.warning(f"Insufficient data for {code}, need {years_to_check} years but got growth:{len(growth_data)}, profit:{len(profit_data)}, balance:{len(balance_data)}")
-        return {}
-    
-    # 合并数据
-    growth_df = pd.concat(growth_data)
-    profit_df = pd.concat(profit_data)
-    balance_df = pd.concat(balance_data)
-    
-    # 获取当前的市盈率和市净率
-    # 获取最近的K线数据
-    rs_k = bs.query_history_k_data_plus(
+    return list(range(current_year - years_to_check, current_year))
+
+
+def _query_report(client, report: str, code: str, year: int, quarter: int) -> Optional[Dict[str, Any]]:
+    queries = {
+        'growth': client.query_growth_data,     # 成长能力
+        'profit': client.query_profit_data,     # 盈利能力
+        'balance': client.query_balance_data,   # 偿债能力
+    }
+    rs = queries[report](code=code, year=year, quarter=quarter)
+    if rs.error_code != '0':
+        raise ConnectionError(f"Failed to get {report} data for {code}, year {year}: {rs.error_msg}")
+
+    row = None
+    while (rs.error_code == '0') and rs.next():
+        if row is None:
+            row = dict(zip(rs.fields, rs.get_row_data()))
+    return row
+
+
+def _valuation_start_date() -> str:
+    return (datetime.datetime.now() - datetime.timedelta(days=VALUATION_LOOKBACK_DAYS)).strftime('%Y-%m-%d')
+
+
+def _latest_valuation(k_df: pd.DataFrame) -> Tuple[Optional[float], Optional[float]]:
+    # 获取最新的非NaN值
+    pe_values = pd.to_numeric(k_df['peTTM'], errors='coerce').dropna()
+    pb_values = pd.to_numeric(k_df['pbMRQ'], errors='coerce').dropna()
+    pe_ttm = float(pe_values.iloc[-1]) if not pe_values.empty else None
+    pb_mrq = float(pb_values.iloc[-1]) if not pb_values.empty else None
+    return pe_ttm, pb_mrq
+
+
+def _recent_valuation(kline_data: Optional[List[Dict[str, Any]]]) -> Optional[Tuple[Optional[float], Optional[float]]]:
+    """PE和PB取自扫描时已加载的K线；K线未覆盖估值窗口时返回None"""
+    if not kline_data:
+        return None
+    k_df = pd.DataFrame(kline_data)
+    if not {'date', 'peTTM', 'pbMRQ'}.issubset(k_df.columns):
+        return None
+    dates = pd.to_datetime(k_df['date'].astype(str).str[:10], errors='coerce')
+    recent = k_df[dates >= pd.Timestamp(_valuation_start_date())]
+    if recent.empty:
+        return None
+    return _latest_valuation(recent)
+
+
+def _query_valuation(client, code: str) -> Tuple[Optional[float], Optional[float]]:
+    # 获取最近的K线数据中的市盈率和市净率
+    rs_k = client.query_history_k_data_plus(
         code,
         "date,code,close,peTTM,pbMRQ",
-        start_date=(datetime.datetime.now() - datetime.timedelta(days=30)).strftime('%Y-%m-%d'),
+        start_date=_valuation_start_date(),
         end_date=datetime.datetime.now().strftime('%Y-%m-%d'),
         frequency="d"
     )
+    if rs_k.error_code != '0':
+        return None, None
+
+    k_list = []
+    while rs_k.next():
+        k_list.append(rs_k.get_row_data())
+    if not k_list:
+        return None, None
+    return _latest_valuation(pd.DataFrame(k_list, columns=rs_k.fields))
+
+
+def _compute_fundamentals(code: str,
+                          reports: Dict[Tuple[int, str], Optional[Dict[str, Any]]],
+                          years: List[int],
+                          valuation: Tuple[Optional[float], Optional[float]]) -> Dict[str, Any]:
+    years_to_check = len(years)
+    growth_data = [reports[(year, 'growth')] for year in years if reports.get((year, 'growth'))]
+    profit_data = [reports[(year, 'profit')] for year in years if reports.get((year, 'profit'))]
+    balance_data = [reports[(year, 'balance')] for year in years if reports.get((year, 'balance'))]
     
-    pe_ttm = None
-    pb_mrq = None
+    # 如果没有足够的数据，返回空字典
+    if len(growth_data) < years_to_check or len(profit_data) < years_to_check or len(balance_data) < years_to_check:
+        logger.warning(f"Insufficient data for {code}, need {years_to_check} years but got growth:{len(growth_data)}, profit:{len(profit_data)}, balance:{len(balance_data)}")
+        return {}
     
-    if rs_k.error_code == '0':
-        k_list = []
-        while rs_k.next():
-            k_list.append(rs_k.get_row_data())
-        
-        if k_list:
-            k_df = pd.DataFrame(k_list, columns=rs_k.fields)
-            # 转换为数值类型
-            k_df['peTTM'] = pd.to_numeric(k_df['peTTM'], errors='coerce')
-            k_df['pbMRQ'] = pd.to_numeric(k_df['pbMRQ'], errors='coerce')
-            
-            # 获取最新的非NaN值
-            pe_ttm = k_df.loc[k_df['peTTM'].notna(), 'peTTM'].iloc[-1] if not k_df.loc[k_df['peTTM'].notna()].empty else None
-            pb_mrq = k_df.loc[k_df['pbMRQ'].notna(), 'pbMRQ'].iloc[-1] if not k_df.loc[k_df['pbMRQ'].notna()].empty else None
+    pe_ttm, pb_mrq = valuation
     
     # 提取并计算关键指标
     result = {}
@@ -289,7 +419,7 @@ def get_stock_fundamentals(code: str, years_to_check: int = 3) -> Dict[str, Any]
     try:
         revenue_growth_values = []
         for i in range(years_to_check):
-            yoy_value = growth_df.iloc[i]['YOYAsset']
+            yoy_value = growth_data[i]['YOYAsset']
             if yoy_value and yoy_value != '' and float(yoy_value) > 0:
                 revenue_growth_values.append(float(yoy_value))
             else:
@@ -305,7 +435,7 @@ def get_stock_fundamentals(code: str, years_to_check: int = 3) -> Dict[str, Any]
     try:
         profit_growth_values = []
         for i in range(years_to_check):
-            yoy_value = growth_df.iloc[i]['YOYPNI']
+            yoy_value = growth_data[i]['YOYPNI']
             if yoy_value and yoy_value != '' and float(yoy_value) > 0:
                 profit_growth_values.append(float(yoy_value))
             else:
@@ -321,7 +451,7 @@ def get_stock_fundamentals(code: str, years_to_check: int = 3) -> Dict[str, Any]
     try:
         roe_values = []
         for i in range(years_to_check):
-            roe_value = profit_df.iloc[i]['roeAvg']
+            roe_value = profit_data[i]['roeAvg']
             if roe_value and roe_value != '' and float(roe_value) > 0:
                 roe_values.append(float(roe_value))
             else:
@@ -337,7 +467,7 @@ def get_stock_fundamentals(code: str, years_to_check: int = 3) -> Dict[str, Any]
     try:
         liability_ratio_values = []
         for i in range(years_to_check):
-            ratio_value = balance_df.iloc[i]['liabilityToAsset']
+            ratio_value = balance_data[i]['liabilityToAsset']
             if ratio_value and ratio_value != '':
                 liability_ratio_values.append(float(ratio_value))
             else:
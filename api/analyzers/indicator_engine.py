@@ -0,0 +1,184 @@
+"""
+Indicator Engine module for computing technical indicators of one stock at once.
+
+The calculate_* functions of technical_indicators each copy the whole K-line
+frame before adding their columns, so computing every indicator cost one frame
+copy per indicator. The engine reads the price columns as NumPy arrays once and
+writes only the requested indicators into the rows of a single preallocated
+array, which the breakthrough checks then share.
+
+Rolling and exponential statistics run pandas' compiled kernels on Series views
+of the arrays, so the values are identical to those of the DataFrame functions
+without copying any frame.
+"""
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Iterable, Tuple
+
+# Default indicator parameters
+MA_PERIODS = (5, 10, 20, 30, 60)
+EMA_PERIODS = (12, 26)
+MACD_PERIODS = (12, 26, 9)      # fast, slow, signal
+RSI_PERIOD = 14
+KDJ_PERIODS = (9, 3, 3)         # k, d, j
+BOLLINGER_PERIOD = 20
+BOLLINGER_STD_DEV = 2.0
+
+# Columns written by each indicator (MA and EMA columns depend on their periods)
+INDICATOR_COLUMNS = {
+    'macd': ['macd', 'macd_signal', 'macd_hist'],
+    'rsi': ['rsi'],
+    'kdj': ['k', 'd', 'j'],
+    'bollinger': ['bb_middle', 'bb_upper', 'bb_lower', 'bb_bandwidth'],
+}
+
+# Every indicator, in the column order of calculate_all_indicators
+ALL_INDICATORS = ('ma', 'macd', 'rsi', 'kdj', 'bollinger')
+
+
+def _column(df: pd.DataFrame, name: str) -> Optional[np.ndarray]:
+    if name not in df.columns:
+        return None
+    return pd.to_numeric(df[name], errors='coerce').to_numpy(dtype=float)
+
+
+def _rolling(values: np.ndarray, window: int, statistic: str, out: np.ndarray) -> None:
+    """Write the rolling statistic ('mean', 'std', 'min' or 'max') of values to out."""
+    # Wraps the array without copying; pandas' compiled rolling kernels keep the
+    # results identical to the DataFrame implementation, including the
+    # floating-point behavior of flat windows
+    rolling = pd.Series(values, copy=False).rolling(window=window)
+    out[:] = getattr(rolling, statistic)().to_numpy()
+
+
+def _ewm(values: np.ndarray, span: int, out: np.ndarray) -> None:
+    # The recurrence is sequential; pandas runs it in compiled code
+    out[:] = pd.Series(values, copy=False).ewm(span=span, adjust=False).mean().to_numpy()
+
+
+class IndicatorFrame:
+    """
+    Indicator series of one stock, stored as the rows of one preallocated array.
+
+    Usage:
+        indicators = compute_indicators(df, ['macd', 'rsi'])
+        indicators['macd'][-1]     # latest MACD value
+        'k' in indicators           # whether KDJ was computed
+    """
+
+    def __init__(self, columns: Iterable[str], length: int):
+        self.columns: List[str] = list(columns)
+        self.values = np.full((len(self.columns), length), np.nan)
+        self._rows = {column: i for i, column in enumerate(self.columns)}
+
+    def __contains__(self, column: str) -> bool:
+        return column in self._rows
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self.values[self._rows[column]]
+
+    def __len__(self) -> int:
+        return self.values.shape[1]
+
+    def to_dict(self) -> Dict[str, np.ndarray]:
+        """Get the indicator columns as a dictionary of arrays (views, not copies)."""
+        return {column: self[column] for column in self.columns}
+
+
+def compute_indicators(df: pd.DataFrame,
+                       indicators: Iterable[str] = ALL_INDICATORS,
+                       ma_periods: Iterable[int] = MA_PERIODS,
+                       ema_periods: Iterable[int] = EMA_PERIODS,
+                       macd_periods: Tuple[int, int, int] = MACD_PERIODS,
+                       rsi_period: int = RSI_PERIOD,
+                       kdj_periods: Tuple[int, int, int] = KDJ_PERIODS,
+                       bollinger_period: int = BOLLINGER_PERIOD,
+                       bollinger_std_dev: float = BOLLINGER_STD_DEV) -> IndicatorFrame:
+    """
+    Compute the requested technical indicators of a K-line frame.
+
+    Args:
+        df: DataFrame containing price data ('close'; 'high' and 'low' for KDJ)
+        indicators: Indicators to compute: 'ma', 'ema', 'macd', 'rsi', 'kdj', 'bollinger'
+        ma_periods: Periods of the 'ma' columns (ma5, ma10, ...)
+        ema_periods: Periods of the 'ema' columns (ema12, ema26)
+        macd_periods: Fast, slow and signal periods of MACD
+        rsi_period: Period of RSI
+        kdj_periods: K, D and J periods of KDJ
+        bollinger_period: Period of the Bollinger Bands moving average
+        bollinger_std_dev: Number of standard deviations of the Bollinger Bands
+
+    Returns:
+        IndicatorFrame with 'close' and the columns of the requested indicators;
+        KDJ is left out when the frame has no 'high' and 'low' columns
+    """
+    indicators = set(indicators)
+    close = _column(df, 'close')
+    high = _column(df, 'high')
+    low = _column(df, 'low')
+    if close is None:
+        return IndicatorFrame([], len(df))
+    if high is None or low is None:
+        indicators.discard('kdj')
+
+    ma_periods = list(ma_periods) if 'ma' in indicators else []
+    ema_periods = list(ema_periods) if 'ema' in indicators else []
+    columns = ['close'] + [f'ma{period}' for period in ma_periods] + [f'ema{period}' for period in ema_periods]
+    for name in ('macd', 'rsi', 'kdj', 'bollinger'):
+        if name in indicators:
+            columns.extend(INDICATOR_COLUMNS[name])
+
+    frame = IndicatorFrame(columns, len(close))
+    frame['close'][:] = close
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for period in ma_periods:
+            _rolling(close, period, 'mean', frame[f'ma{period}'])
+
+        for period in ema_periods:
+            _ewm(close, period, frame[f'ema{period}'])
+
+        if 'macd' in indicators:
+            fast_period, slow_period, signal_period = macd_periods
+            macd = frame['macd']
+            _ewm(close, fast_period, macd)
+            slow_ema = np.empty_like(close)
+            _ewm(close, slow_period, slow_ema)
+            macd -= slow_ema
+            _ewm(macd, signal_period, frame['macd_signal'])
+            np.subtract(macd, frame['macd_signal'], out=frame['macd_hist'])
+
+        if 'rsi' in indicators:
+            delta = np.empty_like(close)
+            delta[:1] = np.nan
+            np.subtract(close[1:], close[:-1], out=delta[1:])
+            # Like Series.where, a missing change counts as neither gain nor loss
+            gain = np.where(delta > 0, delta, 0.0)
+            loss = -np.where(delta < 0, delta, 0.0)
+            avg_gain = np.full_like(close, np.nan)
+            avg_loss = np.full_like(close, np.nan)
+            _rolling(gain, rsi_period, 'mean', avg_gain)
+            _rolling(loss, rsi_period, 'mean', avg_loss)
+            frame['rsi'][:] = 100 - (100 / (1 + avg_gain / avg_loss))
+
+        if 'kdj' in indicators:
+            k_period, d_period, j_period = kdj_periods
+            low_min = np.full_like(close, np.nan)
+            high_max = np.full_like(close, np.nan)
+            _rolling(low, k_period, 'min', low_min)
+            _rolling(high, k_period, 'max', high_max)
+            rsv = 100 * ((close - low_min) / (high_max - low_min))
+            _rolling(rsv, d_period, 'mean', frame['k'])
+            _rolling(frame['k'], j_period, 'mean', frame['d'])
+            frame['j'][:] = 3 * frame['k'] - 2 * frame['d']
+
+        if 'bollinger' in indicators:
+            middle = frame['bb_middle']
+            _rolling(close, bollinger_period, 'mean', middle)
+            rolling_std = np.full_like(close, np.nan)
+            _rolling(close, bollinger_period, 'std', rolling_std)
+            np.add(middle, rolling_std * bollinger_std_dev, out=frame['bb_upper'])
+            np.subtract(middle, rolling_std * bollinger_std_dev, out=frame['bb_lower'])
+            frame['bb_bandwidth'][:] = (frame['bb_upper'] - frame['bb_lower']) / middle
+
+    return frame
@@ -0,0 +1,141 @@
+"""
+Prefilter module for rejecting stocks before the full platform analysis.
+
+Most stocks of a full-market scan fail the cheapest platform conditions, yet
+each one used to go through analyze_stock. The prefilter stacks the last rows
+of the close, high and low prices of many stocks into 2-D arrays and evaluates
+necessary conditions of a platform stock for all of them with a few array
+operations:
+
+- some window has a box range and a return volatility within the thresholds
+- the decline from the high of the lookback period can reach the decline
+  threshold (and the rapid decline threshold)
+
+The conditions are upper bounds of what analyze_stock checks, so a stock the
+prefilter rejects is never a platform stock. Rows with missing prices are
+never rejected, since the analyzers handle them with pandas' NaN semantics.
+"""
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Iterable
+
+# Slack on the threshold comparisons so that rounding differences between the
+# 2-D computation and the analyzers never reject a stock
+PREFILTER_TOLERANCE = 1e-9
+
+# Minimum rows of the decline and position analyzers
+DECLINE_MIN_ROWS = 60
+POSITION_MIN_ROWS = 30
+
+
+def stack_recent_prices(frames: List[pd.DataFrame], rows: int) -> Dict[str, np.ndarray]:
+    """
+    Stack the last rows of the price columns of several K-line frames.
+
+    Args:
+        frames: K-line DataFrames in date order
+        rows: Number of trailing rows to keep
+
+    Returns:
+        Dict with 'close', 'high' and 'low' arrays of shape (len(frames), rows),
+        right-aligned and padded with NaN, and the 'length' of every frame
+    """
+    prices = {name: np.full((len(frames), rows), np.nan) for name in ('close', 'high', 'low')}
+    lengths = np.zeros(len(frames), dtype=int)
+    for i, df in enumerate(frames):
+        lengths[i] = len(df)
+        count = min(len(df), rows)
+        if count == 0:
+            continue
+        for name, values in prices.items():
+            if name in df.columns:
+                column = df[name].iloc[-count:]
+                values[i, rows - count:] = pd.to_numeric(column, errors='coerce').to_numpy(dtype=float)
+    prices['length'] = lengths
+    return prices
+
+
+def _at_most(values: np.ndarray, threshold: float) -> np.ndarray:
+    """values <= threshold, with NaN counting as possibly true."""
+    return ~(values > threshold + PREFILTER_TOLERANCE)
+
+
+def _at_least(values: np.ndarray, threshold: float) -> np.ndarray:
+    """values >= threshold, with NaN counting as possibly true."""
+    return ~(values < threshold - PREFILTER_TOLERANCE)
+
+
+def prefilter_platform_candidates(frames: List[pd.DataFrame],
+                                  windows: Iterable[int],
+                                  box_threshold: float,
+                                  volatility_threshold: float,
+                                  use_low_position: bool = True,
+                                  high_point_lookback_days: int = 365,
+                                  decline_threshold: float = 0.4,
+                                  use_rapid_decline_detection: bool = True,
+                                  rapid_decline_threshold: float = 0.15) -> np.ndarray:
+    """
+    Find the stocks that may be platform stocks.
+
+    Args:
+        frames: K-line DataFrames in date order
+        windows: Window sizes checked by the analysis
+        box_threshold: Maximum allowed price range
+        volatility_threshold: Maximum allowed volatility
+        use_low_position: Whether the analysis requires a low position
+        high_point_lookback_days: Number of days to look back for finding the high point
+        decline_threshold: Minimum decline percentage from high
+        use_rapid_decline_detection: Whether the analysis requires a rapid decline
+        rapid_decline_threshold: Minimum decline percentage within the rapid decline period
+
+    Returns:
+        Boolean array, False for the stocks that cannot be platform stocks
+    """
+    windows = sorted({int(w) for w in windows if int(w) > 0})
+    if not frames:
+        return np.zeros(0, dtype=bool)
+    if not windows:
+        return np.zeros(len(frames), dtype=bool)
+
+    rows = max(windows)
+    if use_low_position:
+        rows = max(rows, high_point_lookback_days)
+    prices = stack_recent_prices(frames, rows)
+    close, high, low, length = prices['close'], prices['high'], prices['low'], prices['length']
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = close[:, 1:] / close[:, :-1] - 1
+
+        # Basic platform: some window has a small box range and low volatility
+        has_platform_window = np.zeros(len(frames), dtype=bool)
+        for window in windows:
+            if window < 3:
+                # Volatility needs at least three rows
+                continue
+            # fmax/fmin skip NaN like pandas' max()/min()
+            window_high = np.fmax.reduce(high[:, -window:], axis=1)
+            window_low = np.fmin.reduce(low[:, -window:], axis=1)
+            box_range = np.where(window_low > 0, (window_high - window_low) / window_low, np.inf)
+            box_range = np.where(np.isnan(window_low), np.nan, box_range)
+            volatility = np.std(returns[:, -(window - 1):], axis=1, ddof=1)
+
+            has_platform_window |= ((length >= window) &
+                                    _at_most(box_range, box_threshold) &
+                                    _at_most(volatility, volatility_threshold))
+        candidates = has_platform_window
+
+        if use_low_position:
+            lookback_high = np.fmax.reduce(high[:, -high_point_lookback_days:], axis=1)
+            if use_rapid_decline_detection:
+                # The decline after the high, and any rapid decline within it, is
+                # at most the decline from the high to the lowest low
+                lookback_low = np.fmin.reduce(low[:, -high_point_lookback_days:], axis=1)
+                max_decline = (lookback_high - lookback_low) / lookback_high
+                candidates &= ((length >= DECLINE_MIN_ROWS) &
+                               _at_least(max_decline, decline_threshold) &
+                               _at_least(max_decline, rapid_decline_threshold))
+            else:
+                position_decline = (lookback_high - close[:, -1]) / lookback_high
+                candidates &= (length >= POSITION_MIN_ROWS) & _at_least(position_decline, decline_threshold)
+
+    return candidates
@@ -5,13 +5,17 @@ import pandas as pd
 import numpy as np
 from typing import Tuple, Dict, Any, List, Optional
 
-def calculate_price_features(df: pd.DataFrame, window: int) -> Dict[str, float]:
+from .feature_engine import WindowFeatureEngine, get_feature_engine
+
+def calculate_price_features(df: pd.DataFrame, window: int,
+                             feature_engine: Optional[WindowFeatureEngine] = None) -> Dict[str, float]:
     """
     Calculate price-related features for platform identification based on a specific window.
     
     Args:
         df: DataFrame containing stock price data
         window: Window size in days
+        feature_engine: Optional feature engine shared across windows and analyzers
     
     Returns:
         Dict containing calculated features:
@@ -26,6 +30,11 @@ def calculate_price_features(df: pd.DataFrame, window: int) -> Dict[str, float]:
             'volatility': float('inf')
         }
     
+    features = get_feature_engine(df, feature_engine).price_features(window)
+    if features is not None:
+        return features
+    
+    # Windows with missing prices keep the pandas computation
     # Get the most recent window of data
     # 从传入的 DataFrame `df` 中选取最后 `window` 数量的行，创建一个新的 DataFrame。
     # `iloc[-window:]` 表示从倒数第 `window` 行开始一直到最后一行。
@@ -69,7 +78,8 @@ def calculate_price_features(df: pd.DataFrame, window: int) -> Dict[str, float]:
 def check_price_pattern(df: pd.DataFrame, window: int, 
                        box_threshold: float, 
                        ma_diff_threshold: float,
-                       volatility_threshold: float) -> Tuple[bool, Dict[str, Any]]:
+                       volatility_threshold: float,
+                       feature_engine: Optional[WindowFeatureEngine] = None) -> Tuple[bool, Dict[str, Any]]:
     """
     Check if a stock's price is in a platform consolidation pattern.
     
@@ -79,6 +89,7 @@ def check_price_pattern(df: pd.DataFrame, window: int,
         box_threshold: Maximum allowed price range
         ma_diff_threshold: Maximum allowed MA convergence
         volatility_threshold: Maximum allowed volatility
+        feature_engine: Optional feature engine shared across windows and analyzers
     
     Returns:
         Tuple of (is_platform, details)
@@ -91,7 +102,7 @@ def check_price_pattern(df: pd.DataFrame, window: int,
         }
     
     # Calculate features
-    features = calculate_price_features(df, window)
+    features = calculate_price_features(df, window, feature_engine)
     
     # Check conditions
     is_platform = (
@@ -130,7 +141,8 @@ def analyze_price(df: pd.DataFrame,
                  window: int,
                  box_threshold: float, 
                  ma_diff_threshold: float,
-                 volatility_threshold: float) -> Dict[str, Any]:
+                 volatility_threshold: float,
+                 feature_engine: Optional[WindowFeatureEngine] = None) -> Dict[str, Any]:
     """
     Analyze a stock's price pattern for a specific time window.
     
@@ -140,6 +152,7 @@ def analyze_price(df: pd.DataFrame,
         box_threshold: Maximum allowed price range
         ma_diff_threshold: Maximum allowed MA convergence
         volatility_threshold: Maximum allowed volatility
+        feature_engine: Optional feature engine shared across windows and analyzers
     
     Returns:
         Dict containing price analysis results
@@ -153,7 +166,8 @@ def analyze_price(df: pd.DataFrame,
     
     # Check price pattern
     is_price_platform, details = check_price_pattern(
-        df, window, box_threshold, ma_diff_threshold, volatility_threshold
+        df, window, box_threshold, ma_diff_threshold, volatility_threshold,
+        feature_engine
     )
     
     return {
@@ -0,0 +1,443 @@
+"""
+Rolling Platform module for per-day platform detection over a sliding frame.
+
+Marking every trading day as platform / non-platform used to run the full
+analyze_stock on a fresh copy of the trailing frame for every day. The
+RollingPlatformEvaluator keeps streaming state instead and updates it as the
+frame slides by one day:
+
+    - monotonic deques holding the rolling max of highs and min of lows of
+      every window
+    - running sums of close, close * index, daily returns, volume and their
+      squares, so window means, volatility, MA dispersion, volume ratios and
+      regression slopes are O(1) differences
+    - confirmed local extrema (argrelextrema with order 5) of highs and lows;
+      only the few points within `order` rows of a window edge are rechecked
+    - rolling sorted lists of highs, lows and closes per box window, so level
+      touches and box containment are counted with binary search
+
+The per-day decision matches analyze_stock(...)['is_platform'] for configs
+without low position analysis (position analysis needs a year of history,
+more than the frame holds). Frames containing missing or non-positive prices
+are reported as None so callers can fall back to analyze_stock.
+"""
+import bisect
+import math
+from collections import deque
+from typing import Callable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .box_detector import cluster_price_levels
+from .feature_engine import MA_PERIODS, VOLUME_HISTORY_ROWS
+
+
+def _count_near(sorted_values: List[float], level: float, tolerance: float) -> int:
+    """
+    Count values with abs(value - level) / level <= tolerance.
+
+    The predicate is monotone on each side of the level, so both ends of the
+    matching range are found by binary search with the exact same expression
+    calculate_level_strength uses.
+    """
+    mid = bisect.bisect_left(sorted_values, level)
+    # First value at or above the level that is too far away
+    end = bisect.bisect_left(sorted_values, True, lo=mid,
+                             key=lambda v: abs(v - level) / level > tolerance)
+    # First value below the level that is close enough
+    begin = bisect.bisect_left(sorted_values, True, hi=mid,
+                               key=lambda v: abs(v - level) / level <= tolerance)
+    return end - begin
+
+
+def _height_factor(box_height_pct: float) -> float:
+    # Ideal range: 3% to 20%
+    if 0.03 <= box_height_pct <= 0.2:
+        return 1.0
+    elif box_height_pct < 0.03:
+        return box_height_pct / 0.03
+    return max(0, 1 - (box_height_pct - 0.2) / 0.3)
+
+
+class RollingPlatformEvaluator:
+    """
+    Streaming evaluator of the platform status of a sliding frame.
+
+    Usage:
+        evaluator = RollingPlatformEvaluator(config, frame_size=120)
+        for high, low, close, volume in rows:
+            evaluator.push(high, low, close, volume)
+            if evaluator.ready:
+                status = evaluator.evaluate()  # True, False or None (fall back)
+    """
+
+    def __init__(self, config, frame_size: int = 120,
+                 extrema_order: int = 5, has_volume: bool = True):
+        """
+        Args:
+            config: ScanConfig with the platform thresholds
+            frame_size: Number of trailing rows analyzed per day
+            extrema_order: Order used for local extrema detection
+            has_volume: Whether the data has a volume column
+        """
+        self.config = config
+        self.frame_size = frame_size
+        self.order = extrema_order
+        self.has_volume = has_volume
+        self.windows = list(config.windows)
+        self.max_window = max(self.windows) if self.windows else 90
+
+        # Windows whose box pattern may be needed
+        self.box_windows = sorted({w for w in self.windows if w <= frame_size} |
+                                  ({self.max_window} if self.max_window <= frame_size else set()))
+
+        self.high: List[float] = []
+        self.low: List[float] = []
+        self.close: List[float] = []
+        self.volume: List[float] = []
+
+        # Running sums with a leading zero: sum(x[a:b]) == s[b] - s[a]
+        self._close_sum = [0.0]
+        self._close_index_sum = [0.0]
+        self._return_sum = [0.0]
+        self._return_sq_sum = [0.0]
+        self._volume_sum = [0.0]
+        self._volume_sq_sum = [0.0]
+        self._bad_rows = [0]
+
+        # Monotonic deques of indices: rolling max high / min low per window
+        self.price_windows = sorted({w for w in self.windows if w <= frame_size})
+        self._high_max = {w: deque() for w in self.price_windows}
+        self._low_min = {w: deque() for w in self.price_windows}
+
+        # Indices of extrema confirmed over their full neighbourhood
+        self._maxima: List[int] = []
+        self._minima: List[int] = []
+
+        # Sorted values of the rows inside each box window
+        self._sorted = {w: {'high': [], 'low': [], 'close': []} for w in self.box_windows}
+
+    @staticmethod
+    def supports(config) -> bool:
+        """Check whether the per-day status of a config can be evaluated incrementally."""
+        return not config.use_low_position
+
+    @property
+    def ready(self) -> bool:
+        """Whether a full frame has been pushed."""
+        return len(self.close) >= self.frame_size
+
+    # --- Streaming state ---
+
+    def push(self, high: float, low: float, close: float, volume: float = 0.0) -> None:
+        """Append the next trading day."""
+        i = len(self.close)
+        prices_ok = all(math.isfinite(v) and v > 0 for v in (high, low, close))
+        volume_ok = math.isfinite(volume) or not self.has_volume
+
+        self.high.append(high)
+        self.low.append(low)
+        self.close.append(close)
+        self.volume.append(volume)
+
+        self._bad_rows.append(self._bad_rows[-1] + (0 if prices_ok and volume_ok else 1))
+
+        finite_close = close if prices_ok else 0.0
+        self._close_sum.append(self._close_sum[-1] + finite_close)
+        self._close_index_sum.append(self._close_index_sum[-1] + finite_close * i)
+
+        daily_return = 0.0
+        if i > 0 and prices_ok:
+            daily_return = close / self.close[i - 1] - 1
+            if not math.isfinite(daily_return):
+                daily_return = 0.0
+        self._return_sum.append(self._return_sum[-1] + daily_return)
+        self._return_sq_sum.append(self._return_sq_sum[-1] + daily_return * daily_return)
+
+        finite_volume = volume if math.isfinite(volume) else 0.0
+        self._volume_sum.append(self._volume_sum[-1] + finite_volume)
+        self._volume_sq_sum.append(self._volume_sq_sum[-1] + finite_volume * finite_volume)
+
+        # Rolling extrema; missing prices never win so the deques stay monotonic
+        rolling_high = high if math.isfinite(high) else -math.inf
+        rolling_low = low if math.isfinite(low) else math.inf
+        for w in self.price_windows:
+            high_max = self._high_max[w]
+            while high_max and self._rolling_high(high_max[-1]) <= rolling_high:
+                high_max.pop()
+            high_max.append(i)
+            if high_max[0] <= i - w:
+                high_max.popleft()
+
+            low_min = self._low_min[w]
+            while low_min and self._rolling_low(low_min[-1]) >= rolling_low:
+                low_min.pop()
+            low_min.append(i)
+            if low_min[0] <= i - w:
+                low_min.popleft()
+
+        # The point `order` rows back now has its full neighbourhood
+        p = i - self.order
+        if p >= self.order:
+            if self._is_extremum(self.high, p, p - self.order, i, greater=True):
+                self._maxima.append(p)
+            if self._is_extremum(self.low, p, p - self.order, i, greater=False):
+                self._minima.append(p)
+
+        # Slide the sorted windows
+        for w, lists in self._sorted.items():
+            for name, value in (('high', high), ('low', low), ('close', close)):
+                if math.isfinite(value):
+                    bisect.insort(lists[name], value)
+            if i >= w:
+                for name, series in (('high', self.high), ('low', self.low), ('close', self.close)):
+                    old = series[i - w]
+                    if math.isfinite(old):
+                        values = lists[name]
+                        del values[bisect.bisect_left(values, old)]
+
+    def _rolling_high(self, i: int) -> float:
+        value = self.high[i]
+        return value if math.isfinite(value) else -math.inf
+
+    def _rolling_low(self, i: int) -> float:
+        value = self.low[i]
+        return value if math.isfinite(value) else math.inf
+
+    @staticmethod
+    def _is_extremum(values: List[float], p: int, first: int, last: int, greater: bool) -> bool:
+        """Check values[p] against every neighbour in [first, last] (argrelextrema semantics)."""
+        v = values[p]
+        for j in range(first, last + 1):
+            if j == p:
+                continue
+            if greater:
+                if not v > values[j]:
+                    return False
+            elif not v < values[j]:
+                return False
+        return True
+
+    # --- Window features ---
+
+    def _window_extrema(self, confirmed: List[int], values: List[float],
+                        start: int, end: int, greater: bool) -> List[float]:
+        """Values of the local extrema of values[start:end + 1] as argrelextrema finds them."""
+        order = self.order
+        points = []
+        if end - start + 1 < 2 * order + 2:
+            edge_points = range(start + 1, end)
+        else:
+            # Points with their whole neighbourhood inside the window
+            lo = bisect.bisect_left(confirmed, start + order)
+            hi = bisect.bisect_right(confirmed, end - order)
+            points.extend(confirmed[lo:hi])
+            edge_points = list(range(start + 1, start + order)) + list(range(end - order + 1, end))
+
+        # Points near the edges compare against the clipped neighbourhood
+        for p in edge_points:
+            if self._is_extremum(values, p, max(start, p - order), min(end, p + order), greater):
+                points.append(p)
+        return [values[p] for p in points]
+
+    def _volatility(self, w: int) -> float:
+        """Sample std of the w - 1 daily returns inside the last w rows."""
+        n = len(self.close)
+        count = w - 1
+        if count < 2:
+            return float('nan')
+        total = self._return_sum[n] - self._return_sum[n - count]
+        total_sq = self._return_sq_sum[n] - self._return_sq_sum[n - count]
+        var = (total_sq - total * total / count) / (count - 1)
+        return math.sqrt(max(var, 0.0))
+
+    def _price_ok(self, w: int) -> bool:
+        """Price pattern of check_price_pattern for the last w rows."""
+        config = self.config
+        n = len(self.close)
+
+        price_low = self.low[self._low_min[w][0]]
+        price_high = self.high[self._high_max[w][0]]
+        box_range = (price_high - price_low) / price_low
+        if not box_range <= config.box_threshold:
+            return False
+
+        ma_values = [(self._close_sum[n] - self._close_sum[n - p]) / p
+                     for p in MA_PERIODS if p <= w]
+        if len(ma_values) >= 2:
+            ma_mean = float(np.mean(ma_values))
+            ma_diff = float(np.std(ma_values)) / ma_mean if ma_mean > 0 else float('inf')
+        else:
+            ma_diff = float('inf')
+        if not ma_diff <= config.ma_diff_threshold:
+            return False
+
+        volatility = self._volatility(w) if w >= 3 else float('inf')
+        return volatility <= config.volatility_threshold
+
+    def _volume_ok(self, w: int) -> bool:
+        """Consolidation volume pattern of check_volume_pattern for the last w rows."""
+        config = self.config
+        if self.frame_size < w + VOLUME_HISTORY_ROWS:
+            return False
+
+        n = len(self.close)
+        start = n - w
+        previous_start = n - self.frame_size + max(0, self.frame_size - 2 * w)
+
+        recent_sum = self._volume_sum[n] - self._volume_sum[start]
+        recent_avg = recent_sum / w
+        previous_avg = (self._volume_sum[start] - self._volume_sum[previous_start]) / (start - previous_start)
+
+        change_ratio = recent_avg / previous_avg if previous_avg > 0 else float('nan')
+        if not change_ratio <= config.volume_change_threshold:
+            return False
+
+        recent_sq_sum = self._volume_sq_sum[n] - self._volume_sq_sum[start]
+        var = (recent_sq_sum - recent_sum * recent_sum / w) / (w - 1) if w > 1 else float('nan')
+        stability = math.sqrt(max(var, 0.0)) / recent_avg if recent_avg > 0 else float('nan')
+        return stability <= config.volume_stability_threshold
+
+    def _box_quality(self, w: int) -> float:
+        """box_quality of identify_support_resistance for the last w rows (NaN if no box)."""
+        n = len(self.close)
+        start, end = n - w, n - 1
+        lists = self._sorted[w]
+
+        resistance_levels = cluster_price_levels(
+            np.array(self._window_extrema(self._maxima, self.high, start, end, greater=True)))
+        support_levels = cluster_price_levels(
+            np.array(self._window_extrema(self._minima, self.low, start, end, greater=False)))
+
+        if len(support_levels) == 0 or len(resistance_levels) == 0:
+            return float('nan')
+
+        main_support = support_levels[0]
+        main_resistance = resistance_levels[0]
+        support_strength = _count_near(lists['low'], main_support, 0.01)
+        resistance_strength = _count_near(lists['high'], main_resistance, 0.01)
+
+        box_height_pct = (main_resistance - main_support) / main_support
+
+        closes = lists['close']
+        contained = bisect.bisect_right(closes, main_resistance * 1.02) - \
+            bisect.bisect_left(closes, main_support * 0.98)
+        prices_in_box = max(contained, 0) / w
+
+        # Least-squares slope of the closes against 0..w-1
+        total = self._close_sum[n] - self._close_sum[start]
+        index_total = self._close_index_sum[n] - self._close_index_sum[start] - start * total
+        slope = (index_total - (w - 1) / 2.0 * total) / (w * (w * w - 1) / 12.0)
+        avg_price = total / w
+        norm_slope = abs(slope) / avg_price
+
+        support_factor = min(support_strength / 2, 1.0)
+        resistance_factor = min(resistance_strength / 2, 1.0)
+        trend_factor = max(0, 1 - norm_slope * 100)
+
+        return (support_factor * 0.25 +
+                resistance_factor * 0.25 +
+                prices_in_box * 0.2 +
+                trend_factor * 0.15 +
+                _height_factor(box_height_pct) * 0.15)
+
+    def _box_ok(self, w: int) -> bool:
+        """Box pattern of check_box_pattern for the last w rows."""
+        box_quality = self._box_quality(w)
+        if math.isnan(box_quality) or not box_quality >= 0.6:
+            return False
+        if not round(np.float64(box_quality), 2) >= self.config.box_quality_threshold:
+            return False
+        volatility = self._volatility(w)
+        if math.isnan(volatility):
+            return False
+        return round(np.float64(volatility), 4) <= self.config.volatility_threshold
+
+    # --- Evaluation ---
+
+    def evaluate(self) -> Optional[bool]:
+        """
+        Evaluate the platform status of the latest frame.
+
+        Returns:
+            True/False, or None if the frame contains missing or non-positive
+            values and has to be analyzed with analyze_stock
+        """
+        config = self.config
+        n = len(self.close)
+        if n < self.frame_size:
+            return False
+        if self._bad_rows[n] - self._bad_rows[n - self.frame_size] != 0:
+            return None
+
+        is_basic_platform = False
+        for w in self.windows:
+            if w > self.frame_size:
+                continue
+            if not self._price_ok(w):
+                continue
+            if config.use_box_detection:
+                # The enhanced analyzer always checks volume when it is available
+                if self.has_volume and not self._volume_ok(w):
+                    continue
+                if not self._box_ok(w):
+                    continue
+            elif config.use_volume_analysis and self.has_volume and not self._volume_ok(w):
+                continue
+            is_basic_platform = True
+            break
+
+        if not is_basic_platform:
+            return False
+        if not config.use_box_detection:
+            return True
+
+        # The largest window must also form a box pattern
+        if self.max_window > self.frame_size:
+            return False
+        box_quality = self._box_quality(self.max_window)
+        return not math.isnan(box_quality) and box_quality >= 0.6
+
+
+def rolling_platform_status(df: pd.DataFrame, config,
+                            frame_size: int = 120,
+                            start: Optional[int] = None,
+                            fallback: Optional[Callable[[pd.DataFrame], bool]] = None) -> np.ndarray:
+    """
+    Get the per-day platform status of a K-line frame in a single pass.
+
+    Args:
+        df: DataFrame with high, low, close and (optionally) volume columns
+        config: ScanConfig with the platform thresholds (see RollingPlatformEvaluator.supports)
+        frame_size: Number of trailing rows analyzed per day
+        start: First row to evaluate (default: frame_size - 1)
+        fallback: Called with the trailing frame of days the rolling state
+            cannot evaluate; those days get status 0 if not given
+
+    Returns:
+        np.ndarray of 0/1 status values, one per row
+    """
+    status = np.zeros(len(df), dtype=int)
+    if start is None:
+        start = frame_size - 1
+
+    has_volume = 'volume' in df.columns
+    high = pd.to_numeric(df['high'], errors='coerce').to_numpy(dtype=float)
+    low = pd.to_numeric(df['low'], errors='coerce').to_numpy(dtype=float)
+    close = pd.to_numeric(df['close'], errors='coerce').to_numpy(dtype=float)
+    volume = pd.to_numeric(df['volume'], errors='coerce').to_numpy(dtype=float) if has_volume \
+        else np.zeros(len(df))
+
+    evaluator = RollingPlatformEvaluator(config, frame_size, has_volume=has_volume)
+    for i in range(len(df)):
+        evaluator.push(float(high[i]), float(low[i]), float(close[i]), float(volume[i]))
+        if i < start or not evaluator.ready:
+            continue
+
+        is_platform = evaluator.evaluate()
+        if is_platform is None and fallback is not None:
+            is_platform = fallback(df.iloc[i - frame_size + 1:i + 1].copy())
+        status[i] = 1 if is_platform else 0
+
+    return status
@@ -5,13 +5,17 @@ import pandas as pd
 import numpy as np
 from typing import Dict, Any, Tuple, Optional
 
-def calculate_volume_features(df: pd.DataFrame, window: int) -> Dict[str, float]:
+from .feature_engine import WindowFeatureEngine, get_feature_engine
+
+def calculate_volume_features(df: pd.DataFrame, window: int,
+                              feature_engine: Optional[WindowFeatureEngine] = None) -> Dict[str, float]:
     """
     Calculate volume-related features for a given window.
     
     Args:
         df: DataFrame containing stock price and volume data
         window: Window size in days
+        feature_engine: Optional feature engine shared across windows and analyzers
     
     Returns:
         Dict containing calculated volume features:
@@ -26,6 +30,11 @@ def calculate_volume_features(df: pd.DataFrame, window: int) -> Dict[str, float]
             'volume_trend': float('nan')
         }
     
+    features = get_feature_engine(df, feature_engine).volume_features(window)
+    if features is not None:
+        return features
+    
+    # Windows with missing volume keep the pandas computation
     # Get the most recent window of data and previous data for comparison
     recent_df = df.iloc[-window:].copy()
     previous_df = df.iloc[-(window*2):-window].copy()
@@ -63,7 +72,8 @@ def calculate_volume_features(df: pd.DataFrame, window: int) -> Dict[str, float]
 
 def check_volume_pattern(df: pd.DataFrame, window: int, 
                          volume_change_threshold: float = 0.8,
-                         volume_stability_threshold: float = 0.5) -> Tuple[bool, Dict[str, Any]]:
+                         volume_stability_threshold: float = 0.5,
+                         feature_engine: Optional[WindowFeatureEngine] = None) -> Tuple[bool, Dict[str, Any]]:
     """
     Check if a stock has a consolidation volume pattern (typically decreasing or stable volume).
     
@@ -72,6 +82,7 @@ def check_volume_pattern(df: pd.DataFrame, window: int,
         window: Window size in days
         volume_change_threshold: Maximum allowed volume change ratio
         volume_stability_threshold: Maximum allowed volume stability
+        feature_engine: Optional feature engine shared across windows and analyzers
     
     Returns:
         Tuple of (is_consolidation_volume, details)
@@ -84,7 +95,7 @@ def check_volume_pattern(df: pd.DataFrame, window: int,
         }
     
     # Calculate volume features
-    features = calculate_volume_features(df, window)
+    features = calculate_volume_features(df, window, feature_engine)
     
     # Check conditions for consolidation volume pattern
     # Typically, we want decreasing or stable volume during consolidation
@@ -117,7 +128,8 @@ def check_volume_pattern(df: pd.DataFrame, window: int,
     return is_consolidation_volume, details
 
 def check_volume_breakthrough(df: pd.DataFrame, window: int = 5, 
-                             volume_increase_threshold: float = 1.5) -> Tuple[bool, Dict[str, Any]]:
+                             volume_increase_threshold: float = 1.5,
+                             feature_engine: Optional[WindowFeatureEngine] = None) -> Tuple[bool, Dict[str, Any]]:
     """
     Check if a stock has a volume breakthrough pattern (typically increasing volume).
     
@@ -125,6 +137,7 @@ def check_volume_breakthrough(df: pd.DataFrame, window: int = 5,
         df: DataFrame containing stock price and volume data
         window: Window size in days for recent volume
         volume_increase_threshold: Minimum required volume increase ratio
+        feature_engine: Optional feature engine shared across windows and analyzers
     
     Returns:
         Tuple of (is_breakthrough, details)
@@ -136,13 +149,19 @@ def check_volume_breakthrough(df: pd.DataFrame, window: int = 5,
             "data_points": len(df)
         }
     
-    # Get the most recent window of data and previous data for comparison
-    recent_df = df.iloc[-window:].copy()
-    previous_df = df.iloc[-(window*3):-window].copy()
-    
-    # Calculate average volume
-    recent_avg_volume = recent_df['volume'].mean()
-    previous_avg_volume = previous_df['volume'].mean()
+    # Compare the recent window with the two windows before it
+    means = get_feature_engine(df, feature_engine).volume_means(window, window * 2)
+    if means is not None:
+        recent_avg_volume = means['recent_avg_volume']
+        previous_avg_volume = means['previous_avg_volume']
+    else:
+        # Windows with missing volume keep the pandas computation
+        recent_df = df.iloc[-window:].copy()
+        previous_df = df.iloc[-(window*3):-window].copy()
+        
+        # Calculate average volume
+        recent_avg_volume = recent_df['volume'].mean()
+        previous_avg_volume = previous_df['volume'].mean()
     
     # Calculate volume increase ratio
     if previous_avg_volume > 0:
@@ -172,7 +191,8 @@ def check_volume_breakthrough(df: pd.DataFrame, window: int = 5,
 def analyze_volume(df: pd.DataFrame, window: int, 
                   volume_change_threshold: float = 0.8,
                   volume_stability_threshold: float = 0.5,
-                  volume_increase_threshold: float = 1.5) -> Dict[str, Any]:
+                  volume_increase_threshold: float = 1.5,
+                  feature_engine: Optional[WindowFeatureEngine] = None) -> Dict[str, Any]:
     """
     Analyze volume patterns for a stock.
     
@@ -182,6 +202,7 @@ def analyze_volume(df: pd.DataFrame, window: int,
         volume_change_threshold: Maximum allowed volume change ratio for consolidation
         volume_stability_threshold: Maximum allowed volume stability for consolidation
         volume_increase_threshold: Minimum required volume increase ratio for breakthrough
+        feature_engine: Optional feature engine shared across windows and analyzers
     
     Returns:
         Dict containing volume analysis results
@@ -196,12 +217,13 @@ def analyze_volume(df: pd.DataFrame, window: int,
     
     # Check for consolidation volume pattern
     has_consolidation_volume, consolidation_details = check_volume_pattern(
-        df, window, volume_change_threshold, volume_stability_threshold
+        df, window, volume_change_threshold, volume_stability_threshold,
+        feature_engine
     )
     
     # Check for volume breakthrough
     has_breakthrough, breakthrough_details = check_volume_breakthrough(
-        df, min(5, window), volume_increase_threshold
+        df, min(5, window), volume_increase_threshold, feature_engine
     )
     
     return {
@@ -10,7 +10,7 @@ from .case_manager import (
     get_cases, get_case, create_case, update_case,
     delete_case, create_anjishi_case, create_case_from_analysis
 )
-from .json_utils import sanitize_float_for_json
+from .json_utils import SafeJSONResponse
 
 # Create router
 router = APIRouter()
@@ -54,10 +54,8 @@ async def list_cases():
     Get all cases.
     """
     cases = get_cases()
-    # Sanitize the cases data to handle NaN values
-    sanitized_cases = sanitize_float_for_json(cases)
     return {
-        "cases": sanitized_cases,
+        "cases": cases,
         "lastUpdated": cases[0]["updatedAt"] if cases else ""
     }
 
@@ -71,9 +69,8 @@ async def get_case_by_id(case_id: str):
     if not case_data:
         raise HTTPException(status_code=404, detail="Case not found")
 
-    # Sanitize the case data to handle NaN values
-    sanitized_data = sanitize_float_for_json(case_data)
-    return sanitized_data
+    # NaN/Infinity values are written as null while the response is encoded
+    return SafeJSONResponse(case_data)
 
 
 @router.post("/cases")
@@ -83,7 +80,7 @@ async def create_new_case(case_data: Dict[str, Any] = Body(...)):
     """
     try:
         result = create_case(case_data)
-        return result
+        return SafeJSONResponse(result)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -99,7 +96,7 @@ async def update_existing_case(case_id: str, case_data: Dict[str, Any] = Body(..
     result = update_case(case_id, case_data)
     if not result:
         raise HTTPException(status_code=404, detail="Case not found")
-    return result
+    return SafeJSONResponse(result)
 
 
 @router.delete("/cases/{case_id}")
@@ -120,7 +117,7 @@ async def create_anjishi_case_endpoint():
     """
     try:
         result = create_anjishi_case()
-        return result
+        return SafeJSONResponse(result)
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Failed to create Anjishi case: {str(e)}")
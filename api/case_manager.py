@@ -8,7 +8,7 @@ from datetime import datetime
 from typing import Dict, List, Any, Optional
 import pandas as pd
 
-from .json_utils import sanitize_float_for_json, sanitize_kline_data
+from .json_utils import dump_json_file, load_json_file
 
 # Define the case directory
 CASE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'cases')
@@ -21,9 +21,7 @@ INDEX_FILE = os.path.join(CASE_DIR, 'index.json')
 
 # Initialize the index file if it doesn't exist
 if not os.path.exists(INDEX_FILE):
-    with open(INDEX_FILE, 'w', encoding='utf-8') as f:
-        json.dump({'cases': [], 'lastUpdated': datetime.now(
-        ).isoformat()}, f, ensure_ascii=False, indent=2)
+    dump_json_file({'cases': [], 'lastUpdated': datetime.now().isoformat()}, INDEX_FILE)
 
 
 def get_cases() -> List[Dict[str, Any]]:
@@ -34,9 +32,8 @@ def get_cases() -> List[Dict[str, Any]]:
         List of case metadata.
     """
     try:
-        with open(INDEX_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            return data.get('cases', [])
+        data = load_json_file(INDEX_FILE)
+        return data.get('cases', [])
     except Exception as e:
         print(f"Error loading cases: {e}")
         return []
@@ -78,14 +75,12 @@ def get_case(case_id: str) -> Optional[Dict[str, Any]]:
     # Load analysis if exists
     analysis_file = os.path.join(case_dir, 'analysis.json')
     if os.path.exists(analysis_file):
-        with open(analysis_file, 'r', encoding='utf-8') as f:
-            result['analysis'] = json.load(f)
+        result['analysis'] = load_json_file(analysis_file)
 
     # Load K-line data if exists
     kline_file = os.path.join(case_dir, 'kline_data.json')
     if os.path.exists(kline_file):
-        with open(kline_file, 'r', encoding='utf-8') as f:
-            result['kline_data'] = json.load(f)
+        result['kline_data'] = load_json_file(kline_file)
 
     return result
 
@@ -135,31 +130,23 @@ def create_case(case_data: Dict[str, Any]) -> Dict[str, Any]:
         'tags': case_data['tags']
     })
 
-    with open(INDEX_FILE, 'w', encoding='utf-8') as f:
-        json.dump({
-            'cases': cases,
-            'lastUpdated': now
-        }, f, ensure_ascii=False, indent=2)
+    dump_json_file({
+        'cases': cases,
+        'lastUpdated': now
+    }, INDEX_FILE)
 
     # Save description if provided
     if 'description' in case_data:
         with open(os.path.join(case_dir, 'description.md'), 'w', encoding='utf-8') as f:
             f.write(case_data['description'])
 
-    # Save analysis if provided
+    # Save analysis if provided (NaN/Infinity are written as null)
     if 'analysis' in case_data:
-        sanitized_analysis = sanitize_float_for_json(case_data['analysis'])
-        with open(os.path.join(case_dir, 'analysis.json'), 'w', encoding='utf-8') as f:
-            json.dump(sanitized_analysis, f, ensure_ascii=False, indent=2)
+        dump_json_file(case_data['analysis'], os.path.join(case_dir, 'analysis.json'))
 
     # Save K-line data if provided
     if 'kline_data' in case_data:
-        sanitized_kline_data = case_data['kline_data'].copy()
-        if 'data' in sanitized_kline_data:
-            sanitized_kline_data['data'] = sanitize_kline_data(
-                sanitized_kline_data['data'])
-        with open(os.path.join(case_dir, 'kline_data.json'), 'w', encoding='utf-8') as f:
-            json.dump(sanitized_kline_data, f, ensure_ascii=False, indent=2)
+        dump_json_file(case_data['kline_data'], os.path.join(case_dir, 'kline_data.json'))
 
     return case_data
 
@@ -194,11 +181,10 @@ def update_case(case_id: str, case_data: Dict[str, Any]) -> Optional[Dict[str, A
 
     cases[case_index]['updatedAt'] = now
 
-    with open(INDEX_FILE, 'w', encoding='utf-8') as f:
-        json.dump({
-            'cases': cases,
-            'lastUpdated': now
-        }, f, ensure_ascii=False, indent=2)
+    dump_json_file({
+        'cases': cases,
+        'lastUpdated': now
+    }, INDEX_FILE)
 
     # Case directory path
     case_dir = os.path.join(CASE_DIR, case_id)
@@ -211,20 +197,13 @@ def update_case(case_id: str, case_data: Dict[str, Any]) -> Optional[Dict[str, A
         with open(os.path.join(case_dir, 'description.md'), 'w', encoding='utf-8') as f:
             f.write(case_data['description'])
 
-    # Update analysis if provided
+    # Update analysis if provided (NaN/Infinity are written as null)
     if 'analysis' in case_data:
-        sanitized_analysis = sanitize_float_for_json(case_data['analysis'])
-        with open(os.path.join(case_dir, 'analysis.json'), 'w', encoding='utf-8') as f:
-            json.dump(sanitized_analysis, f, ensure_ascii=False, indent=2)
+        dump_json_file(case_data['analysis'], os.path.join(case_dir, 'analysis.json'))
 
     # Update K-line data if provided
     if 'kline_data' in case_data:
-        sanitized_kline_data = case_data['kline_data'].copy()
-        if 'data' in sanitized_kline_data:
-            sanitized_kline_data['data'] = sanitize_kline_data(
-                sanitized_kline_data['data'])
-        with open(os.path.join(case_dir, 'kline_data.json'), 'w', encoding='utf-8') as f:
-            json.dump(sanitized_kline_data, f, ensure_ascii=False, indent=2)
+        dump_json_file(case_data['kline_data'], os.path.join(case_dir, 'kline_data.json'))
 
     return get_case(case_id)
 
@@ -250,11 +229,10 @@ def delete_case(case_id: str) -> bool:
     # Remove from index
     cases.pop(case_index)
 
-    with open(INDEX_FILE, 'w', encoding='utf-8') as f:
-        json.dump({
-            'cases': cases,
-            'lastUpdated': datetime.now().isoformat()
-        }, f, ensure_ascii=False, indent=2)
+    dump_json_file({
+        'cases': cases,
+        'lastUpdated': datetime.now().isoformat()
+    }, INDEX_FILE)
 
     # Remove case directory
     case_dir = os.path.join(CASE_DIR, case_id)
@@ -417,8 +395,6 @@ def create_case_from_analysis(stock_data: Dict[str, Any], analysis_result: Dict[
     kline_data_list = []
     if not kline_data.empty:
         kline_data_list = kline_data.to_dict('records')
-        # Sanitize kline data to handle NaN values
-        kline_data_list = sanitize_kline_data(kline_data_list)
 
     # Create case data
     case_data = {
@@ -427,7 +403,7 @@ def create_case_from_analysis(stock_data: Dict[str, Any], analysis_result: Dict[
         'stockName': stock_data['name'],
         'tags': tags,
         'description': description,
-        'analysis': sanitize_float_for_json(analysis_result),
+        'analysis': analysis_result,
         'kline_data': {
             'code': stock_data['code'],
             'name': stock_data['name'],
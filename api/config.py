@@ -1,9 +1,12 @@
 """
 Configuration module for stock platform scanner.
 """
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Literal
 from pydantic import BaseModel, Field
 
+# Names of the K-line data sources (data_source.DATA_SOURCES)
+DataSourceName = Literal['network', 'cache', 'cache_first']
+
 
 class ScanConfig(BaseModel):
     """Configuration model for stock platform scanner."""
@@ -79,8 +82,30 @@ class ScanConfig(BaseModel):
     window_weights: Dict[int, float] = Field(
         default_factory=dict)  # Weights for different windows
 
+    # Stock universe settings
+    # Scan only codes starting with one of these prefixes, e.g. 'sh.60' (empty = all)
+    code_prefixes: List[str] = Field(default_factory=list)
+    # Scan only these codes (empty = all)
+    include_codes: List[str] = Field(default_factory=list)
+    # Codes never scanned
+    exclude_codes: List[str] = Field(default_factory=list)
+
+    # Data source settings
+    # Where scans read K-line data from: 'network', 'cache' or 'cache_first'
+    data_source: DataSourceName = "cache_first"
+    # Maximum age in days of cached K-line data used by 'cache_first'
+    cache_max_staleness_days: int = 3
+
     # System settings
     max_workers: int = 5
+    # Number of analysis worker processes (0 = one per CPU core)
+    analysis_workers: int = 0
+    # Maximum fetched stocks waiting for analysis
+    pipeline_queue_size: int = 64
+    # Reject stocks with vectorized necessary conditions before the full analysis
+    use_prefilter: bool = True
+    # Maximum number of fetched stocks prefiltered together
+    prefilter_batch_size: int = 256
     retry_attempts: int = 2
     retry_delay: int = 1
     expected_count: int = 10
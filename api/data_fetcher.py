@@ -4,60 +4,222 @@ Implements robust connection handling and retry logic.
 """
 import baostock as bs
 import pandas as pd
+import os
 import time
+import atexit
 import threading
+from contextlib import contextmanager
+from datetime import datetime
 from typing import List, Dict, Any, Optional
 from colorama import Fore, Style
 import traceback
 
-# Thread-local storage for Baostock connections
-_thread_local = threading.local()
+# Fields requested for daily K-line data
+KLINE_FIELDS = "date,open,high,low,close,volume,turn,preclose,pctChg,peTTM,pbMRQ"
+KLINE_NUMERIC_COLUMNS = ['open', 'high', 'low', 'close', 'volume', 'turn', 'preclose', 'pctChg', 'peTTM', 'pbMRQ']
+
+# A session idle for longer than this is probed before it is leased again
+SESSION_PROBE_IDLE = 60
+# Seconds between keep-alive checks of an idle session
+SESSION_KEEPALIVE_INTERVAL = 120
+# An idle session without holders is logged out after this many seconds
+SESSION_MAX_IDLE = 1800
+
+
+class BaostockSessionPool:
+    """
+    Process-wide pool of Baostock sessions.
+
+    The Baostock client keeps a single global socket per process, so the pool
+    holds one session that every thread shares: leases serialize access to it
+    (re-entrant within a thread) instead of each thread or call logging in and
+    out on its own. The session logs in on the first lease and stays logged in
+    across scans; a session idle for SESSION_PROBE_IDLE seconds is probed
+    before it is leased, and a session reported broken is logged in again on
+    the next lease. A keep-alive thread probes the idle session and logs out
+    after SESSION_MAX_IDLE seconds without leases or holders.
+    """
+
+    def __init__(self, client=bs,
+                 probe_idle: float = SESSION_PROBE_IDLE,
+                 keepalive_interval: float = SESSION_KEEPALIVE_INTERVAL,
+                 max_idle: float = SESSION_MAX_IDLE):
+        self.client = client
+        self.probe_idle = probe_idle
+        self.keepalive_interval = keepalive_interval
+        self.max_idle = max_idle
+        self.pid = os.getpid()
+        self._lock = threading.RLock()
+        self._logged_in = False
+        self._stale = False
+        self._last_used = 0.0
+        self._last_checked = 0.0
+        self._holders = 0
+        self._keepalive = None
+        self.stats = {'logins': 0, 'relogins': 0, 'probes': 0, 'failed_probes': 0, 'leases': 0}
+
+    # --- Session state (callers hold self._lock) ---
+
+    def _login(self) -> None:
+        lg = self.client.login()
+        if lg.error_code != '0':
+            print(f"{Fore.RED}Baostock login failed: {lg.error_msg}{Style.RESET_ALL}")
+            raise ConnectionError(f"Baostock login failed: {lg.error_msg}")
+        self._logged_in = True
+        self._stale = False
+        self._last_used = self._last_checked = time.time()
+        self.stats['logins'] += 1
+        print(f"{Fore.GREEN}Baostock login successful in process {self.pid}{Style.RESET_ALL}")
+
+        if self._keepalive is None or not self._keepalive.is_alive():
+            self._keepalive = threading.Thread(target=self._keepalive_loop,
+                                               name="baostock-keepalive", daemon=True)
+            self._keepalive.start()
+
+    def _logout(self) -> None:
+        try:
+            self.client.logout()
+        except Exception as e:
+            print(f"{Fore.YELLOW}Warning: Baostock logout failed: {e}{Style.RESET_ALL}")
+        self._logged_in = False
+        print(f"{Fore.GREEN}Baostock logout successful in process {self.pid}{Style.RESET_ALL}")
+
+    def _probe(self) -> bool:
+        """Run a cheap query to check that the session still works."""
+        self.stats['probes'] += 1
+        try:
+            today = datetime.now().strftime('%Y-%m-%d')
+            healthy = self.client.query_trade_dates(start_date=today, end_date=today).error_code == '0'
+        except Exception:
+            healthy = False
+        if healthy:
+            self._last_checked = time.time()
+        else:
+            self.stats['failed_probes'] += 1
+        return healthy
+
+    def _unchecked_for(self) -> float:
+        return time.time() - max(self._last_used, self._last_checked)
+
+    def _ensure_session(self) -> None:
+        if self._logged_in and (self._stale or (
+                self._unchecked_for() > self.probe_idle and not self._probe())):
+            print(f"{Fore.YELLOW}Baostock session is stale, logging in again{Style.RESET_ALL}")
+            self._logout()
+            self.stats['relogins'] += 1
+        if not self._logged_in:
+            self._login()
+
+    def _keepalive_loop(self) -> None:
+        while True:
+            time.sleep(self.keepalive_interval)
+            with self._lock:
+                if not self._logged_in:
+                    self._keepalive = None
+                    return
+                # Probes keep the session alive but do not count as use
+                if self._holders == 0 and time.time() - self._last_used > self.max_idle:
+                    self._logout()
+                    self._keepalive = None
+                    return
+                if self._unchecked_for() > self.keepalive_interval and not self._probe():
+                    self._stale = True
+
+    # --- Public API ---
+
+    @contextmanager
+    def lease(self):
+        """
+        Lease the session for a sequence of queries.
+
+        Yields:
+            The logged-in Baostock client module
+
+        Raises:
+            ConnectionError: If Baostock login fails
+        """
+        with self._lock:
+            self._ensure_session()
+            self.stats['leases'] += 1
+            try:
+                yield self.client
+            finally:
+                self._last_used = time.time()
+
+    def invalidate(self) -> None:
+        """Mark the session as broken; the next lease logs in again."""
+        with self._lock:
+            self._stale = True
+
+    def hold(self) -> None:
+        """
+        Keep the session logged in until release() (e.g. for a whole scan).
+        Logs in right away so connection problems surface early.
+        """
+        with self.lease():
+            self._holders += 1
+
+    def release(self) -> None:
+        """Drop a hold taken with hold(); the session stays logged in while idle."""
+        with self._lock:
+            self._holders = max(0, self._holders - 1)
+
+    def close(self) -> None:
+        """Log out the session."""
+        with self._lock:
+            if self._logged_in:
+                self._logout()
+
+
+_session_pool: Optional[BaostockSessionPool] = None
+_session_pool_lock = threading.Lock()
+
+
+def get_session_pool() -> BaostockSessionPool:
+    """Get the Baostock session pool of the current process."""
+    global _session_pool
+    with _session_pool_lock:
+        # A forked worker must not reuse the socket of its parent
+        if _session_pool is None or _session_pool.pid != os.getpid():
+            _session_pool = BaostockSessionPool()
+            atexit.register(_session_pool.close)
+        return _session_pool
+
 
 def baostock_login() -> None:
     """
-    Login to Baostock API with thread-local connection.
-    Each thread/process will have its own connection.
+    Make sure the Baostock session of this process is logged in.
+    Also used as the initializer of worker processes.
     """
-    # Check if already logged in
-    if hasattr(_thread_local, 'logged_in') and _thread_local.logged_in:
-        return
-    
-    # Login
-    lg = bs.login()
-    if lg.error_code != '0':
-        print(f"{Fore.RED}Baostock login failed: {lg.error_msg}{Style.RESET_ALL}")
-        raise ConnectionError(f"Baostock login failed: {lg.error_msg}")
-    
-    _thread_local.logged_in = True
-    print(f"{Fore.GREEN}Baostock login successful in thread {threading.current_thread().name}{Style.RESET_ALL}")
+    with get_session_pool().lease():
+        pass
+
 
 def baostock_logout() -> None:
     """
-    Logout from Baostock API and clean up thread-local connection.
+    Log out the Baostock session of this process.
     """
-    if hasattr(_thread_local, 'logged_in') and _thread_local.logged_in:
-        bs.logout()
-        _thread_local.logged_in = False
-        print(f"{Fore.GREEN}Baostock logout successful in thread {threading.current_thread().name}{Style.RESET_ALL}")
+    get_session_pool().close()
+
 
 def baostock_relogin() -> None:
     """
-    Re-login to Baostock API (logout first, then login again).
+    Mark the Baostock session as broken so the next query logs in again.
     """
-    baostock_logout()
-    baostock_login()
+    get_session_pool().invalidate()
+
 
 class BaostockConnectionManager:
     """
-    Context manager for Baostock connections.
-    Ensures proper login/logout handling.
+    Context manager keeping the Baostock session logged in while it is open.
+    Nested managers share the session; leaving one does not log out.
     """
     def __enter__(self):
-        baostock_login()
+        get_session_pool().hold()
         return self
     
     def __exit__(self, exc_type, exc_val, exc_tb):
-        baostock_logout()
+        get_session_pool().release()
         return False  # Don't suppress exceptions
 
 def fetch_stock_basics() -> pd.DataFrame:
@@ -71,9 +233,9 @@ def fetch_stock_basics() -> pd.DataFrame:
         ConnectionError: If Baostock connection fails
         ValueError: If no data is returned
     """
-    with BaostockConnectionManager():
+    with get_session_pool().lease() as client:
         print(f"{Fore.CYAN}Fetching stock basic information...{Style.RESET_ALL}")
-        rs = bs.query_stock_basic()
+        rs = client.query_stock_basic()
         
         if rs.error_code != '0':
             raise ConnectionError(f"Failed to query stock basics: {rs.error_msg}")
@@ -98,9 +260,9 @@ def fetch_industry_data() -> pd.DataFrame:
         ConnectionError: If Baostock connection fails
         ValueError: If no data is returned
     """
-    with BaostockConnectionManager():
+    with get_session_pool().lease() as client:
         print(f"{Fore.CYAN}Fetching industry classification data...{Style.RESET_ALL}")
-        rs = bs.query_stock_industry()
+        rs = client.query_stock_industry()
         
         if rs.error_code != '0':
             raise ConnectionError(f"Failed to query industry data: {rs.error_msg}")
@@ -114,6 +276,29 @@ def fetch_industry_data() -> pd.DataFrame:
         
         return pd.DataFrame(industry_list, columns=rs.fields)
 
+def kline_rows_to_frame(rows: List[List[str]], fields: List[str]) -> pd.DataFrame:
+    """
+    Convert raw Baostock K-line rows into a DataFrame with numeric price columns.
+
+    Args:
+        rows: Row data as returned by ResultData.get_row_data()
+        fields: Field names of the result set
+
+    Returns:
+        pd.DataFrame: K-line data, empty if there are no rows
+    """
+    if not rows:
+        return pd.DataFrame()
+
+    df = pd.DataFrame(rows, columns=fields)
+
+    # Convert numeric columns
+    for col in KLINE_NUMERIC_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+
+    return df
+
 def fetch_kline_data(code: str, start_date: str, end_date: str,
                      retry_attempts: int = 3,
                      retry_delay: int = 1) -> pd.DataFrame:
@@ -131,21 +316,25 @@ def fetch_kline_data(code: str, start_date: str, end_date: str,
         pd.DataFrame: DataFrame containing K-line data
     """
     retries = 0
+    pool = get_session_pool()
     
     while True:
         try:
-            # Ensure we're logged in
-            baostock_login()
-            
-            # Query historical K-line data
-            rs = bs.query_history_k_data_plus(
-                code,
-                "date,open,high,low,close,volume,turn,preclose,pctChg,peTTM,pbMRQ",
-                start_date=start_date,
-                end_date=end_date,
-                frequency="d",     # Daily frequency
-                adjustflag="2"     # Forward adjusted prices
-            )
+            with pool.lease() as client:
+                # Query historical K-line data
+                rs = client.query_history_k_data_plus(
+                    code,
+                    KLINE_FIELDS,
+                    start_date=start_date,
+                    end_date=end_date,
+                    frequency="d",     # Daily frequency
+                    adjustflag="2"     # Forward adjusted prices
+                )
+                
+                # Process the data if query was successful
+                data_list = []
+                while (rs.error_code == '0') & rs.next():
+                    data_list.append(rs.get_row_data())
             
             # Check for API errors
             if rs.error_code != '0':
@@ -157,29 +346,16 @@ def fetch_kline_data(code: str, start_date: str, end_date: str,
                     return pd.DataFrame()
                 
                 # Retry with re-login
+                pool.invalidate()
                 time.sleep(retry_delay * (1 + retries * 0.5))
-                baostock_relogin()
                 continue
             
-            # Process the data if query was successful
-            data_list = []
-            while (rs.error_code == '0') & rs.next():
-                data_list.append(rs.get_row_data())
-            
             # Convert to DataFrame
             if not data_list:
                 print(f"{Fore.YELLOW}No data returned for {code} from {start_date} to {end_date}{Style.RESET_ALL}")
                 return pd.DataFrame()
             
-            df = pd.DataFrame(data_list, columns=rs.fields)
-            
-            # Convert numeric columns
-            numeric_cols = ['open', 'high', 'low', 'close', 'volume', 'turn', 'preclose', 'pctChg', 'peTTM', 'pbMRQ']
-            for col in numeric_cols:
-                if col in df.columns:
-                    df[col] = pd.to_numeric(df[col], errors='coerce')
-            
-            return df
+            return kline_rows_to_frame(data_list, rs.fields)
             
         except Exception as e:
             retries += 1
@@ -190,5 +366,5 @@ def fetch_kline_data(code: str, start_date: str, end_date: str,
                 return pd.DataFrame()
             
             # Retry with re-login
+            pool.invalidate()
             time.sleep(retry_delay * (1 + retries * 0.5))
-            baostock_relogin()
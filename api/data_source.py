@@ -0,0 +1,222 @@
+"""
+Data Source module providing pluggable K-line sources for the platform scanner.
+
+Three sources are available:
+    - network: always query Baostock (the original behaviour)
+    - cache: only read the local K-line store, never touch the network
+    - cache_first: read the local K-line store and fall back to Baostock when a
+      stock is missing from the store or its data is stale
+"""
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterator, List, Optional, Tuple
+
+import pandas as pd
+from colorama import Fore, Style
+
+from .data_fetcher import baostock_login, fetch_kline_data
+from .fetcher import BaostockFetcher
+from .kline_store import KlineStore
+
+DATA_SOURCE_NETWORK = "network"
+DATA_SOURCE_CACHE = "cache"
+DATA_SOURCE_CACHE_FIRST = "cache_first"
+
+DATA_SOURCES = (DATA_SOURCE_NETWORK, DATA_SOURCE_CACHE, DATA_SOURCE_CACHE_FIRST)
+
+
+class KlineDataSource:
+    """
+    Base class for K-line data sources.
+
+    Instances are pickled into scan worker processes, so they only carry plain
+    settings; any heavy state (such as the store manifest) is created lazily in
+    the process that uses it.
+    """
+    name = ""
+    # Whether worker processes should log in to Baostock up front
+    requires_login = False
+    # Whether reads are local and therefore only limited by CPU and disk
+    is_local = False
+
+    def fetch(self, code: str, start_date: str, end_date: str) -> pd.DataFrame:
+        """
+        Get K-line data for a stock.
+
+        Args:
+            code: Stock code (e.g., 'sh.600000')
+            start_date: Start date in 'YYYY-MM-DD' format
+            end_date: End date in 'YYYY-MM-DD' format
+
+        Returns:
+            pd.DataFrame: K-line data, empty if unavailable
+        """
+        raise NotImplementedError
+
+    def fetch_many(self, codes: List[str], start_date: str, end_date: str,
+                   max_workers: int = 1) -> Iterator[Tuple[str, pd.DataFrame]]:
+        """
+        Get K-line data for many stocks, yielding results as they complete.
+
+        The default implementation runs fetch() in a process pool.
+
+        Args:
+            codes: Stock codes
+            start_date: Start date in 'YYYY-MM-DD' format
+            end_date: End date in 'YYYY-MM-DD' format
+            max_workers: Number of worker processes
+
+        Yields:
+            (code, DataFrame) pairs in completion order
+        """
+        if not codes:
+            return
+        initializer = baostock_login if self.requires_login else None
+        executor = ProcessPoolExecutor(max_workers=max_workers, initializer=initializer)
+        try:
+            future_to_code = {
+                executor.submit(self.fetch, code, start_date, end_date): code
+                for code in codes
+            }
+            for future in as_completed(future_to_code):
+                code = future_to_code[future]
+                try:
+                    df = future.result()
+                except Exception as e:
+                    print(f"{Fore.RED}Error fetching data for {code}: {e}{Style.RESET_ALL}")
+                    df = pd.DataFrame()
+                yield code, df
+        finally:
+            # When the caller closes the generator early, drop the fetches
+            # that have not started yet instead of running them all
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+class NetworkDataSource(KlineDataSource):
+    """Fetch K-line data from Baostock."""
+    name = DATA_SOURCE_NETWORK
+    requires_login = True
+
+    def __init__(self, retry_attempts: int = 3, retry_delay: int = 1):
+        self.retry_attempts = retry_attempts
+        self.retry_delay = retry_delay
+
+    def fetch(self, code: str, start_date: str, end_date: str) -> pd.DataFrame:
+        return fetch_kline_data(code, start_date, end_date,
+                                self.retry_attempts, self.retry_delay)
+
+    def fetch_many(self, codes: List[str], start_date: str, end_date: str,
+                   max_workers: int = 1) -> Iterator[Tuple[str, pd.DataFrame]]:
+        """Pipeline the requests over max_workers logged-in Baostock sessions."""
+        if not codes:
+            return
+        with BaostockFetcher(num_sessions=max_workers,
+                             retry_attempts=self.retry_attempts) as fetcher:
+            yield from fetcher.fetch_many((code, start_date, end_date) for code in codes)
+            fetcher.print_stats()
+
+
+class CacheDataSource(KlineDataSource):
+    """Read K-line data from the local K-line store only."""
+    name = DATA_SOURCE_CACHE
+    is_local = True
+
+    def __init__(self, store_root: Optional[str] = None):
+        self.store_root = store_root
+        self._store = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_store'] = None
+        return state
+
+    @property
+    def store(self) -> KlineStore:
+        if self._store is None:
+            self._store = KlineStore(self.store_root)
+        return self._store
+
+    def fetch(self, code: str, start_date: str, end_date: str) -> pd.DataFrame:
+        return self.store.read(code, start_date=start_date, end_date=end_date)
+
+
+class CacheFirstDataSource(CacheDataSource):
+    """
+    Read K-line data from the local K-line store, falling back to Baostock
+    when the stock is not stored or its last stored date is too old.
+    """
+    name = DATA_SOURCE_CACHE_FIRST
+
+    def __init__(self, store_root: Optional[str] = None,
+                 max_staleness_days: int = 3,
+                 retry_attempts: int = 3,
+                 retry_delay: int = 1):
+        super().__init__(store_root)
+        self.max_staleness_days = max_staleness_days
+        self.network = NetworkDataSource(retry_attempts, retry_delay)
+
+    def is_fresh(self, code: str, end_date: str) -> bool:
+        """Check whether the stored data of a stock reaches close enough to end_date."""
+        entry = self.store.get_entry(code)
+        if entry is None:
+            return False
+        stored_end = datetime.strptime(entry['end_date'], '%Y-%m-%d')
+        requested_end = datetime.strptime(end_date, '%Y-%m-%d')
+        return (requested_end - stored_end).days <= self.max_staleness_days
+
+    def fetch(self, code: str, start_date: str, end_date: str) -> pd.DataFrame:
+        if self.is_fresh(code, end_date):
+            df = super().fetch(code, start_date, end_date)
+            if not df.empty:
+                return df
+        return self.network.fetch(code, start_date, end_date)
+
+    def fetch_many(self, codes: List[str], start_date: str, end_date: str,
+                   max_workers: int = 1) -> Iterator[Tuple[str, pd.DataFrame]]:
+        """Read fresh stocks from the store, then fetch the rest from Baostock."""
+        fresh = [code for code in codes if self.is_fresh(code, end_date)]
+        fresh_set = set(fresh)
+        missing = [code for code in codes if code not in fresh_set]
+
+        cache = CacheDataSource(self.store_root)
+        for code, df in cache.fetch_many(fresh, start_date, end_date, max_workers):
+            if df.empty:
+                missing.append(code)
+            else:
+                yield code, df
+
+        if missing:
+            print(f"{Fore.CYAN}Fetching {len(missing)} missing or stale stocks from Baostock{Style.RESET_ALL}")
+            yield from self.network.fetch_many(missing, start_date, end_date, max_workers)
+
+
+def create_data_source(name: str,
+                       retry_attempts: int = 3,
+                       retry_delay: int = 1,
+                       max_staleness_days: int = 3,
+                       store_root: Optional[str] = None) -> KlineDataSource:
+    """
+    Create a K-line data source by name.
+
+    Args:
+        name: One of 'network', 'cache' or 'cache_first'
+        retry_attempts: Maximum number of retry attempts for network requests
+        retry_delay: Delay between network retries in seconds
+        max_staleness_days: Maximum age in days of cached data used by 'cache_first'
+        store_root: K-line store directory (default: the standard store location)
+
+    Returns:
+        KlineDataSource instance
+
+    Raises:
+        ValueError: If the data source name is unknown
+    """
+    if name == DATA_SOURCE_NETWORK:
+        return NetworkDataSource(retry_attempts, retry_delay)
+    if name == DATA_SOURCE_CACHE:
+        return CacheDataSource(store_root)
+    if name == DATA_SOURCE_CACHE_FIRST:
+        return CacheFirstDataSource(store_root, max_staleness_days,
+                                    retry_attempts, retry_delay)
+    raise ValueError(
+        f"Unknown data source '{name}', expected one of {', '.join(DATA_SOURCES)}")
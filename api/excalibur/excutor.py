@@ -1,9 +1,8 @@
 import os
 import sys
 import json
-from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
 from colorama import Fore, Style
-from tqdm import tqdm
 import pandas as pd
 import numpy as np
 
@@ -11,40 +10,25 @@ import numpy as np
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 try:
-  from api.excalibur.scan import combine_stock_list, scan_stock_item
+  from api.excalibur.scan import scan_stock_item
   from api.excalibur.config import DEFAULT_CONFIG
-  from api.excalibur.technical import calculate_ma
   from api.analyzers.combined_analyzer import analyze_stock
+  from api.analyzers.rolling_platform import RollingPlatformEvaluator, rolling_platform_status
   from api.config import ScanConfig
 except ImportError:
   # 如果绝对导入失败，尝试相对导入（本地开发环境）
-  from .scan import combine_stock_list, scan_stock_item
+  from .scan import scan_stock_item
   from .config import DEFAULT_CONFIG
-  from .technical import calculate_ma
   from ..config import ScanConfig
   from ..analyzers.combined_analyzer import analyze_stock
+  from ..analyzers.rolling_platform import RollingPlatformEvaluator, rolling_platform_status
 
-def detect_platform_period(df: pd.DataFrame) -> pd.DataFrame:
-    """
-    检测股票是否处于平台期，并为每条数据添加平台期状态标识
-    
-    Args:
-        df: 包含股票数据的DataFrame，需包含date,open,high,low,close,volume列
-        
-    Returns:
-        添加了status列的DataFrame，status=1表示处于平台期，status=0表示不处于平台期
-    """
-    result_df = df.copy()
-    result_df['status'] = 0  # 默认为非平台期
-    
-    # 设置最小窗口大小，需要足够的历史数据来进行分析
-    min_window = 120  # 使用较大的窗口以获取更可靠的结果
-    
-    if len(result_df) < min_window:
-        return result_df
-    
-    # 创建配置对象（在循环外部创建一次，而不是每次循环都创建）
-    config = ScanConfig(
+# 平台期检测使用的分析窗口大小，需要足够的历史数据来进行分析
+PLATFORM_FRAME_SIZE = 120
+
+def default_platform_config() -> ScanConfig:
+    """平台期检测（历史标注）使用的默认扫描配置"""
+    return ScanConfig(
         windows=[80, 100, 120],
         expected_count=10,
         box_threshold=0.3,
@@ -78,19 +62,37 @@ def detect_platform_period(df: pd.DataFrame) -> pd.DataFrame:
         pb_percentile=0.7,
         fundamental_years_to_check=3
     )
+
+def detect_platform_period(df: pd.DataFrame, config: Optional[ScanConfig] = None) -> pd.DataFrame:
+    """
+    检测股票是否处于平台期，并为每条数据添加平台期状态标识
+    
+    Args:
+        df: 包含股票数据的DataFrame，需包含date,open,high,low,close,volume列
+        config: 扫描配置，默认使用default_platform_config()
+        
+    Returns:
+        添加了status列的DataFrame，status=1表示处于平台期，status=0表示不处于平台期
+    """
+    result_df = df.copy()
+    result_df['status'] = 0  # 默认为非平台期
+    
+    # 设置最小窗口大小，需要足够的历史数据来进行分析
+    min_window = PLATFORM_FRAME_SIZE  # 使用较大的窗口以获取更可靠的结果
+    
+    if len(result_df) < min_window:
+        return result_df
+    
+    # 创建配置对象（在循环外部创建一次，而不是每次循环都创建）
+    if config is None:
+        config = default_platform_config()
     
     # 确保window_weights不为None（analyze_stock函数可能期望一个字典而不是None）
     if config.window_weights is None:
         config.window_weights = {}
     
-    # 遍历DataFrame，为每一天判断是否处于平台期
-    for i in range(min_window, len(result_df)):
-        # 为当前日期创建一个包含足够历史数据的窗口
-        # 向前取min_window天的数据
-        window_start = max(0, i - min_window + 1)
-        window_data = result_df.iloc[window_start:i+1].copy()
-        
-        # 使用analyze_stock方法分析这个窗口的数据
+    def analyze_window(window_data: pd.DataFrame) -> bool:
+        """使用analyze_stock完整分析一个窗口，返回是否处于平台期"""
         try:
             # 根据analyze_stock函数的参数顺序传入配置值
             analysis_result = analyze_stock(
@@ -116,16 +118,33 @@ def detect_platform_period(df: pd.DataFrame) -> pd.DataFrame:
                 use_breakthrough_confirmation=config.use_breakthrough_confirmation,
                 breakthrough_confirmation_days=config.breakthrough_confirmation_days,
                 use_box_detection=config.use_box_detection,
-                box_quality_threshold=config.box_quality_threshold
+                box_quality_threshold=config.box_quality_threshold,
+                full_detail=False  # 只需要is_platform，不需要诊断详情
             )
-            
-            # 如果分析结果表明处于平台期，则将当前日期的status置为1
-            if analysis_result.get('is_platform', False):
-                result_df.iloc[i, result_df.columns.get_loc('status')] = 1
+            return bool(analysis_result.get('is_platform', False))
         except Exception as e:
             # 如果分析过程中出现错误，保持status为0
             print(f"分析出错: {e}")
-            continue
+            return False
+
+    if RollingPlatformEvaluator.supports(config):
+        # 滑动窗口增量计算：一次遍历得到每天的平台期状态，
+        # 只有包含缺失值的窗口才回退到完整的analyze_stock
+        result_df['status'] = rolling_platform_status(
+            result_df, config, frame_size=min_window,
+            start=min_window, fallback=analyze_window)
+        return result_df
+
+    # 遍历DataFrame，为每一天判断是否处于平台期
+    for i in range(min_window, len(result_df)):
+        # 为当前日期创建一个包含足够历史数据的窗口
+        # 向前取min_window天的数据
+        window_start = max(0, i - min_window + 1)
+        window_data = result_df.iloc[window_start:i+1].copy()
+        
+        # 如果分析结果表明处于平台期，则将当前日期的status置为1
+        if analyze_window(window_data):
+            result_df.iloc[i, result_df.columns.get_loc('status')] = 1
     
     return result_df
 
@@ -194,68 +213,17 @@ def scan_test_stock(code, start_date, end_date):
 
 
 
-def scan_all_stocks():
-  stock_list = combine_stock_list()
-
-  print(f"{Fore.CYAN}======================================{Style.RESET_ALL}")
-  print(f"{Fore.CYAN}Starting stock scan{Style.RESET_ALL} by {DEFAULT_CONFIG.max_works}")
-  print(f"{Fore.CYAN}======================================{Style.RESET_ALL}")
-
+def scan_all_stocks(resume: bool = True):
+  """
+  批量标注全市场股票的历史平台期状态，结果写入一个列式数据集，支持中断后续跑
+  具体实现见labeler.label_all_stocks
+  """
   try:
-    executor_class = ProcessPoolExecutor
-    print(f"{Fore.GREEN}Using ProcessPoolExecutor for scan data {Style.RESET_ALL}")
-  except Exception as e:
-    print(f"{Fore.RED}ProcessPoolExecutor initialization failed: {e}{Style.RESET_ALL}")
-    print(f"{Fore.YELLOW}Falling back to ThreadPoolExecutor{Style.RESET_ALL}")
-    executor_class = ThreadPoolExecutor
-
-  # 初始化数据
-  success_count = 0
-  error_count = 0;
-  platform_count = 0;
-
-  platform_stocks = []
-
-  with executor_class(DEFAULT_CONFIG.max_works) as executor:
-    """ 
-    Python 中字典推导式的格式为 {键表达式: 值表达式 for 变量 in 可迭代对象}
-    使用了传统的循环和字典赋值方式的话，写法为：
-    future_to_stock = {}
-    for s in stock_list:
-      future_to_stock[executor.submit(scan_stock_item, s[0], s[1], s[2])] = s
-    """
-
-    future_to_stocks = { executor.submit(scan_stock_item, s[0], s[1], s[2]): s for s in stock_list }
-
-    total_stocks = len(future_to_stocks)
-    pbar = tqdm(total=total_stocks, desc="Scan stock", bar_format="{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}, {rate_fmt}]")
-
-    # enumerate 函数用于 为迭代过程添加索引值i
-    for i, future in enumerate(future_to_stocks):
-      stock = future_to_stocks[future]
-      # print('stock', stock)
-      # stock ['sz.002988', '2020-08-27', '2025-08-26']
-      stock_code = stock[0]
-      stock_name = stock[0]
-
-      try:
-        df = future.result()
-
-        success_count += 1
-
-        progress_pct = f'{i + 1} / {total_stocks}'
-
-        print(f'{progress_pct} {stock_name}: {df.head() if isinstance(df, pd.DataFrame) else df}')
-
-      except Exception as e:
-        error_count += 1
-        print(f"{Fore.RED}Error processing stock {stock_code}: {e}{Style.RESET_ALL}")
-        import traceback
-        traceback.print_exc()
+    from api.excalibur.labeler import label_all_stocks
+  except ImportError:
+    from .labeler import label_all_stocks
 
-      # Update progress bar
-      pbar.set_postfix(success=success_count,error=error_count, platform=platform_count)
-      pbar.update(1)
+  return label_all_stocks(max_workers=DEFAULT_CONFIG.max_works, resume=resume)
 
 if __name__ == '__main__':
   # scan_all_stocks()
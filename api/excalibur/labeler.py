@@ -0,0 +1,302 @@
+"""
+全市场历史平台期标注（批处理）
+
+对K线存储中的每只股票，用detect_platform_period逐日标注整个历史区间的平台期
+status，多进程并行计算，结果写入一个紧凑的列式数据集：
+
+    <output_dir>/
+        _checkpoint.json             每只股票的完成记录及配置指纹
+        parts/<code>.parquet         单只股票的标注结果(date, status)
+        platform_labels.parquet      合并后的全市场结果(code, date, status)
+
+每只股票完成后其分片文件以原子方式写入，并记录到checkpoint中；中断后重新运行
+会跳过已完成的股票（配置或数据区间变化的股票会重新标注）。
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from colorama import Fore, Style
+from tqdm import tqdm
+
+# 将项目根目录添加到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+try:
+    from api.excalibur.scan import combine_stock_list, scan_stock_item
+    from api.excalibur.config import DEFAULT_CONFIG
+    from api.excalibur.excutor import PLATFORM_FRAME_SIZE, default_platform_config, detect_platform_period
+    from api.config import ScanConfig
+except ImportError:
+    from .scan import combine_stock_list, scan_stock_item
+    from .config import DEFAULT_CONFIG
+    from .excutor import PLATFORM_FRAME_SIZE, default_platform_config, detect_platform_period
+    from ..config import ScanConfig
+
+CHECKPOINT_FILE = '_checkpoint.json'
+PARTS_DIR = 'parts'
+LABELS_FILE = 'platform_labels.parquet'
+
+# 每完成多少只股票把checkpoint写回磁盘一次
+CHECKPOINT_FLUSH_INTERVAL = 20
+
+LABEL_SCHEMA = pa.schema([
+    ('date', pa.date32()),
+    ('status', pa.int8()),
+])
+
+
+def default_output_dir() -> str:
+    """默认的标注结果目录，与K线缓存目录布局一致"""
+    if os.path.exists('/app/api'):
+        return '/app/data/labels/platform'
+    return os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        'data', 'labels', 'platform')
+
+
+def config_fingerprint(config: ScanConfig) -> str:
+    """计算配置指纹，配置变化时已有的标注结果失效"""
+    payload = json.dumps({'frame_size': PLATFORM_FRAME_SIZE, 'config': config.model_dump()},
+                         sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def _part_path(output_dir: str, code: str) -> str:
+    return os.path.join(output_dir, PARTS_DIR, f"{code}.parquet")
+
+
+def _write_atomic(table: pa.Table, path: str) -> None:
+    # 先写临时文件再替换，中断时不会留下半个文件
+    tmp_path = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.{os.getpid()}.tmp")
+    pq.write_table(table, tmp_path, compression='zstd')
+    os.replace(tmp_path, path)
+
+
+def label_stock(code: str, start_date: str, end_date: str,
+                config: ScanConfig, output_dir: str) -> Optional[Dict[str, Any]]:
+    """
+    标注一只股票的逐日平台期状态，并写入分片文件（在工作进程中运行）
+
+    Args:
+        code: 股票代码，如'sh.600000'
+        start_date: 起始日期，格式为'YYYY-MM-DD'
+        end_date: 结束日期，格式为'YYYY-MM-DD'
+        config: 扫描配置
+        output_dir: 标注结果目录
+
+    Returns:
+        checkpoint记录，没有K线数据时返回None
+    """
+    df = scan_stock_item(code, start_date=start_date, end_date=end_date)
+    if df is None or df.empty:
+        return None
+
+    labeled = detect_platform_period(df.reset_index(drop=True), config)
+    dates = pd.to_datetime(labeled['date']).dt.date
+    table = pa.Table.from_arrays(
+        [pa.array(dates, type=pa.date32()),
+         pa.array(labeled['status'].to_numpy(dtype=np.int8), type=pa.int8())],
+        schema=LABEL_SCHEMA)
+    _write_atomic(table, _part_path(output_dir, code))
+
+    return {
+        'start_date': start_date,
+        'end_date': end_date,
+        'rows': len(labeled),
+        'platform_days': int(labeled['status'].sum()),
+        'updated_at': time.time()
+    }
+
+
+class LabelCheckpoint:
+    """记录已完成标注的股票，支持中断后续跑"""
+
+    def __init__(self, output_dir: str, fingerprint: str):
+        self.path = os.path.join(output_dir, CHECKPOINT_FILE)
+        self.fingerprint = fingerprint
+        self.codes: Dict[str, Dict[str, Any]] = {}
+        self._dirty = 0
+
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"{Fore.YELLOW}Warning: Failed to load label checkpoint, starting over: {e}{Style.RESET_ALL}")
+                data = {}
+            if data.get('fingerprint') == fingerprint:
+                self.codes = data.get('codes', {})
+            elif data:
+                print(f"{Fore.YELLOW}Scan config changed since the last run, relabeling all stocks{Style.RESET_ALL}")
+
+    def is_done(self, code: str, start_date: str, end_date: str) -> bool:
+        entry = self.codes.get(code)
+        return (entry is not None
+                and entry['start_date'] == start_date
+                and entry['end_date'] == end_date)
+
+    def record(self, code: str, entry: Dict[str, Any]) -> None:
+        self.codes[code] = entry
+        self._dirty += 1
+        if self._dirty >= CHECKPOINT_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._dirty:
+            return
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'fingerprint': self.fingerprint, 'codes': self.codes,
+                       'updated_at': time.time()}, f)
+        os.replace(tmp_path, self.path)
+        self._dirty = 0
+
+
+def merge_labels(output_dir: str, codes: List[str]) -> str:
+    """
+    把各股票的分片合并为一个全市场数据集(code, date, status)
+    Parquet会对code列做字典编码，文件仍然紧凑
+
+    Args:
+        output_dir: 标注结果目录
+        codes: 需要合并的股票代码
+
+    Returns:
+        合并后的文件路径
+    """
+    tables = []
+    for code in sorted(codes):
+        path = _part_path(output_dir, code)
+        if not os.path.exists(path):
+            continue
+        table = pq.read_table(path)
+        tables.append(table.add_column(0, 'code', pa.array([code] * table.num_rows, type=pa.string())))
+
+    if tables:
+        merged = pa.concat_tables(tables)
+    else:
+        merged = LABEL_SCHEMA.insert(0, pa.field('code', pa.string())).empty_table()
+
+    path = os.path.join(output_dir, LABELS_FILE)
+    _write_atomic(merged, path)
+    return path
+
+
+def label_all_stocks(config: Optional[ScanConfig] = None,
+                     output_dir: Optional[str] = None,
+                     max_workers: Optional[int] = None,
+                     resume: bool = True) -> Dict[str, Any]:
+    """
+    批量标注全市场股票的历史平台期状态
+
+    Args:
+        config: 扫描配置，默认使用default_platform_config()
+        output_dir: 标注结果目录，默认为default_output_dir()
+        max_workers: 工作进程数，默认为CPU核数
+        resume: 是否跳过checkpoint中已完成的股票
+
+    Returns:
+        运行统计，包括结果文件路径
+    """
+    config = config or default_platform_config()
+    output_dir = output_dir or default_output_dir()
+    max_workers = max_workers or DEFAULT_CONFIG.max_works
+    os.makedirs(os.path.join(output_dir, PARTS_DIR), exist_ok=True)
+
+    checkpoint = LabelCheckpoint(output_dir, config_fingerprint(config))
+    if not resume:
+        checkpoint.codes = {}
+
+    stock_list = combine_stock_list()
+    pending = [s for s in stock_list if not checkpoint.is_done(s[0], s[1], s[2])]
+
+    print(f"{Fore.CYAN}======================================{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}Labeling platform periods{Style.RESET_ALL} by {max_workers}")
+    print(f"Stocks: {len(stock_list)}, already labeled: {len(stock_list) - len(pending)}")
+    print(f"{Fore.CYAN}======================================{Style.RESET_ALL}")
+
+    success_count = 0
+    error_count = 0
+    empty_count = 0
+
+    pbar = tqdm(total=len(pending), desc="Label stock",
+                bar_format="{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}, {rate_fmt}]")
+
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            # 限制在途任务数，避免一次性提交全部股票
+            max_pending = max_workers * 2
+            queue = iter(pending)
+            running = {}
+
+            def submit_next() -> bool:
+                stock = next(queue, None)
+                if stock is None:
+                    return False
+                future = executor.submit(label_stock, stock[0], stock[1], stock[2], config, output_dir)
+                running[future] = stock
+                return True
+
+            while len(running) < max_pending and submit_next():
+                pass
+
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stock = running.pop(future)
+                    try:
+                        entry = future.result()
+                        if entry is None:
+                            empty_count += 1
+                        else:
+                            checkpoint.record(stock[0], entry)
+                            success_count += 1
+                    except Exception as e:
+                        error_count += 1
+                        print(f"{Fore.RED}Error labeling stock {stock[0]}: {e}{Style.RESET_ALL}")
+
+                    pbar.set_postfix(success=success_count, error=error_count)
+                    pbar.update(1)
+                    submit_next()
+    finally:
+        # 中断时也保存已完成的进度
+        checkpoint.flush()
+        pbar.close()
+
+    labels_path = merge_labels(output_dir, list(checkpoint.codes))
+    platform_days = sum(entry['platform_days'] for entry in checkpoint.codes.values())
+    total_days = sum(entry['rows'] for entry in checkpoint.codes.values())
+
+    print(f"{Fore.GREEN}Labeling completed: {success_count} labeled, {error_count} errors, "
+          f"{empty_count} without data{Style.RESET_ALL}")
+    print(f"Labeled stocks: {len(checkpoint.codes)}, platform days: {platform_days} / {total_days}")
+    print(f"{Fore.GREEN}Labels saved to {labels_path}{Style.RESET_ALL}")
+
+    return {
+        'labels_path': labels_path,
+        'labeled': success_count,
+        'errors': error_count,
+        'empty': empty_count,
+        'total_stocks': len(checkpoint.codes),
+        'total_days': total_days,
+        'platform_days': platform_days
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Label the platform status of every cached stock')
+    parser.add_argument('--output', default=None, help='Output directory')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes')
+    parser.add_argument('--fresh', action='store_true', help='Ignore the checkpoint and relabel everything')
+    args = parser.parse_args()
+
+    label_all_stocks(output_dir=args.output, max_workers=args.workers, resume=not args.fresh)
@@ -17,6 +17,14 @@ import math
 from datetime import datetime, timedelta
 from collections.abc import Mapping, Iterable
 
+# 将项目根目录添加到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+try:
+  from api.kline_store import get_kline_store
+except ImportError:
+  from ..kline_store import get_kline_store
+
 file_path = '../data/cache/stocks'
 
 if os.path.exists('/app/api'):
@@ -24,6 +32,14 @@ if os.path.exists('/app/api'):
 
 def combine_stock_list() -> List[List[str]]:
   stock_list: List[List[str]] = [];
+
+  # 优先从列式K线存储的索引中读取，无需遍历目录
+  store = get_kline_store()
+  for code in store.list_codes():
+    entry = store.get_entry(code)
+    stock_list.append([code, entry['start_date'], entry['end_date']])
+
+  stored_codes = set(store.list_codes())
   
   # 获取当前文件所在目录
   current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -44,7 +60,7 @@ def combine_stock_list() -> List[List[str]]:
       # 修正正则表达式，日期部分是用连字符连接的
       match = re.match(r'([a-z]+\.\d+)_(\d{4}-\d{2}-\d{2})-(\d{4}-\d{2}-\d{2})', filename)
       # print(f"filename {filename} {match}")
-      if match:
+      if match and match.group(1) not in stored_codes:
         stock_id = match.group(1)
         start_date = match.group(2)
         end_date = match.group(3)
@@ -56,7 +72,7 @@ def combine_stock_list() -> List[List[str]]:
 
 def scan_stock_item(code: str, start_date: str, end_date: str) -> Optional[pd.DataFrame]:
     """
-    从pkl文件中读取指定股票代码和日期范围的股票数据
+    从列式K线存储（或旧的pkl文件缓存）中读取指定股票代码和日期范围的股票数据
     
     Args:
         code: 股票代码，如'sh.600000'
@@ -66,6 +82,17 @@ def scan_stock_item(code: str, start_date: str, end_date: str) -> Optional[pd.Da
     Returns:
         包含股票数据的DataFrame，如果文件不存在或读取失败则返回None
     """
+    # 优先从列式K线存储读取
+    store = get_kline_store()
+    if store.has(code):
+        try:
+            data = store.read(code, start_date=start_date, end_date=end_date)
+            if not data.empty:
+                return data
+        except Exception as e:
+            print(f"读取K线存储时出错: {code}, 错误: {str(e)}")
+
+    # 回退到旧的pkl文件缓存
     # 获取当前文件所在目录
     current_dir = os.path.dirname(os.path.abspath(__file__))
     # 构建完整的文件路径
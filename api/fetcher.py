@@ -0,0 +1,497 @@
+"""
+Fetcher module providing a pipelined Baostock K-line fetcher.
+
+The Baostock client keeps a single global socket per process, so a session is a
+worker process that logs in once and then serves K-line queries from its own
+request queue. The dispatcher keeps a few requests queued ahead on every session
+so that no session waits for the next request, and an AIMD controller adapts
+the total number of in-flight requests from what it observes: the limit grows by
+one request per round of successful responses and is halved when a request
+fails or its latency spikes. Failed requests are re-dispatched after the session
+logs in again instead of sleeping through a fixed backoff.
+
+The client module is imported by name inside every session, so the fetcher can
+be pointed at a stub module (or a client talking to a local fake server) that
+exposes login, logout and query_history_k_data_plus.
+"""
+import importlib
+import itertools
+import multiprocessing
+import queue
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from colorama import Fore, Style
+
+from .data_fetcher import KLINE_FIELDS, kline_rows_to_frame
+
+# Number of requests queued ahead on each session
+DEFAULT_PIPELINE_DEPTH = 4
+
+# Number of recent latencies kept per session for percentile stats
+LATENCY_WINDOW = 2048
+
+# A request whose latency exceeds this multiple of the smoothed latency
+# counts as a congestion signal
+LATENCY_TOLERANCE = 4.0
+
+# Seconds between session health checks; also the longest wait for a response
+POLL_INTERVAL = 0.5
+
+# Seconds without any response before a busy session is considered hung
+DEFAULT_REQUEST_TIMEOUT = 60.0
+
+
+class FetchJob(NamedTuple):
+    """A K-line request and the number of attempts already made."""
+    code: str
+    start_date: str
+    end_date: str
+    attempts: int = 0
+
+
+class LatencyStats:
+    """
+    Request counters and a sliding window of latencies for one session.
+    """
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.requests = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=window)
+        self.first_at = None
+        self.last_at = None
+
+    def record(self, latency: float, ok: bool) -> None:
+        """Record a finished request."""
+        now = time.time()
+        if self.first_at is None:
+            self.first_at = now - latency
+        self.last_at = now
+        self.requests += 1
+        if not ok:
+            self.errors += 1
+        self.latencies.append(latency)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Get requests/sec and p50/p99 latency of the session.
+
+        Returns:
+            Dict with 'requests', 'errors', 'rps', 'p50_ms' and 'p99_ms'
+        """
+        elapsed = (self.last_at - self.first_at) if self.first_at is not None else 0.0
+        p50 = p99 = 0.0
+        if self.latencies:
+            p50, p99 = np.percentile(np.fromiter(self.latencies, dtype=float), [50, 99])
+
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'rps': round(self.requests / elapsed, 2) if elapsed > 0 else 0.0,
+            'p50_ms': round(float(p50) * 1000, 1),
+            'p99_ms': round(float(p99) * 1000, 1)
+        }
+
+
+class AIMDController:
+    """
+    Additive-increase/multiplicative-decrease limit on in-flight requests.
+
+    Every successful response adds 1/limit, i.e. the limit grows by one per
+    round of responses. An error, or a latency above the target, multiplies the
+    limit by decrease_factor, at most once per smoothed round-trip time so that
+    one congestion event does not collapse the limit.
+    """
+
+    def __init__(self, initial_limit: float,
+                 max_limit: float,
+                 min_limit: float = 1,
+                 decrease_factor: float = 0.5,
+                 latency_target: Optional[float] = None):
+        """
+        Args:
+            initial_limit: Starting number of in-flight requests
+            max_limit: Upper bound of the limit
+            min_limit: Lower bound of the limit
+            decrease_factor: Multiplier applied on congestion
+            latency_target: Latency in seconds above which a response counts as
+                congestion (default: LATENCY_TOLERANCE x smoothed latency)
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(min(max(initial_limit, min_limit), max_limit))
+        self.decrease_factor = decrease_factor
+        self.latency_target = latency_target
+        self.smoothed_latency = None
+        self._last_decrease = 0.0
+
+    @property
+    def concurrency(self) -> int:
+        """Current number of requests allowed in flight."""
+        return max(int(self.min_limit), int(self.limit))
+
+    def _is_slow(self, latency: float) -> bool:
+        if self.latency_target is not None:
+            return latency > self.latency_target
+        if self.smoothed_latency is None:
+            return False
+        return latency > LATENCY_TOLERANCE * self.smoothed_latency
+
+    def on_success(self, latency: float) -> None:
+        """Update the limit after a successful response."""
+        slow = self._is_slow(latency)
+        if self.smoothed_latency is None:
+            self.smoothed_latency = latency
+        else:
+            self.smoothed_latency = 0.875 * self.smoothed_latency + 0.125 * latency
+
+        if slow:
+            self._decrease()
+        else:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+    def on_error(self) -> None:
+        """Update the limit after a failed request."""
+        self._decrease()
+
+    def _decrease(self) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < (self.smoothed_latency or 0.0):
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+
+
+def _login(client) -> None:
+    lg = client.login()
+    if lg.error_code != '0':
+        raise ConnectionError(f"Baostock login failed: {lg.error_msg}")
+
+
+def _session_main(session_id: int, client_module: str,
+                  request_queue, result_queue) -> None:
+    """
+    Serve K-line requests in a session process until a None request arrives.
+
+    Every response is put on the result queue as
+    (session_id, request_id, ok, DataFrame or error message, latency).
+    """
+    client = importlib.import_module(client_module)
+    logged_in = False
+
+    while True:
+        request = request_queue.get()
+        if request is None:
+            break
+
+        request_id, code, start_date, end_date = request
+        started = time.perf_counter()
+        try:
+            if not logged_in:
+                _login(client)
+                logged_in = True
+
+            rs = client.query_history_k_data_plus(
+                code,
+                KLINE_FIELDS,
+                start_date=start_date,
+                end_date=end_date,
+                frequency="d",     # Daily frequency
+                adjustflag="2"     # Forward adjusted prices
+            )
+            if rs.error_code != '0':
+                raise ConnectionError(rs.error_msg)
+
+            data_list = []
+            while (rs.error_code == '0') & rs.next():
+                data_list.append(rs.get_row_data())
+
+            df = kline_rows_to_frame(data_list, rs.fields)
+            result_queue.put((session_id, request_id, True, df, time.perf_counter() - started))
+
+        except Exception as e:
+            result_queue.put((session_id, request_id, False, str(e), time.perf_counter() - started))
+            # Log in again before the next request
+            if logged_in:
+                try:
+                    client.logout()
+                except Exception:
+                    pass
+                logged_in = False
+
+    if logged_in:
+        client.logout()
+
+
+class _Session:
+    """Parent-side handle of a session process."""
+
+    def __init__(self, session_id: int, process, request_queue):
+        self.session_id = session_id
+        self.process = process
+        self.request_queue = request_queue
+        self.in_flight = set()
+        self.last_progress = time.monotonic()
+
+
+class BaostockFetcher:
+    """
+    Pipelined K-line fetcher over a fixed pool of logged-in Baostock sessions.
+
+    Usage:
+        with BaostockFetcher(num_sessions=4) as fetcher:
+            for code, df in fetcher.fetch_many(requests):
+                ...
+            fetcher.print_stats()
+    """
+
+    def __init__(self, num_sessions: int = 4,
+                 pipeline_depth: int = DEFAULT_PIPELINE_DEPTH,
+                 retry_attempts: int = 3,
+                 initial_concurrency: Optional[int] = None,
+                 latency_target: Optional[float] = None,
+                 request_timeout: float = DEFAULT_REQUEST_TIMEOUT,
+                 client_module: str = 'baostock',
+                 mp_context: Optional[str] = None):
+        """
+        Args:
+            num_sessions: Number of session processes
+            pipeline_depth: Maximum requests queued on one session
+            retry_attempts: Maximum number of attempts per request
+            initial_concurrency: Starting in-flight limit (default: one per session)
+            latency_target: Latency in seconds treated as congestion
+                (default: adaptive, see AIMDController)
+            request_timeout: Seconds without a response before a busy session
+                is restarted
+            client_module: Name of the Baostock client module to import in sessions
+            mp_context: multiprocessing start method (default: platform default)
+        """
+        self.num_sessions = max(1, num_sessions)
+        self.pipeline_depth = max(1, pipeline_depth)
+        self.retry_attempts = max(1, retry_attempts)
+        self.request_timeout = request_timeout
+        self.client_module = client_module
+        self.controller = AIMDController(
+            initial_limit=initial_concurrency or self.num_sessions,
+            max_limit=self.num_sessions * self.pipeline_depth,
+            latency_target=latency_target
+        )
+
+        self._context = multiprocessing.get_context(mp_context)
+        self._result_queue = None
+        self._sessions: Dict[int, _Session] = {}
+        self._stats: Dict[int, LatencyStats] = {}
+        self._request_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._started = False
+
+    # --- Lifecycle ---
+
+    def start(self) -> None:
+        """Start the session processes."""
+        if self._started:
+            return
+        self._result_queue = self._context.Queue()
+        for session_id in range(self.num_sessions):
+            self._start_session(session_id)
+        self._started = True
+
+    def _start_session(self, session_id: int) -> None:
+        request_queue = self._context.Queue()
+        process = self._context.Process(
+            target=_session_main,
+            args=(session_id, self.client_module, request_queue, self._result_queue),
+            name=f"baostock-session-{session_id}",
+            daemon=True
+        )
+        process.start()
+        self._sessions[session_id] = _Session(session_id, process, request_queue)
+        self._stats.setdefault(session_id, LatencyStats())
+
+    def close(self) -> None:
+        """Log out and stop every session process."""
+        if not self._started:
+            return
+        for session in self._sessions.values():
+            try:
+                session.request_queue.put(None)
+            except Exception:
+                pass
+        for session in self._sessions.values():
+            session.process.join(timeout=5)
+            if session.process.is_alive():
+                session.process.terminate()
+        self._sessions.clear()
+        self._started = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False  # Don't suppress exceptions
+
+    # --- Fetching ---
+
+    def _pick_session(self) -> Optional[_Session]:
+        """Get the least loaded session that still has room in its pipeline."""
+        candidates = [s for s in self._sessions.values()
+                      if len(s.in_flight) < self.pipeline_depth]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda s: len(s.in_flight))
+
+    def _restart_broken_sessions(self, in_flight: Dict[int, FetchJob],
+                                 failed: List[FetchJob]) -> None:
+        """Restart dead or hung sessions and collect their unanswered requests."""
+        now = time.monotonic()
+        for session_id, session in list(self._sessions.items()):
+            hung = session.in_flight and now - session.last_progress > self.request_timeout
+            if session.process.is_alive() and not hung:
+                continue
+
+            print(f"{Fore.YELLOW}Baostock session {session_id} {'hung' if hung else 'died'}, restarting{Style.RESET_ALL}")
+            if session.process.is_alive():
+                session.process.terminate()
+            session.process.join(timeout=5)
+
+            for request_id in session.in_flight:
+                job = in_flight.pop(request_id, None)
+                if job is not None:
+                    failed.append(job)
+                    self._stats[session_id].record(now - session.last_progress, False)
+            self.controller.on_error()
+            self._start_session(session_id)
+
+    def fetch_many(self, requests: Iterable[Tuple[str, str, str]]) -> Iterator[Tuple[str, pd.DataFrame]]:
+        """
+        Fetch K-line data for many stocks, yielding results as they complete.
+
+        Args:
+            requests: (code, start_date, end_date) tuples
+
+        Yields:
+            (code, DataFrame) pairs in completion order; the DataFrame is empty
+            when no data was returned or every attempt failed
+        """
+        self.start()
+        pending = deque(FetchJob(code, start_date, end_date)
+                        for code, start_date, end_date in requests)
+        in_flight: Dict[int, FetchJob] = {}
+        session_of: Dict[int, int] = {}
+        last_health_check = time.monotonic()
+
+        with self._lock:
+            try:
+                while pending or in_flight:
+                    # Check the sessions on a timer: while other sessions keep
+                    # answering, the result queue alone never reveals a hung one
+                    if time.monotonic() - last_health_check >= POLL_INTERVAL:
+                        last_health_check = time.monotonic()
+                        failed = []
+                        self._restart_broken_sessions(in_flight, failed)
+                        for job in failed:
+                            result = self._retry_or_give_up(job, "session lost", pending)
+                            if result is not None:
+                                yield result
+
+                    # Keep the pipelines filled up to the current limit
+                    while pending and len(in_flight) < self.controller.concurrency:
+                        session = self._pick_session()
+                        if session is None:
+                            break
+                        job = pending.popleft()
+                        request_id = next(self._request_ids)
+                        if not session.in_flight:
+                            session.last_progress = time.monotonic()
+                        session.in_flight.add(request_id)
+                        in_flight[request_id] = job
+                        session_of[request_id] = session.session_id
+                        session.request_queue.put((request_id, job.code, job.start_date, job.end_date))
+
+                    try:
+                        session_id, request_id, ok, payload, latency = self._result_queue.get(timeout=POLL_INTERVAL)
+                    except queue.Empty:
+                        continue
+
+                    # Responses of requests abandoned by an earlier call are stale
+                    job = in_flight.pop(request_id, None)
+                    if job is None:
+                        continue
+
+                    session_of.pop(request_id, None)
+                    session = self._sessions.get(session_id)
+                    if session is not None:
+                        session.in_flight.discard(request_id)
+                        session.last_progress = time.monotonic()
+                    self._stats[session_id].record(latency, ok)
+
+                    if ok:
+                        self.controller.on_success(latency)
+                        if payload.empty:
+                            print(f"{Fore.YELLOW}No data returned for {job.code} from {job.start_date} to {job.end_date}{Style.RESET_ALL}")
+                        yield job.code, payload
+                        continue
+
+                    self.controller.on_error()
+                    result = self._retry_or_give_up(job, f"session {session_id}: {payload}", pending)
+                    if result is not None:
+                        yield result
+            finally:
+                # Forget requests abandoned by a consumer that stopped early
+                for request_id, session_id in session_of.items():
+                    session = self._sessions.get(session_id)
+                    if session is not None:
+                        session.in_flight.discard(request_id)
+
+    def _retry_or_give_up(self, job: FetchJob, error: str,
+                          pending: deque) -> Optional[Tuple[str, pd.DataFrame]]:
+        """Queue a failed job again, or return an empty result once attempts run out."""
+        attempts = job.attempts + 1
+        print(f"{Fore.YELLOW}Attempt {attempts}/{self.retry_attempts}: Baostock query failed for {job.code}. Error: {error}{Style.RESET_ALL}")
+        if attempts >= self.retry_attempts:
+            print(f"{Fore.RED}Failed to fetch data for {job.code} after {self.retry_attempts} attempts{Style.RESET_ALL}")
+            return job.code, pd.DataFrame()
+        pending.appendleft(job._replace(attempts=attempts))
+        return None
+
+    def fetch(self, code: str, start_date: str, end_date: str) -> pd.DataFrame:
+        """
+        Fetch K-line data for a single stock.
+
+        Returns:
+            pd.DataFrame: K-line data, empty if unavailable
+        """
+        for _, df in self.fetch_many([(code, start_date, end_date)]):
+            return df
+        return pd.DataFrame()
+
+    # --- Stats ---
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the current in-flight limit and per-session request stats.
+
+        Returns:
+            Dict with 'concurrency' and 'sessions' (session id -> LatencyStats.summary())
+        """
+        return {
+            'concurrency': self.controller.concurrency,
+            'sessions': {session_id: stats.summary()
+                         for session_id, stats in sorted(self._stats.items())}
+        }
+
+    def print_stats(self) -> None:
+        """Print per-session requests/sec and latency percentiles."""
+        stats = self.stats()
+        print(f"{Fore.CYAN}Baostock fetcher stats (in-flight limit {stats['concurrency']}):{Style.RESET_ALL}")
+        for session_id, summary in stats['sessions'].items():
+            print(f"  - Session {session_id}: {Fore.GREEN}{summary['requests']}{Style.RESET_ALL} requests, "
+                  f"{summary['errors']} errors, {summary['rps']} req/s, "
+                  f"p50 {summary['p50_ms']} ms, p99 {summary['p99_ms']} ms")
@@ -0,0 +1,151 @@
+"""
+Fundamentals Cache module for Baostock financial reports.
+
+Financial reports of a closed period never change, yet the fundamental filter
+queried growth, profit and balance data of every stock for every year on each
+scan. Reports are now kept in a SQLite store keyed by (code, year, quarter,
+report). Reports Baostock has no data for are stored as missing and queried
+again only after MISSING_REPORT_RETRY_AGE seconds, since they may still be
+published.
+"""
+import os
+import time
+import sqlite3
+import threading
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+
+from .json_utils import dumps_json_str, loads_json
+
+# Report types of a stock and period
+FUNDAMENTAL_REPORTS = ('growth', 'profit', 'balance')
+
+# Seconds after which a report without data is queried again
+MISSING_REPORT_RETRY_AGE = 7 * 24 * 3600
+
+# Maximum number of SQLite parameters per query
+_QUERY_BATCH_SIZE = 500
+
+
+def default_fundamentals_db_path() -> str:
+    """
+    Get the default fundamentals cache location.
+
+    Follows the same layout as the task store: /app/data inside the Docker
+    image, api/data otherwise.
+    """
+    if os.path.exists('/app/api'):
+        return '/app/data/fundamentals.db'
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'fundamentals.db')
+
+
+class FundamentalsCache:
+    """SQLite-backed cache of financial reports."""
+
+    def __init__(self, path: Optional[str] = None,
+                 missing_retry_age: float = MISSING_REPORT_RETRY_AGE):
+        self.path = path or default_fundamentals_db_path()
+        self.missing_retry_age = missing_retry_age
+        self._local = threading.local()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._connect().executescript("""
+            CREATE TABLE IF NOT EXISTS reports (
+                code TEXT NOT NULL,
+                year INTEGER NOT NULL,
+                quarter INTEGER NOT NULL,
+                report TEXT NOT NULL,
+                data TEXT,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (code, year, quarter, report)
+            ) WITHOUT ROWID;
+        """)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get the connection of the current thread."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_reports(self, codes: Iterable[str], years: Iterable[int],
+                    quarter: int = 4) -> Dict[Tuple[str, int, str], Optional[Dict[str, Any]]]:
+        """
+        Get the cached reports of several stocks.
+
+        Args:
+            codes: Stock codes
+            years: Report years
+            quarter: Report quarter
+
+        Returns:
+            Dictionary mapping (code, year, report) to the report row, or to
+            None for a report known to have no data. Reports that are not
+            cached, or missing for longer than the retry age, are left out.
+        """
+        codes = list(codes)
+        years = list(years)
+        if not codes or not years:
+            return {}
+
+        retry_before = time.time() - self.missing_retry_age
+        year_marks = ','.join('?' * len(years))
+        conn = self._connect()
+        reports = {}
+        for start in range(0, len(codes), _QUERY_BATCH_SIZE):
+            batch = codes[start:start + _QUERY_BATCH_SIZE]
+            rows = conn.execute(
+                f"SELECT code, year, report, data, fetched_at FROM reports"
+                f" WHERE code IN ({','.join('?' * len(batch))}) AND year IN ({year_marks})"
+                f" AND quarter = ?", (*batch, *years, quarter)).fetchall()
+            for row in rows:
+                if row['data'] is None:
+                    if row['fetched_at'] < retry_before:
+                        continue
+                    data = None
+                else:
+                    data = loads_json(row['data'])
+                reports[(row['code'], row['year'], row['report'])] = data
+        return reports
+
+    def save_reports(self, reports: List[Tuple[str, int, int, str, Optional[Dict[str, Any]]]]) -> None:
+        """
+        Save fetched reports.
+
+        Args:
+            reports: (code, year, quarter, report, row) tuples; row is None
+                for a report without data
+        """
+        if not reports:
+            return
+        now = time.time()
+        rows = [(code, year, quarter, report, dumps_json_str(data) if data is not None else None, now)
+                for code, year, quarter, report, data in reports]
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO reports (code, year, quarter, report, data, fetched_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)", rows)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+_default_cache: Optional[FundamentalsCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_fundamentals_cache() -> FundamentalsCache:
+    """Get the process-wide fundamentals cache at the default location."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = FundamentalsCache()
+        return _default_cache
@@ -2,19 +2,19 @@
 from colorama import Fore, Style
 import colorama  # For colored console output
 import traceback
-import pandas as pd
-from typing import List, Dict, Optional, Union
+from typing import List, Dict, Optional, Union, Any
 from pydantic import BaseModel, Field, RootModel
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 import sys
 import os
+import time
+import asyncio
 
 import json
-import re
-import math
-from datetime import datetime, timedelta
-from collections.abc import Mapping, Iterable
+from datetime import datetime
 
 # 添加当前目录到 Python 路径，以便导入模块
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -22,20 +22,36 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # Import our modular components (using absolute imports)
 try:
-    from api.config import ScanConfig
-    from api.task_manager import task_manager, TaskStatus
-    from api.data_fetcher import fetch_stock_basics, fetch_industry_data, BaostockConnectionManager, fetch_kline_data
+    from api.config import ScanConfig, DataSourceName
+    from api.task_manager import task_manager, TaskStatus, TERMINAL_STATUSES
+    from api.data_fetcher import BaostockConnectionManager
     from api.platform_scanner import prepare_stock_list, scan_stocks
     from api.case_api import router as case_router
     from api.excalibur.excutor import scan_test_stock
+    from api.kline_store import get_kline_store
+    from api.kline_sync import sync_stock_kline, default_history_range, SYNC_EMPTY
+    from api.parameter_sweep import build_sweep_configs, run_parameter_sweep
+    from api.json_utils import SafeJSONResponse
+    from api.result_history import get_result_history
+    from api.reference_data import get_reference_data
+    from api.universe import MAIN_BOARD_PREFIXES
+    from api.kline_codec import kline_rows, negotiate_kline_format, encode_scan_results, ROWS_JSON
 except ImportError:
     # 如果绝对导入失败，尝试相对导入（本地开发环境）
-    from .config import ScanConfig
-    from .task_manager import task_manager, TaskStatus
-    from .data_fetcher import fetch_stock_basics, fetch_industry_data, BaostockConnectionManager, fetch_kline_data
+    from .config import ScanConfig, DataSourceName
+    from .task_manager import task_manager, TaskStatus, TERMINAL_STATUSES
+    from .data_fetcher import BaostockConnectionManager
     from .platform_scanner import prepare_stock_list, scan_stocks
     from .case_api import router as case_router
     from .excalibur.excutor import scan_test_stock
+    from .kline_store import get_kline_store
+    from .kline_sync import sync_stock_kline, default_history_range, SYNC_EMPTY
+    from .parameter_sweep import build_sweep_configs, run_parameter_sweep
+    from .json_utils import SafeJSONResponse
+    from .result_history import get_result_history
+    from .reference_data import get_reference_data
+    from .universe import MAIN_BOARD_PREFIXES
+    from .kline_codec import kline_rows, negotiate_kline_format, encode_scan_results, ROWS_JSON
 
 
 # Define request body model using Pydantic
@@ -112,12 +128,42 @@ class ScanConfigRequest(BaseModel):
     window_weights: Dict[int, float] = Field(
         default_factory=dict)  # Weights for different windows
 
+    # Stock universe settings
+    # Scan only codes starting with one of these prefixes, e.g. 'sh.60' (empty = all)
+    code_prefixes: List[str] = Field(default_factory=list)
+    # Scan only these codes (empty = all)
+    include_codes: List[str] = Field(default_factory=list)
+    # Codes never scanned
+    exclude_codes: List[str] = Field(default_factory=list)
+
+    # Data source settings
+    # Where scans read K-line data from: 'network', 'cache' or 'cache_first'
+    data_source: DataSourceName = "cache_first"
+    # Maximum age in days of cached K-line data used by 'cache_first'
+    cache_max_staleness_days: int = 3
+
     # System settings
     max_workers: int = 5  # Keep concurrency reasonable for serverless
+    # Number of analysis worker processes (0 = one per CPU core)
+    analysis_workers: int = 0
+    # Maximum fetched stocks waiting for analysis
+    pipeline_queue_size: int = 64
+    # Reject stocks with vectorized necessary conditions before the full analysis
+    use_prefilter: bool = True
+    # Maximum number of fetched stocks prefiltered together
+    prefilter_batch_size: int = 256
     retry_attempts: int = 2
     retry_delay: int = 1
     expected_count: int = 10  # 期望返回的股票数量，默认为10
 
+
+class SweepRequest(BaseModel):
+    """Request model for a parameter sweep over scan configurations."""
+    # Values of the parameters that are not swept, plus data source and system settings
+    config: ScanConfigRequest = Field(default_factory=ScanConfigRequest)
+    # Parameter name -> list of values; every combination is evaluated
+    grid: Dict[str, List[Any]]
+
 # --- Define response models ---
 
 
@@ -169,12 +215,34 @@ class TaskCreationResponse(BaseModel):
 
 
 class TaskStatusResponse(BaseModel):
-    """Response model for task status."""
+    """Response model for task status (metadata only; results are paged separately)."""
+    task_id: str
+    status: str
+    progress: int
+    message: str
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
+    completed_at: Optional[float] = None
+
+
+class ScanResultsPage(BaseModel):
+    """Response model for a page of scan results."""
+    task_id: str
+    status: str
+    total: int
+    offset: int
+    limit: int
+    items: List[Dict[str, Any]]
+
+
+class SweepStatusResponse(BaseModel):
+    """Response model for parameter sweep task status."""
     task_id: str
     status: str
     progress: int
     message: str
-    result: Optional[List[StockScanResult]] = None
+    result: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
     created_at: float
     updated_at: float
@@ -200,6 +268,19 @@ app.add_middleware(
 # Include case management router
 app.include_router(case_router, prefix="/api")
 
+
+@app.on_event("startup")
+def warm_up_reference_data():
+    # Load stock basics and industry data before the first scan asks for them
+    get_reference_data().warm_up()
+
+
+@app.on_event("startup")
+def start_task_dispatcher():
+    # Claim queued tasks from the shared store, including tasks queued by
+    # other workers and tasks requeued after a worker exited
+    task_manager.start_dispatcher()
+
 # --- API Endpoints ---
 
 
@@ -219,157 +300,287 @@ async def scan_stock_platform(code: str, start_date: Union[str, None] = None, en
     return scan_test_stock(code, start_date= start_date or '2020-08-27', end_date= end_date or '2025-08-25')
 
 
-@app.post("/api/stocks/kline/history", response_model=TaskCreationResponse)
-async def fetch_all_stocks_kline_history(background_tasks: BackgroundTasks):
-    """
-    Start a background task to fetch 5-year daily K-line data for all eligible stocks.
-    Eligible stocks are those with code starting with 'sh.60', 'sz.00', or 'sz.30' and status=1.
-    Data will be saved in data/cache/stocks directory.
-    """
-    # Initialize colorama for colored console output
-    colorama.init()
-    
-    print(f"{Fore.CYAN}======================================{Style.RESET_ALL}")
-    print(f"{Fore.CYAN}Starting 5-year K-line data fetch task{Style.RESET_ALL}")
-    print(f"{Fore.CYAN}======================================{Style.RESET_ALL}")
-    
-    # Create a new task
-    task_id = task_manager.create_task()
-    
-    # Start the K-line data fetch in the background
-    def run_kline_fetch_task():
-        try:
+def run_kline_fetch_task(task_id: str, mode: str) -> None:
+    """Fetch the K-line history of all eligible stocks into the K-line store."""
+    try:
+        # Update task status
+        task_manager.update_task(
+            task_id,
+            progress=0,
+            message="Starting K-line data fetch task"
+        )
+        
+        with BaostockConnectionManager():
+            # Main board and ChiNext stocks that are listed and active
+            universe = get_reference_data().get_universe(code_prefixes=MAIN_BOARD_PREFIXES)
+            filtered_stocks = universe[['code', 'name']].to_dict('records')
+            
             # Update task status
             task_manager.update_task(
                 task_id,
-                progress=0,
-                message="Starting K-line data fetch task"
+                progress=10,
+                message="Loaded stock basic information"
             )
             
-            # Fetch stock basics
-            with BaostockConnectionManager():
-                stock_basics_df = fetch_stock_basics()
-                
-                # Update task status
-                task_manager.update_task(
-                    task_id,
-                    progress=10,
-                    message="Fetched stock basic information"
-                )
-                
-                # Filter stocks based on criteria
-                # Criteria: code starts with 'sh.60', 'sz.00', or 'sz.30' and status=1
-                filtered_stocks = []
-                
-                # Iterate through stock basics to filter
-                for _, row in stock_basics_df.iterrows():
-                    code = row['code']
-                    status = row['status']
+            # Calculate 5 years ago from today
+            history_range = default_history_range()
+            end_date = history_range['end_date']
+            start_date = history_range['start_date']
+            
+            # Columnar K-line store
+            kline_store = get_kline_store()
+            
+            total_stocks = len(filtered_stocks)
+            print(f"{Fore.GREEN}Found {total_stocks} eligible stocks to fetch K-line data for{Style.RESET_ALL}")
+            
+            # Update task status
+            task_manager.update_task(
+                task_id,
+                progress=20,
+                message=f"Found {total_stocks} eligible stocks to fetch K-line data for"
+            )
+            
+            # Fetch K-line data for each stock
+            success_count = 0
+            failure_count = 0
+            
+            for i, stock in enumerate(filtered_stocks):
+                try:
+                    # Fetch the missing tail (or the full range) and store it
+                    sync_result = sync_stock_kline(
+                        code=stock['code'],
+                        store=kline_store,
+                        end_date=end_date,
+                        full_start_date=start_date,
+                        full_refresh=(mode == "full")
+                    )
                     
-                    # Check if stock meets criteria
-                    if (status == '1' and 
-                        (code.startswith('sh.60') or 
-                         code.startswith('sz.00') or 
-                         code.startswith('sz.30'))):
-                        filtered_stocks.append({
-                            'code': code,
-                            'name': row['code_name']
-                        })
-                
-                # Calculate 5 years ago from today
-                end_date = '2025-08-27' or datetime.now().strftime('%Y-%m-%d')
-                start_date = '2020-08-28' or (datetime.now() - timedelta(days=5*365)).strftime('%Y-%m-%d')
-                
-                # Create cache directory
-                stocks_cache_dir = os.path.join('data', 'cache', 'stocks')
-                os.makedirs(stocks_cache_dir, exist_ok=True)
-                
-                total_stocks = len(filtered_stocks)
-                print(f"{Fore.GREEN}Found {total_stocks} eligible stocks to fetch K-line data for{Style.RESET_ALL}")
-                
-                # Update task status
-                task_manager.update_task(
-                    task_id,
-                    progress=20,
-                    message=f"Found {total_stocks} eligible stocks to fetch K-line data for"
-                )
-                
-                # Fetch K-line data for each stock
-                success_count = 0
-                failure_count = 0
-                
-                for i, stock in enumerate(filtered_stocks):
-                    try:
-                        # Fetch K-line data
-                        kline_df = fetch_kline_data(
-                            code=stock['code'],
-                            start_date=start_date,
-                            end_date=end_date
-                        )
-                        
-                        if not kline_df.empty:
-                            # Save K-line data
-                            stock_file = os.path.join(
-                                stocks_cache_dir, 
-                                f"{stock['code']}_{start_date}-{end_date}.pkl"
-                            )
-                            kline_df.to_pickle(stock_file)
-                            
-                            # Also save as CSV for easier inspection
-                            csv_file = os.path.join(
-                                stocks_cache_dir, 
-                                f"{stock['code']}_{start_date}-{end_date}.csv"
-                            )
-                            kline_df.to_csv(csv_file, index=False, encoding='utf-8')
-                            
-                            success_count += 1
-                            print(f"{Fore.GREEN}Successfully fetched K-line data for {stock['code']} ({stock['name']}){Style.RESET_ALL}")
-                        else:
-                            failure_count += 1
-                            print(f"{Fore.YELLOW}No data returned for {stock['code']} ({stock['name']}){Style.RESET_ALL}")
-                        
-                    except Exception as e:
+                    if sync_result['status'] != SYNC_EMPTY:
+                        success_count += 1
+                        print(f"{Fore.GREEN}Synced K-line data for {stock['code']} ({stock['name']}): {sync_result['status']}, {sync_result['rows']} rows{Style.RESET_ALL}")
+                    else:
                         failure_count += 1
-                        print(f"{Fore.RED}Failed to fetch K-line data for {stock['code']} ({stock['name']}): {e}{Style.RESET_ALL}")
+                        print(f"{Fore.YELLOW}No data returned for {stock['code']} ({stock['name']}){Style.RESET_ALL}")
                     
-                    # Update progress
-                    progress = 20 + int((i + 1) / total_stocks * 70)  # 20-90% for data fetching
-                    task_manager.update_task(
-                        task_id,
-                        progress=progress,
-                        message=f"Fetched data for {i+1}/{total_stocks} stocks ({success_count} success, {failure_count} failed)"
-                    )
+                except Exception as e:
+                    failure_count += 1
+                    print(f"{Fore.RED}Failed to fetch K-line data for {stock['code']} ({stock['name']}): {e}{Style.RESET_ALL}")
                 
-                # Final update
+                # Update progress
+                progress = 20 + int((i + 1) / total_stocks * 70)  # 20-90% for data fetching
                 task_manager.update_task(
                     task_id,
-                    progress=100,
-                    message=f"K-line data fetch completed: {success_count} stocks successfully fetched, {failure_count} failed",
-                    status=TaskStatus.COMPLETED
+                    progress=progress,
+                    message=f"Fetched data for {i+1}/{total_stocks} stocks ({success_count} success, {failure_count} failed)"
                 )
-                
-        except Exception as e:
-            error_message = f"Error during K-line data fetch: {str(e)}"
-            print(f"{Fore.RED}{error_message}{Style.RESET_ALL}")
-            traceback.print_exc()
+
+            # Persist the store manifest
+            kline_store.flush()
             
+            # Final update
             task_manager.update_task(
                 task_id,
-                status=TaskStatus.FAILED,
-                error=error_message
+                progress=100,
+                message=f"K-line data fetch completed: {success_count} stocks successfully fetched, {failure_count} failed",
+                status=TaskStatus.COMPLETED
             )
+            
+    except Exception as e:
+        error_message = f"Error during K-line data fetch: {str(e)}"
+        print(f"{Fore.RED}{error_message}{Style.RESET_ALL}")
+        traceback.print_exc()
+        
+        task_manager.update_task(
+            task_id,
+            status=TaskStatus.FAILED,
+            error=error_message
+        )
+
+
+task_manager.register_task_kind('kline_history', run_kline_fetch_task)
+
+
+@app.post("/api/stocks/kline/history", response_model=TaskCreationResponse)
+async def fetch_all_stocks_kline_history(mode: str = "sync"):
+    """
+    Start a background task to fetch 5-year daily K-line data for all eligible stocks.
+    Eligible stocks are those with code starting with 'sh.60', 'sz.00', or 'sz.30' and status=1.
+    Data will be saved in the columnar K-line store (data/cache/kline).
+
+    In 'sync' mode (default) only the days missing after the last stored date are
+    fetched; stocks whose forward-adjusted history was restated are refetched in full.
+    In 'full' mode the whole 5-year history of every stock is re-downloaded.
+    """
+    if mode not in ("sync", "full"):
+        raise HTTPException(
+            status_code=400, detail=f"Invalid mode '{mode}', expected 'sync' or 'full'")
+
+    # Initialize colorama for colored console output
+    colorama.init()
+    
+    print(f"{Fore.CYAN}======================================{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}Starting 5-year K-line data fetch task ({mode} mode){Style.RESET_ALL}")
+    print(f"{Fore.CYAN}======================================{Style.RESET_ALL}")
+    
+    # Create a new task
+    task_id = task_manager.create_task()
     
-    # Add task to background
-    background_tasks.add_task(run_kline_fetch_task)
+    # Queue the task on the worker pool
+    task_manager.run_task_in_background(task_id, 'kline_history', mode=mode)
     
     return {
         "task_id": task_id,
-        "message": "Task started: fetching 5-year K-line data for all eligible stocks"
+        "message": f"Task started: fetching 5-year K-line data for all eligible stocks ({mode} mode)"
     }
 
 
+def _build_scan_result(stock: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Convert a platform stock returned by scan_stocks into the StockScanResult format.
+
+    K-line rows are converted column-wise by kline_rows instead of building a
+    KlineDataPoint model per day.
+
+    Args:
+        stock: Platform stock dictionary
+
+    Returns:
+        Dictionary matching StockScanResult, or None if the stock cannot be converted
+    """
+    try:
+        # 处理标记线数据
+        mark_lines = []
+        if 'mark_lines' in stock:
+            for mark in stock['mark_lines']:
+                try:
+                    mark_lines.append(MarkLine(**mark))
+                except Exception as e:
+                    print(
+                        f"{Fore.YELLOW}Warning: Failed to process mark line: {e}{Style.RESET_ALL}")
+                    continue
+
+        result_stock = StockScanResult(
+            code=stock['code'],
+            name=stock['name'],
+            industry=stock.get('industry', '未知行业'),
+            selection_reasons=stock.get('selection_reasons', {}),
+            kline_data=[],
+            mark_lines=mark_lines
+        )
+    except Exception as e:
+        print(f"{Fore.RED}Error creating StockScanResult: {e}{Style.RESET_ALL}")
+        return None
+
+    result = result_stock.model_dump()
+    result['kline_data'] = kline_rows(stock.get('kline_data', []))
+    return result
+
+
+def run_scan_task(task_id: str, config: Dict[str, Any]) -> None:
+    """Run a stock platform scan with a scan configuration dictionary."""
+    try:
+        # Load stock basics and industry data from the reference data cache
+        with BaostockConnectionManager():
+            reference_data = get_reference_data()
+            reference_data.get_stock_basics()
+            task_manager.update_task(
+                task_id,
+                progress=10,
+                message="Loaded stock basic information"
+            )
+
+            industry_df = reference_data.get_industry_data()
+            task_manager.update_task(
+                task_id,
+                progress=20,
+                message=("Loaded industry classification data" if not industry_df.empty
+                         else "Warning: Failed to fetch industry data, continuing without it")
+            )
+
+            # Create scan config
+            scan_config = ScanConfig(**config)
+
+            # Prepare stock list
+            stock_list = prepare_stock_list(
+                code_prefixes=scan_config.code_prefixes,
+                include_codes=scan_config.include_codes,
+                exclude_codes=scan_config.exclude_codes
+            )
+            task_manager.update_task(
+                task_id,
+                progress=30,
+                message=f"Prepared list of {len(stock_list)} stocks for scanning"
+            )
+
+            # Define progress update callback
+            def update_progress(progress=None, message=None):
+                if progress is not None and message is not None:
+                    # Scale progress to 30-90 range (30% for preparation, 60% for scanning, 10% for post-processing)
+                    scaled_progress = 30 + int(progress * 0.6)
+                    task_manager.update_task(
+                        task_id, progress=scaled_progress, message=message)
+
+            # Publish every match as soon as it is found, so stream readers
+            # can render stocks before the whole scan completes
+            def publish_match(stock):
+                result_stock = _build_scan_result(stock)
+                if result_stock is not None:
+                    task_manager.publish_event(task_id, 'match', result_stock)
+
+            # Run the scan
+            platform_stocks = scan_stocks(
+                stock_list, scan_config, update_progress, on_result=publish_match)
+
+            # Process results for API response
+            result_stocks = []
+            for stock in platform_stocks:
+                result_stock = _build_scan_result(stock)
+                if result_stock is not None:
+                    result_stocks.append(result_stock)
+
+            # Tell stream readers which of the matches survived the final filters
+            task_manager.publish_event(
+                task_id, 'final', {'codes': [stock['code'] for stock in result_stocks]})
+
+            # Update task with final result
+            task_manager.update_task(
+                task_id,
+                status=TaskStatus.COMPLETED,
+                progress=100,
+                message=f"Scan completed. Found {len(result_stocks)} platform stocks.",
+                result=result_stocks
+            )
+
+            # Keep the run in the result history
+            task = task_manager.get_task(task_id)
+            try:
+                get_result_history().save_run(
+                    task_id,
+                    result_stocks,
+                    created_at=task.created_at if task else None,
+                    completed_at=task.completed_at if task else None,
+                    message=task.message if task else None,
+                    config=config
+                )
+                print(f"{Fore.GREEN}Task results saved to the result history{Style.RESET_ALL}")
+            except Exception as e:
+                print(f"{Fore.RED}Error saving task results to the result history: {e}{Style.RESET_ALL}")
+
+    except Exception as e:
+        print(f"{Fore.RED}Error in scan task: {e}{Style.RESET_ALL}")
+        traceback.print_exc()
+        task_manager.update_task(
+            task_id,
+            status=TaskStatus.FAILED,
+            error=f"Scan failed: {str(e)}\n{traceback.format_exc()}"
+        )
+
+
+task_manager.register_task_kind('scan', run_scan_task)
+
+
 @app.post("/api/scan/start", response_model=TaskCreationResponse)
-async def start_scan(config_request: ScanConfigRequest, background_tasks: BackgroundTasks):
+async def start_scan(config_request: ScanConfigRequest):
     """
     Start a stock platform scan as a background task.
     Returns a task ID that can be used to check the status of the scan.
@@ -390,185 +601,236 @@ async def start_scan(config_request: ScanConfigRequest, background_tasks: Backgr
     for key, value in config_dict.items():
         print(f"  - {key}: {Fore.GREEN}{value}{Style.RESET_ALL}")
 
-    # Start the scan in the background
-    def run_scan_task():
-        try:
-            # Fetch stock basics
-            with BaostockConnectionManager():
-                stock_basics_df = fetch_stock_basics()
+    # Queue the task on the worker pool
+    task_manager.run_task_in_background(task_id, 'scan', config=config_dict)
 
-                print(f"stock_basics_df: {stock_basics_df}")
+    # Return task ID
+    return TaskCreationResponse(
+        task_id=task_id,
+        message="Scan queued successfully. Use the task ID to check status."
+    )
 
-                # Save stock basics data to cache
-                cache_dir = os.path.join('data', 'cache')
-                os.makedirs(cache_dir, exist_ok=True)
-                
-                # Create timestamped filename
-                pickle_file = os.path.join(cache_dir, f'stock_basics.pkl')
-                csv_file = os.path.join(cache_dir, f'stock_basics.csv')
-                
-                # Save data in both pickle and CSV formats
-                stock_basics_df.to_pickle(pickle_file)
-                stock_basics_df.to_csv(csv_file, index=False, encoding='utf-8')
-                
-                print(f"{Fore.GREEN}Stock basics data saved to cache: {pickle_file} and {csv_file}{Style.RESET_ALL}")
 
-                # Update task status
-                task_manager.update_task(
-                    task_id,
-                    progress=10,
-                    message="Fetched stock basic information"
-                )
+@app.get("/api/scan/status/{task_id}", response_model=TaskStatusResponse)
+async def get_scan_status(task_id: str):
+    """
+    Get the status of a scan task.
+    Only the task metadata is returned, so polling costs the same regardless
+    of the result size; use /api/scan/{task_id}/results to read the result.
+    """
+    task = task_manager.get_task(task_id)
+    if not task:
+        raise HTTPException(
+            status_code=404, detail=f"Task with ID {task_id} not found")
 
-                # Fetch industry data
-                try:
-                    industry_df = fetch_industry_data()
-                    task_manager.update_task(
-                        task_id,
-                        progress=20,
-                        message="Fetched industry classification data"
-                    )
-                except Exception as e:
-                    print(
-                        f"{Fore.YELLOW}Warning: Failed to fetch industry data: {e}{Style.RESET_ALL}")
-                    industry_df = pd.DataFrame()
-                    task_manager.update_task(
-                        task_id,
-                        progress=20,
-                        message="Warning: Failed to fetch industry data, continuing without it"
-                    )
+    return task.to_dict(include_result=False)
+
+
+# Maximum number of stocks per results page
+MAX_RESULTS_PAGE_SIZE = 500
+
+
+@app.get("/api/scan/{task_id}/results", response_model=ScanResultsPage)
+async def get_scan_results(task_id: str, request: Request, offset: int = 0, limit: int = 50,
+                           fields: Optional[str] = None):
+    """
+    Get a page of the results of a scan task.
+
+    The Accept header selects the encoding: JSON rows by default, or compact
+    column-oriented K-lines (see kline_codec); compact responses carry the page
+    position in the X-Total-Count and X-Offset headers.
+
+    Args:
+        offset: Index of the first stock
+        limit: Number of stocks per page (at most MAX_RESULTS_PAGE_SIZE)
+        fields: Comma-separated fields to return for each stock, e.g.
+            'code,name,industry,selection_reasons' to leave out kline_data
+    """
+    if offset < 0 or limit < 1 or limit > MAX_RESULTS_PAGE_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"offset must be >= 0 and limit between 1 and {MAX_RESULTS_PAGE_SIZE}")
+
+    field_list = [field.strip() for field in fields.split(',') if field.strip()] if fields else None
+    page = task_manager.get_result_page(task_id, offset, limit, field_list)
+    if page is None:
+        raise HTTPException(
+            status_code=404, detail=f"Task with ID {task_id} not found")
+
+    media_type = negotiate_kline_format(request.headers.get('accept'))
+    if media_type != ROWS_JSON:
+        body, media_type = encode_scan_results(page['items'], media_type)
+        return Response(content=body, media_type=media_type, headers={
+            'X-Total-Count': str(page['total']), 'X-Offset': str(page['offset'])})
+
+    return page
+
+
+# Polling interval of the event stream and the idle time before a keep-alive comment
+STREAM_POLL_INTERVAL = 0.5
+STREAM_HEARTBEAT_INTERVAL = 15
+STREAM_EVENT_BATCH = 500
 
-                # Prepare stock list
-                stock_list = prepare_stock_list(stock_basics_df, industry_df)
-                task_manager.update_task(
-                    task_id,
-                    progress=30,
-                    message=f"Prepared list of {len(stock_list)} stocks for scanning"
-                )
 
-                # Create scan config
-                scan_config = ScanConfig(**config_dict)
-
-                # Define progress update callback
-                def update_progress(progress=None, message=None):
-                    if progress is not None and message is not None:
-                        # Scale progress to 30-90 range (30% for preparation, 60% for scanning, 10% for post-processing)
-                        scaled_progress = 30 + int(progress * 0.6)
-                        task_manager.update_task(
-                            task_id, progress=scaled_progress, message=message)
-
-                # Run the scan
-                platform_stocks = scan_stocks(
-                    stock_list, scan_config, update_progress)
-
-                # Process results for API response
-                result_stocks = []
-                for stock in platform_stocks:
-                    # Convert kline_data to KlineDataPoint objects
-                    kline_data = []
-                    for point in stock.get('kline_data', []):
-                        try:
-                            kline_point = {
-                                'date': str(point.get('date')),
-                                'open': float(point['open']) if point.get('open') is not None else None,
-                                'high': float(point['high']) if point.get('high') is not None else None,
-                                'low': float(point['low']) if point.get('low') is not None else None,
-                                'close': float(point['close']) if point.get('close') is not None else None,
-                                'volume': float(point['volume']) if point.get('volume') is not None else None,
-                                'turn': float(point['turn']) if point.get('turn') is not None else None,
-                                'preclose': float(point['preclose']) if point.get('preclose') is not None else None,
-                                'pctChg': float(point['pctChg']) if point.get('pctChg') is not None else None,
-                                'peTTM': float(point['peTTM']) if point.get('peTTM') is not None else None,
-                                'pbMRQ': float(point['pbMRQ']) if point.get('pbMRQ') is not None else None,
-                            }
-                            kline_data.append(KlineDataPoint(**kline_point))
-                        except Exception as e:
-                            print(
-                                f"{Fore.YELLOW}Warning: Failed to process K-line data point: {e}{Style.RESET_ALL}")
-                            continue
-
-                    # Create StockScanResult object
-                    try:
-                        # 处理标记线数据
-                        mark_lines = []
-                        if 'mark_lines' in stock:
-                            for mark in stock['mark_lines']:
-                                try:
-                                    mark_lines.append(MarkLine(**mark))
-                                except Exception as e:
-                                    print(
-                                        f"{Fore.YELLOW}Warning: Failed to process mark line: {e}{Style.RESET_ALL}")
-                                    continue
-
-                        result_stock = StockScanResult(
-                            code=stock['code'],
-                            name=stock['name'],
-                            industry=stock.get('industry', '未知行业'),
-                            selection_reasons=stock.get(
-                                'selection_reasons', {}),
-                            kline_data=kline_data,
-                            mark_lines=mark_lines
-                        )
-                        result_stocks.append(result_stock)
-                    except Exception as e:
-                        print(
-                            f"{Fore.RED}Error creating StockScanResult: {e}{Style.RESET_ALL}")
-                        continue
-
-                # Update task with final result
-                result_data = [stock.model_dump() for stock in result_stocks]
+def _format_sse(event: str, data: str, event_id: Optional[int] = None) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {data}")
+    return "\n".join(lines) + "\n\n"
+
+
+@app.get("/api/scan/stream/{task_id}")
+async def stream_scan(task_id: str, request: Request, last_event_id: Optional[int] = None):
+    """
+    Stream the progress of a scan task as Server-Sent Events.
+
+    Emits 'progress' events whenever the status, progress or message changes,
+    a 'match' event for every platform stock as soon as it is found, and a
+    'final' event with the codes left after the final filters. The stream ends
+    after the progress event carrying a terminal status. Reconnecting clients
+    resume after the Last-Event-ID header (or the last_event_id parameter).
+    """
+    task = task_manager.get_task(task_id)
+    if not task:
+        raise HTTPException(
+            status_code=404, detail=f"Task with ID {task_id} not found")
+
+    header_id = request.headers.get('last-event-id')
+    if header_id and header_id.isdigit():
+        last_event_id = int(header_id)
+    after_id = last_event_id or 0
+
+    async def event_stream():
+        nonlocal after_id
+        last_progress = None
+        idle_since = time.monotonic()
+
+        while True:
+            if await request.is_disconnected():
+                break
+
+            # Read the task before its events: everything published before a
+            # terminal status is then guaranteed to be sent before the stream ends
+            current = await run_in_threadpool(task_manager.get_task, task_id)
+            if current is None:
+                break
+
+            sent = False
+            while True:
+                events = await run_in_threadpool(task_manager.get_events, task_id, after_id, STREAM_EVENT_BATCH)
+                for event_id, event, data in events:
+                    yield _format_sse(event, data, event_id)
+                    after_id = event_id
+                    sent = True
+                if len(events) < STREAM_EVENT_BATCH:
+                    break
+
+            progress = {
+                'status': current.status.value,
+                'progress': current.progress,
+                'message': current.message,
+                'error': current.error
+            }
+            if progress != last_progress:
+                yield _format_sse('progress', json.dumps(progress, ensure_ascii=False))
+                last_progress = progress
+                sent = True
+
+            if current.status in TERMINAL_STATUSES:
+                break
+
+            if sent:
+                idle_since = time.monotonic()
+            elif time.monotonic() - idle_since >= STREAM_HEARTBEAT_INTERVAL:
+                # Comment line keeps proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+                idle_since = time.monotonic()
+
+            await asyncio.sleep(STREAM_POLL_INTERVAL)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def run_sweep_task(task_id: str, config: Dict[str, Any], grid: Dict[str, List[Any]]) -> None:
+    """Run a parameter sweep of a scan configuration dictionary over a parameter grid."""
+    try:
+        scan_config = ScanConfig(**config)
+        config_count = len(build_sweep_configs(scan_config, grid))
+        stock_list = prepare_stock_list(
+            code_prefixes=scan_config.code_prefixes,
+            include_codes=scan_config.include_codes,
+            exclude_codes=scan_config.exclude_codes
+        )
+        task_manager.update_task(
+            task_id,
+            status=TaskStatus.RUNNING,
+            progress=5,
+            message=f"Prepared list of {len(stock_list)} stocks for {config_count} configurations"
+        )
+
+        def update_progress(progress=None, message=None):
+            if progress is not None and message is not None:
                 task_manager.update_task(
-                    task_id,
-                    status=TaskStatus.COMPLETED,
-                    progress=100,
-                    message=f"Scan completed. Found {len(result_stocks)} platform stocks.",
-                    result=result_data
-                )
-                
-                # Get the updated task to include all fields
-                task = task_manager.get_task(task_id)
-                task_dict = task.to_dict() if task else None
-                
-                # Write result to JSON file with date in filename
-                # Get current date in YYYY-MM-DD format
-                current_date = datetime.now().strftime('%Y-%m-%d')
-                file_name = f"result-{current_date}.json"
-                
-                # Create data directory if it doesn't exist
-                os.makedirs('data', exist_ok=True)
-                file_path = os.path.join('data', file_name)
-                
-                # Write complete task information to file
-                try:
-                    with open(file_path, 'w', encoding='utf-8') as f:
-                        json.dump(task_dict, f, ensure_ascii=False, indent=2)
-                    print(f"{Fore.GREEN}Task results successfully written to {file_path}{Style.RESET_ALL}")
-                except Exception as e:
-                    print(f"{Fore.RED}Error writing task results to file: {e}{Style.RESET_ALL}")
+                    task_id, progress=5 + int(progress * 0.95), message=message)
+
+        result = run_parameter_sweep(
+            stock_list, scan_config, grid, update_progress)
+
+        task_manager.update_task(
+            task_id,
+            status=TaskStatus.COMPLETED,
+            progress=100,
+            message=f"Sweep completed. Evaluated {result['config_count']} configurations.",
+            result=result
+        )
+    except Exception as e:
+        print(f"{Fore.RED}Error in sweep task: {e}{Style.RESET_ALL}")
+        traceback.print_exc()
+        task_manager.update_task(
+            task_id,
+            status=TaskStatus.FAILED,
+            error=f"Sweep failed: {str(e)}\n{traceback.format_exc()}"
+        )
 
-        except Exception as e:
-            print(f"{Fore.RED}Error in scan task: {e}{Style.RESET_ALL}")
-            traceback.print_exc()
-            task_manager.update_task(
-                task_id,
-                status=TaskStatus.FAILED,
-                error=f"Scan failed: {str(e)}\n{traceback.format_exc()}"
-            )
 
-    # Start the task in the background
-    background_tasks.add_task(run_scan_task)
+task_manager.register_task_kind('sweep', run_sweep_task)
+
+
+@app.post("/api/sweep/start", response_model=TaskCreationResponse)
+async def start_sweep(sweep_request: SweepRequest):
+    """
+    Start a parameter sweep as a background task.
+    Every combination of the grid is evaluated against features extracted
+    once per stock; the result lists the hit count and hits of each config.
+    """
+    colorama.init()
+
+    scan_config = ScanConfig(**sweep_request.config.model_dump())
+    try:
+        config_count = len(build_sweep_configs(scan_config, sweep_request.grid))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    task_id = task_manager.create_task()
+
+    task_manager.run_task_in_background(
+        task_id, 'sweep', config=sweep_request.config.model_dump(), grid=sweep_request.grid)
 
-    # Return task ID
     return TaskCreationResponse(
         task_id=task_id,
-        message="Scan started successfully. Use the task ID to check status."
+        message=f"Sweep of {config_count} configurations started. Use the task ID to check status."
     )
 
 
-@app.get("/api/scan/status/{task_id}", response_model=TaskStatusResponse)
-async def get_scan_status(task_id: str):
+@app.get("/api/sweep/status/{task_id}", response_model=SweepStatusResponse)
+async def get_sweep_status(task_id: str):
     """
-    Get the status of a scan task.
+    Get the status of a parameter sweep task.
     """
     task = task_manager.get_task(task_id)
     if not task:
@@ -577,15 +839,42 @@ async def get_scan_status(task_id: str):
 
     return task.to_dict()
 
+@app.get("/api/tasks")
+async def list_tasks():
+    """
+    List all tasks with their status (without results).
+    """
+    return task_manager.get_all_tasks()
+
+
+@app.post("/api/tasks/{task_id}/cancel")
+async def cancel_task(task_id: str):
+    """
+    Cancel a queued or running task.
+    Queued tasks are cancelled immediately; running tasks stop at their next progress update.
+    """
+    task = task_manager.get_task(task_id)
+    if not task:
+        raise HTTPException(
+            status_code=404, detail=f"Task with ID {task_id} not found")
+
+    if not task_manager.cancel_task(task_id):
+        raise HTTPException(
+            status_code=409, detail=f"Task {task_id} is already {task.status.value}")
+
+    return task_manager.get_task(task_id).to_dict(include_result=False)
+
 # Legacy endpoint for backward compatibility
 
 
 @app.post("/api/scan", response_model=List[StockScanResult])
-async def run_scan(config_request: ScanConfigRequest):
+async def run_scan(config_request: ScanConfigRequest, request: Request):
     """
     Legacy API endpoint for backward compatibility.
     This endpoint starts a scan and waits for it to complete.
     For long-running scans, use the /api/scan/start endpoint instead.
+    Compact column-oriented K-lines are returned when the Accept header asks
+    for them (see kline_codec).
     """
     # Initialize colorama for colored console output
     colorama.init()
@@ -600,75 +889,29 @@ async def run_scan(config_request: ScanConfigRequest):
     # Create scan config
     scan_config = ScanConfig(**config_dict)
 
-    # Fetch stock basics
     with BaostockConnectionManager():
-        stock_basics_df = fetch_stock_basics()
-
-        # Fetch industry data
-        try:
-            industry_df = fetch_industry_data()
-        except Exception as e:
-            print(
-                f"{Fore.YELLOW}Warning: Failed to fetch industry data: {e}{Style.RESET_ALL}")
-            industry_df = pd.DataFrame()
-
-        # Prepare stock list
-        stock_list = prepare_stock_list(stock_basics_df, industry_df)
+        # Prepare stock list from the cached stock basics and industry data
+        stock_list = prepare_stock_list(
+            code_prefixes=scan_config.code_prefixes,
+            include_codes=scan_config.include_codes,
+            exclude_codes=scan_config.exclude_codes
+        )
 
         # Run the scan
         platform_stocks = scan_stocks(stock_list, scan_config)
 
+    # Compact encodings are built from the raw K-line records directly
+    media_type = negotiate_kline_format(request.headers.get('accept'))
+    if media_type != ROWS_JSON:
+        body, media_type = encode_scan_results(platform_stocks, media_type)
+        return Response(content=body, media_type=media_type)
+
     # Process results for API response
     result_stocks = []
     for stock in platform_stocks:
-        # Convert kline_data to KlineDataPoint objects
-        kline_data = []
-        for point in stock.get('kline_data', []):
-            try:
-                kline_point = {
-                    'date': str(point.get('date')),
-                    'open': float(point['open']) if point.get('open') is not None else None,
-                    'high': float(point['high']) if point.get('high') is not None else None,
-                    'low': float(point['low']) if point.get('low') is not None else None,
-                    'close': float(point['close']) if point.get('close') is not None else None,
-                    'volume': float(point['volume']) if point.get('volume') is not None else None,
-                    'turn': float(point['turn']) if point.get('turn') is not None else None,
-                    'preclose': float(point['preclose']) if point.get('preclose') is not None else None,
-                    'pctChg': float(point['pctChg']) if point.get('pctChg') is not None else None,
-                    'peTTM': float(point['peTTM']) if point.get('peTTM') is not None else None,
-                    'pbMRQ': float(point['pbMRQ']) if point.get('pbMRQ') is not None else None,
-                }
-                kline_data.append(KlineDataPoint(**kline_point))
-            except Exception as e:
-                print(
-                    f"{Fore.YELLOW}Warning: Failed to process K-line data point: {e}{Style.RESET_ALL}")
-                continue
-
-        # Create StockScanResult object
-        try:
-            # 处理标记线数据
-            mark_lines = []
-            if 'mark_lines' in stock:
-                for mark in stock['mark_lines']:
-                    try:
-                        mark_lines.append(MarkLine(**mark))
-                    except Exception as e:
-                        print(
-                            f"{Fore.YELLOW}Warning: Failed to process mark line: {e}{Style.RESET_ALL}")
-                        continue
-
-            result_stock = StockScanResult(
-                code=stock['code'],
-                name=stock['name'],
-                industry=stock.get('industry', '未知行业'),
-                selection_reasons=stock.get('selection_reasons', {}),
-                kline_data=kline_data,
-                mark_lines=mark_lines
-            )
+        result_stock = _build_scan_result(stock)
+        if result_stock is not None:
             result_stocks.append(result_stock)
-        except Exception as e:
-            print(f"{Fore.RED}Error creating StockScanResult: {e}{Style.RESET_ALL}")
-            continue
 
     return result_stocks
 
@@ -765,92 +1008,90 @@ async def test_scan(config_request: ScanConfigRequest):
 # 注意：我们已经有了根端点 (/), 不需要额外的 /api 端点
 
 
+# Directory of the result-YYYY-MM-DD.json files written by older versions
+LEGACY_RESULT_DIR = 'data'
+
+
 @app.get("/api/latest-result")
 async def get_latest_result():
     """
-    Get the content of the most recent result file in the data directory.
-    The file naming format is 'result-YYYY-MM-DD.json'.
-    """
-
-    # Helper function to convert non-JSON compliant values
-    def sanitize_json(data):
-        """Recursively sanitize data to be JSON compliant."""
-        if isinstance(data, float):
-            # Replace NaN, Inf, -Inf with None
-            if math.isnan(data) or math.isinf(data):
-                return None
-        elif isinstance(data, Mapping):
-            # Process dictionaries
-            return {k: sanitize_json(v) for k, v in data.items()}
-        elif isinstance(data, Iterable) and not isinstance(data, (str, bytes)):
-            # Process lists and other iterables (excluding strings)
-            return [sanitize_json(item) for item in data]
-        return data
-
-    # Define the data directory path
-    data_dir = 'data'
-    
-    # Check if data directory exists
-    if not os.path.exists(data_dir):
-        return {
-            "status": "error",
-            "message": "Data directory does not exist",
-            "code": 404
-        }
-    
-    # Get all files in the data directory matching the pattern
-    file_pattern = r"^result-(\d{4}-\d{2}-\d{2})\.json$"
-    files = []
-    
-    for filename in os.listdir(data_dir):
-        match = re.match(file_pattern, filename)
-        if match:
-            date_str = match.group(1)
-            try:
-                # Parse the date to verify it's valid
-                file_date = datetime.strptime(date_str, '%Y-%m-%d')
-                files.append((file_date, filename))
-            except ValueError:
-                # Skip files with invalid date format
-                continue
-    
-    # Check if any valid files were found
-    if not files:
+    Get the most recent scan run from the result history.
+    Result files of older versions (data/result-YYYY-MM-DD.json) are imported
+    into the history the first time it is found empty.
+    """
+    history = get_result_history()
+    latest_id = history.latest_run_id()
+    if latest_id is None and history.import_legacy_results(LEGACY_RESULT_DIR):
+        latest_id = history.latest_run_id()
+
+    if latest_id is None:
         return {
             "status": "error",
-            "message": "No result files found in data directory",
+            "message": "No scan results found",
             "code": 404
         }
-    
-    # Sort files by date (newest first) and get the most recent one
-    files.sort(reverse=True, key=lambda x: x[0])
-    latest_file_date, latest_filename = files[0]
-    file_path = os.path.join(data_dir, latest_filename)
-    
-    try:
-        # Read and return the content of the latest file
-        with open(file_path, 'r', encoding='utf-8') as f:
-            file_content = json.load(f)
-            
-        # Sanitize the file content to make it JSON compliant
-        sanitized_content = sanitize_json(file_content)
-            
-        return {
-            "status": "success",
-            "message": "获取数据成功",
-            "data": sanitized_content,
-            "filename": latest_filename,
-            "date": latest_file_date.strftime('%Y-%m-%d')
-        }
-    except json.JSONDecodeError:
-        return {
-            "status": "error",
-            "message": f"Failed to parse JSON content from {latest_filename}",
-            "code": 500
-        }
-    except Exception as e:
+
+    run = history.get_run(latest_id)
+    if run is None:
         return {
             "status": "error",
-            "message": f"Failed to read file {latest_filename}: {str(e)}",
+            "message": f"Failed to load scan result {latest_id}",
             "code": 500
         }
+
+    return SafeJSONResponse({
+        "status": "success",
+        "message": "获取数据成功",
+        "data": run,
+        "task_id": latest_id,
+        "date": datetime.fromtimestamp(run['completed_at']).strftime('%Y-%m-%d')
+    })
+
+
+@app.get("/api/results")
+async def list_results(limit: int = 50, offset: int = 0):
+    """
+    List completed scan runs, newest first, without their stocks.
+    """
+    return {"runs": get_result_history().list_runs(limit, offset)}
+
+
+def _resolve_run_id(task_id: str) -> str:
+    # 'latest' is an alias of the most recent run
+    if task_id == 'latest':
+        task_id = get_result_history().latest_run_id()
+        if task_id is None:
+            raise HTTPException(status_code=404, detail="No scan results found")
+    return task_id
+
+
+@app.get("/api/results/{task_id}")
+async def get_result(task_id: str):
+    """
+    Get a completed scan run with all its stocks ('latest' for the most recent run).
+    """
+    run = get_result_history().get_run(_resolve_run_id(task_id))
+    if run is None:
+        raise HTTPException(
+            status_code=404, detail=f"Scan result {task_id} not found")
+    return SafeJSONResponse(run)
+
+
+@app.get("/api/results/{task_id}/stocks/{code}")
+async def get_result_stock(task_id: str, code: str):
+    """
+    Get a single stock of a scan run without loading the whole run.
+    """
+    stock = get_result_history().get_stock(_resolve_run_id(task_id), code)
+    if stock is None:
+        raise HTTPException(
+            status_code=404, detail=f"Stock {code} not found in scan result {task_id}")
+    return SafeJSONResponse(stock)
+
+
+@app.get("/api/stocks/{code}/results")
+async def get_stock_results(code: str, limit: int = 20):
+    """
+    Get the scan runs in which a stock was selected, newest first.
+    """
+    return SafeJSONResponse({"code": code, "runs": get_result_history().get_stock_history(code, limit)})
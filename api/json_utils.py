@@ -1,9 +1,30 @@
 """
 JSON utilities for handling special values like NaN and Infinity.
+
+dumps_json serializes a value in a single pass: NaN and Infinity become null,
+numpy scalars and arrays become numbers and lists, and timestamps become
+strings. It uses orjson when it is installed and falls back to the standard
+library otherwise.
 """
 import json
 import math
-from typing import Any, Dict, List, Union
+import datetime
+from typing import Any, Union
+
+import numpy as np
+import pandas as pd
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # Optional: only needed for the fast path
+    orjson = None
+
+_ORJSON_OPTIONS = 0
+if orjson is not None:
+    # Timestamps go through _default so both paths format them the same way
+    _ORJSON_OPTIONS = (orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+                       | orjson.OPT_PASSTHROUGH_DATETIME)
 
 
 def sanitize_float_for_json(value: Any) -> Any:
@@ -28,61 +49,124 @@ def sanitize_float_for_json(value: Any) -> Any:
     return value
 
 
-def sanitize_kline_data(kline_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def _default(value: Any) -> Any:
+    """Convert values the JSON encoders do not handle natively."""
+    if value is pd.NaT:
+        return None
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return str(value)
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    return str(value)
+
+
+_PLAIN_TYPES = (str, int, bool, type(None))
+_KEY_TYPES = (str, int, float, bool, type(None))
+
+
+def _to_jsonable(value: Any) -> Any:
+    # Fallback encoder preparation: one walk replacing every value the standard
+    # library would reject or write as NaN/Infinity. Exact type checks first,
+    # as nearly every value of a scan result is a plain float or string
+    value_type = type(value)
+    if value_type is float:
+        return value if math.isfinite(value) else None
+    if value_type in _PLAIN_TYPES:
+        return value
+    if value_type is dict:
+        return {k if type(k) in _KEY_TYPES else str(k): _to_jsonable(v) for k, v in value.items()}
+    if value_type is list:
+        return [_to_jsonable(item) for item in value]
+    if isinstance(value, float):
+        return float(value) if math.isfinite(value) else None
+    if isinstance(value, _PLAIN_TYPES):
+        return value
+    if isinstance(value, dict):
+        return _to_jsonable(dict(value))
+    if isinstance(value, (list, tuple)):
+        return [_to_jsonable(item) for item in value]
+    return _to_jsonable(_default(value))
+
+
+def dumps_json(value: Any, indent: bool = False) -> bytes:
     """
-    Sanitize K-line data for JSON serialization.
-    Specifically handles numeric fields that might contain NaN or Infinity.
+    Serialize a value to UTF-8 JSON, writing NaN and Infinity as null.
 
     Args:
-        kline_data: List of K-line data points
+        value: The value to serialize
+        indent: Whether to indent the output by two spaces
 
     Returns:
-        Sanitized K-line data
+        The JSON document
     """
-    if not kline_data:
-        return []
+    if orjson is not None:
+        try:
+            options = _ORJSON_OPTIONS | (orjson.OPT_INDENT_2 if indent else 0)
+            return orjson.dumps(value, default=_default, option=options)
+        except (TypeError, orjson.JSONEncodeError):
+            # e.g. integers beyond 64 bits; the fallback handles them
+            pass
+    return json.dumps(_to_jsonable(value), ensure_ascii=False, allow_nan=False,
+                      indent=2 if indent else None).encode('utf-8')
 
-    numeric_fields = ['open', 'high', 'low', 'close', 'volume', 'turn',
-                      'preclose', 'pctChg', 'peTTM', 'pbMRQ']
 
-    sanitized_data = []
-    for point in kline_data:
-        sanitized_point = {}
-        for key, value in point.items():
-            if key in numeric_fields and isinstance(value, float):
-                if math.isnan(value) or math.isinf(value):
-                    sanitized_point[key] = None
-                else:
-                    sanitized_point[key] = value
-            else:
-                sanitized_point[key] = value
-        sanitized_data.append(sanitized_point)
+def dumps_json_str(value: Any, indent: bool = False) -> str:
+    """Serialize a value like dumps_json, returning a string."""
+    return dumps_json(value, indent).decode('utf-8')
 
-    return sanitized_data
 
-
-def sanitize_task_result(task_result: Union[List[Dict[str, Any]], None]) -> Union[List[Dict[str, Any]], None]:
+def loads_json(data: Union[str, bytes]) -> Any:
     """
-    Sanitize task result for JSON serialization.
+    Parse a JSON document.
 
     Args:
-        task_result: The task result to sanitize
+        data: The JSON document
 
     Returns:
-        The sanitized task result
+        The parsed value
     """
-    if task_result is None:
-        return None
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # orjson rejects NaN/Infinity tokens written by older json.dump calls
+            pass
+    return json.loads(data)
+
 
-    sanitized_result = []
-    for stock in task_result:
-        sanitized_stock = sanitize_float_for_json(stock)
+def dump_json_file(value: Any, path: str, indent: bool = True) -> None:
+    """
+    Write a value to a JSON file, writing NaN and Infinity as null.
+
+    Args:
+        value: The value to serialize
+        path: The file path
+        indent: Whether to indent the output by two spaces
+    """
+    with open(path, 'wb') as f:
+        f.write(dumps_json(value, indent))
+
+
+def load_json_file(path: str) -> Any:
+    """
+    Read a JSON file.
+
+    Args:
+        path: The file path
+
+    Returns:
+        The parsed value
+    """
+    with open(path, 'rb') as f:
+        return loads_json(f.read())
 
-        # 特别处理K线数据
-        if 'kline_data' in sanitized_stock and sanitized_stock['kline_data']:
-            sanitized_stock['kline_data'] = sanitize_kline_data(
-                sanitized_stock['kline_data'])
 
-        sanitized_result.append(sanitized_stock)
+class SafeJSONResponse(JSONResponse):
+    """JSON response rendered with dumps_json instead of a separate sanitize pass."""
 
-    return sanitized_result
+    def render(self, content: Any) -> bytes:
+        return dumps_json(content)
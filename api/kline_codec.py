@@ -0,0 +1,251 @@
+"""
+K-line Codec module for encoding scan results.
+
+Scan results carry the daily K-line data of every matched stock. Besides the
+row-per-day JSON of the API models, results can be encoded column-oriented:
+per stock, dates become int32 day offsets from KLINE_EPOCH and prices float32
+arrays, served as one of
+
+- Arrow IPC stream (one row per stock, K-line fields as list columns),
+- MessagePack (K-line columns as little-endian binary arrays),
+- column-oriented JSON (K-line columns as number arrays).
+
+The encoding is chosen from the Accept header of the request.
+"""
+import json
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from .json_utils import sanitize_float_for_json
+
+try:
+    import msgpack
+except ImportError:  # Optional: only needed for the MessagePack encoding
+    msgpack = None
+
+# K-line value fields in API order
+KLINE_FIELDS = ['open', 'high', 'low', 'close', 'volume', 'turn',
+                'preclose', 'pctChg', 'peTTM', 'pbMRQ']
+
+# Volume exceeds the exact integer range of float32; everything else fits it
+KLINE_FIELD_DTYPES = {field: np.float32 for field in KLINE_FIELDS}
+KLINE_FIELD_DTYPES['volume'] = np.float64
+
+# Dates are encoded as int32 days since this date
+KLINE_EPOCH = '1970-01-01'
+
+# Decimals kept for float32 values in column-oriented JSON
+COLUMNAR_JSON_DECIMALS = 6
+
+# Stock fields other than the K-line data
+STOCK_FIELDS = ['code', 'name', 'industry', 'selection_reasons', 'mark_lines']
+
+ROWS_JSON = 'application/json'
+COLUMNAR_JSON = 'application/vnd.kline.columnar+json'
+MSGPACK = 'application/x-msgpack'
+ARROW_STREAM = 'application/vnd.apache.arrow.stream'
+
+# Accepted media types and the encoding they select
+MEDIA_TYPES = {
+    ROWS_JSON: ROWS_JSON,
+    COLUMNAR_JSON: COLUMNAR_JSON,
+    MSGPACK: MSGPACK,
+    'application/msgpack': MSGPACK,
+    'application/vnd.msgpack': MSGPACK,
+    ARROW_STREAM: ARROW_STREAM,
+    'application/vnd.apache.arrow.file': ARROW_STREAM,
+}
+
+
+def negotiate_kline_format(accept: Optional[str]) -> str:
+    """
+    Choose the scan result encoding from an Accept header.
+
+    Args:
+        accept: Accept header value
+
+    Returns:
+        Media type of the encoding; ROWS_JSON unless a compact encoding is
+        explicitly accepted with a higher quality than JSON
+    """
+    best, best_quality = ROWS_JSON, 0.0
+    for part in (accept or '').split(','):
+        params = [p.strip() for p in part.split(';')]
+        media_type = MEDIA_TYPES.get(params[0].lower())
+        if media_type is None or (media_type == MSGPACK and msgpack is None):
+            continue
+        quality = 1.0
+        for param in params[1:]:
+            if param.startswith('q='):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if quality > best_quality:
+            best, best_quality = media_type, quality
+    return best
+
+
+def kline_arrays(kline_data: List[Dict[str, Any]]) -> Tuple[List[str], Dict[str, np.ndarray]]:
+    """
+    Split K-line rows into a date list and one float64 array per K-line field.
+
+    Args:
+        kline_data: K-line rows (dictionaries with date and KLINE_FIELDS)
+
+    Returns:
+        Tuple of the date strings and a dictionary of value arrays; missing
+        or non-numeric values are NaN
+    """
+    dates = [str(row.get('date')) for row in kline_data]
+    values = {}
+    for field in KLINE_FIELDS:
+        column = [row.get(field) for row in kline_data]
+        try:
+            values[field] = np.array(column, dtype=np.float64)
+        except (TypeError, ValueError):
+            values[field] = pd.to_numeric(pd.Series(column, dtype=object), errors='coerce').to_numpy(np.float64)
+    return dates, values
+
+
+def kline_rows(kline_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Convert K-line rows to the row-per-day API format (date string, float or None).
+
+    Args:
+        kline_data: K-line rows
+
+    Returns:
+        List of dictionaries matching the KlineDataPoint model
+    """
+    dates, values = kline_arrays(kline_data)
+    matrix = np.column_stack([values[field] for field in KLINE_FIELDS]) if dates else np.empty((0, len(KLINE_FIELDS)))
+    cells = matrix.astype(object)
+    cells[~np.isfinite(matrix)] = None
+    keys = ['date'] + KLINE_FIELDS
+    return [dict(zip(keys, (date, *row))) for date, row in zip(dates, cells.tolist())]
+
+
+def kline_columns(kline_data: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """
+    Convert K-line rows to compact column arrays.
+
+    Args:
+        kline_data: K-line rows
+
+    Returns:
+        Dictionary with 'date' (int32 days since KLINE_EPOCH) and one array per
+        K-line field (dtype from KLINE_FIELD_DTYPES; missing values are NaN)
+    """
+    dates, values = kline_arrays(kline_data)
+    # Dates may also be timestamps ('YYYY-MM-DD HH:MM:SS'); the day is enough
+    days = np.array([date[:10] for date in dates], dtype='datetime64[D]')
+    columns = {'date': (days - np.datetime64(KLINE_EPOCH, 'D')).astype(np.int32)}
+    for field in KLINE_FIELDS:
+        columns[field] = values[field].astype(KLINE_FIELD_DTYPES[field])
+    return columns
+
+
+def _stock_meta(stock: Dict[str, Any]) -> Dict[str, Any]:
+    meta = {field: stock.get(field) for field in STOCK_FIELDS}
+    if meta['industry'] is None:
+        meta['industry'] = '未知行业'
+    if meta['selection_reasons'] is not None:
+        meta['selection_reasons'] = {str(k): v for k, v in meta['selection_reasons'].items()}
+    return sanitize_float_for_json(meta)
+
+
+def _encode_columnar_json(stocks: List[Dict[str, Any]],
+                          columns: List[Dict[str, np.ndarray]]) -> bytes:
+    encoded = []
+    for stock, stock_columns in zip(stocks, columns):
+        kline = {'date': stock_columns['date'].tolist()}
+        for field in KLINE_FIELDS:
+            values = stock_columns[field].astype(np.float64)
+            if KLINE_FIELD_DTYPES[field] == np.float32:
+                # float32 -> float64 adds noise digits; keep float32 precision only
+                values = np.round(values, COLUMNAR_JSON_DECIMALS)
+            cells = values.astype(object)
+            cells[~np.isfinite(values)] = None
+            kline[field] = cells.tolist()
+        encoded.append({**_stock_meta(stock), 'kline': kline})
+    payload = {'epoch': KLINE_EPOCH, 'stocks': encoded}
+    return json.dumps(payload, ensure_ascii=False, allow_nan=False).encode('utf-8')
+
+
+def _encode_msgpack(stocks: List[Dict[str, Any]],
+                    columns: List[Dict[str, np.ndarray]]) -> bytes:
+    dtypes = {'date': '<i4'}
+    dtypes.update({field: np.dtype(dtype).newbyteorder('<').str
+                   for field, dtype in KLINE_FIELD_DTYPES.items()})
+    encoded = []
+    for stock, stock_columns in zip(stocks, columns):
+        kline = {field: stock_columns[field].astype(dtypes[field], copy=False).tobytes()
+                 for field in dtypes}
+        encoded.append({**_stock_meta(stock), 'length': len(stock_columns['date']), 'kline': kline})
+    payload = {'epoch': KLINE_EPOCH, 'dtypes': dtypes, 'stocks': encoded}
+    return msgpack.packb(payload, use_bin_type=True)
+
+
+def _list_array(arrays: List[np.ndarray], offsets: np.ndarray, value_type: pa.DataType) -> pa.Array:
+    values = np.concatenate(arrays) if arrays else np.array([], dtype=value_type.to_pandas_dtype())
+    # NaN marks missing values; Arrow has proper nulls
+    mask = np.isnan(values) if values.dtype.kind == 'f' else None
+    return pa.ListArray.from_arrays(pa.array(offsets, type=pa.int32()),
+                                    pa.array(values, type=value_type, mask=mask))
+
+
+def _encode_arrow(stocks: List[Dict[str, Any]],
+                  columns: List[Dict[str, np.ndarray]]) -> bytes:
+    lengths = np.array([len(c['date']) for c in columns], dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int32)
+    metas = [_stock_meta(stock) for stock in stocks]
+
+    arrays = [
+        pa.array([m['code'] for m in metas], type=pa.string()),
+        pa.array([m['name'] for m in metas], type=pa.string()),
+        pa.array([m['industry'] for m in metas], type=pa.string()),
+        # Nested structures stay JSON strings; they are tiny compared to the K-lines
+        pa.array([json.dumps(m['selection_reasons'], ensure_ascii=False) for m in metas], type=pa.string()),
+        pa.array([json.dumps(m['mark_lines'], ensure_ascii=False) for m in metas], type=pa.string()),
+        _list_array([c['date'] for c in columns], offsets, pa.int32()),
+    ]
+    names = STOCK_FIELDS + ['date']
+    for field in KLINE_FIELDS:
+        value_type = pa.float32() if KLINE_FIELD_DTYPES[field] == np.float32 else pa.float64()
+        arrays.append(_list_array([c[field] for c in columns], offsets, value_type))
+        names.append(field)
+
+    table = pa.Table.from_arrays(arrays, names=names)
+    table = table.replace_schema_metadata({'date_epoch': KLINE_EPOCH})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_scan_results(stocks: List[Dict[str, Any]], media_type: str) -> Tuple[bytes, str]:
+    """
+    Encode scan results in a compact column-oriented format.
+
+    Args:
+        stocks: Scan result stocks; kline_data may be K-line rows in the API
+            format or the raw records of a K-line DataFrame
+        media_type: COLUMNAR_JSON, MSGPACK or ARROW_STREAM
+
+    Returns:
+        Tuple of the encoded body and its media type
+    """
+    columns = [kline_columns(stock.get('kline_data') or []) for stock in stocks]
+    if media_type == ARROW_STREAM:
+        return _encode_arrow(stocks, columns), ARROW_STREAM
+    if media_type == MSGPACK:
+        if msgpack is None:
+            raise ValueError("MessagePack encoding requires the msgpack package")
+        return _encode_msgpack(stocks, columns), MSGPACK
+    if media_type == COLUMNAR_JSON:
+        return _encode_columnar_json(stocks, columns), COLUMNAR_JSON
+    raise ValueError(f"Unsupported scan result encoding: {media_type}")
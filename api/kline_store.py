@@ -0,0 +1,400 @@
+"""
+K-line Store module for the local daily K-line cache.
+
+K-line data is kept as a columnar Parquet dataset with one partition per stock
+code (``code=sh.600000/data.parquet``) plus a manifest indexing every partition.
+This replaces the per-stock pickle+CSV files in data/cache/stocks: readers can
+load selected columns and date ranges, and the whole market can be loaded with
+a single dataset scan.
+
+Several processes may write to the same store: each keeps its unflushed
+manifest changes apart and merges them into the on-disk manifest under a file
+lock when flushing, so no process overwrites the entries of another.
+"""
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from colorama import Fore, Style
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory file locks (Windows); only a single writer process is safe
+    fcntl = None
+
+# Columns returned by fetch_kline_data, in storage order
+KLINE_COLUMNS = ['date', 'open', 'high', 'low', 'close', 'volume', 'turn',
+                 'preclose', 'pctChg', 'peTTM', 'pbMRQ']
+
+PARTITION_FILE = 'data.parquet'
+# Leading underscore keeps the manifest out of dataset discovery
+MANIFEST_FILE = '_manifest.json'
+MANIFEST_LOCK_FILE = '_manifest.lock'
+
+# Number of partition writes buffered before the manifest is flushed to disk
+MANIFEST_FLUSH_INTERVAL = 100
+
+
+def default_store_dir() -> str:
+    """
+    Get the default K-line store directory.
+
+    Follows the same layout as the legacy data/cache/stocks directory:
+    /app/data inside the Docker image, api/data otherwise.
+    """
+    if os.path.exists('/app/api'):
+        return '/app/data/cache/kline'
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'cache', 'kline')
+
+
+def default_legacy_dir() -> str:
+    """Get the legacy per-stock pickle cache directory."""
+    if os.path.exists('/app/api'):
+        return '/app/data/cache/stocks'
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'cache', 'stocks')
+
+
+class KlineStore:
+    """
+    Columnar local store for daily K-line data, partitioned by stock code.
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or default_store_dir()
+        self._lock = threading.RLock()
+        self._manifest: Dict[str, Dict[str, Any]] = {}
+        self._manifest_mtime = None
+        # Entries changed since the last flush; None marks a deleted stock
+        self._pending: Dict[str, Optional[Dict[str, Any]]] = {}
+        self._load_manifest()
+
+    # --- Manifest ---
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.root, MANIFEST_FILE)
+
+    def _partition_path(self, code: str) -> str:
+        return os.path.join(self.root, f"code={code}", PARTITION_FILE)
+
+    @contextmanager
+    def _file_lock(self):
+        """Hold the manifest lock shared by all processes writing to the store."""
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, MANIFEST_LOCK_FILE), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_manifest_file(self) -> Dict[str, Dict[str, Any]]:
+        """Read the stock entries of the on-disk manifest."""
+        with open(self._manifest_path(), 'r', encoding='utf-8') as f:
+            return json.load(f).get('codes', {})
+
+    def _merge_pending(self, manifest: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Apply the unflushed changes of this process to a manifest."""
+        for code, entry in self._pending.items():
+            if entry is None:
+                manifest.pop(code, None)
+            else:
+                manifest[code] = entry
+        return manifest
+
+    def _load_manifest(self) -> None:
+        """
+        Load the manifest from disk if it changed since the last load,
+        keeping the changes of this process that are not flushed yet.
+        """
+        path = self._manifest_path()
+        if not os.path.exists(path):
+            return
+
+        mtime = os.path.getmtime(path)
+        if mtime == self._manifest_mtime:
+            return
+
+        try:
+            manifest = self._read_manifest_file()
+        except (OSError, ValueError) as e:
+            print(f"{Fore.YELLOW}Warning: Failed to load K-line manifest, rebuilding: {e}{Style.RESET_ALL}")
+            self.rebuild_manifest()
+            return
+
+        with self._lock:
+            self._manifest = self._merge_pending(manifest)
+            self._manifest_mtime = mtime
+
+    def _write_manifest_file(self, manifest: Dict[str, Dict[str, Any]]) -> None:
+        """Replace the on-disk manifest; the caller holds the file lock."""
+        path = self._manifest_path()
+        tmp_path = os.path.join(self.root, f".{MANIFEST_FILE}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'codes': manifest, 'updated_at': time.time()}, f)
+        os.replace(tmp_path, path)
+        self._manifest_mtime = os.path.getmtime(path)
+
+    def flush(self) -> None:
+        """Merge pending manifest changes into the manifest on disk."""
+        with self._lock:
+            if not self._pending:
+                return
+            with self._file_lock():
+                try:
+                    manifest = self._read_manifest_file()
+                except (OSError, ValueError):
+                    # Missing or unreadable: the local copy is the best known state
+                    manifest = dict(self._manifest)
+                manifest = self._merge_pending(manifest)
+                self._write_manifest_file(manifest)
+            self._manifest = manifest
+            self._pending = {}
+
+    def rebuild_manifest(self) -> None:
+        """Rebuild the manifest by reading the footer of every partition."""
+        manifest = {}
+        if os.path.exists(self.root):
+            for entry in os.listdir(self.root):
+                if not entry.startswith('code='):
+                    continue
+                code = entry[len('code='):]
+                path = self._partition_path(code)
+                if not os.path.exists(path):
+                    continue
+                dates = pq.read_table(path, columns=['date']).column('date').to_pylist()
+                if dates:
+                    manifest[code] = {
+                        'start_date': min(dates),
+                        'end_date': max(dates),
+                        'rows': len(dates),
+                        'updated_at': os.path.getmtime(path)
+                    }
+
+        # The partitions are the source of truth, so the rebuilt manifest
+        # replaces the on-disk one instead of being merged into it
+        with self._lock:
+            with self._file_lock():
+                self._write_manifest_file(manifest)
+            self._manifest = manifest
+            self._pending = {}
+
+    def list_codes(self) -> List[str]:
+        """List all stock codes held in the store."""
+        self._load_manifest()
+        with self._lock:
+            return sorted(self._manifest.keys())
+
+    def get_entry(self, code: str) -> Optional[Dict[str, Any]]:
+        """Get the manifest entry (start_date, end_date, rows) for a stock."""
+        self._load_manifest()
+        with self._lock:
+            entry = self._manifest.get(code)
+            return dict(entry) if entry else None
+
+    def has(self, code: str) -> bool:
+        """Check whether the store holds data for a stock."""
+        return self.get_entry(code) is not None
+
+    # --- Writing ---
+
+    def write(self, code: str, df: pd.DataFrame) -> None:
+        """
+        Replace the stored K-line data of a stock.
+
+        Args:
+            code: Stock code (e.g., 'sh.600000')
+            df: DataFrame with K-line data as returned by fetch_kline_data
+        """
+        if df.empty:
+            return
+
+        df = df.sort_values('date').drop_duplicates('date', keep='last')
+        columns = [col for col in KLINE_COLUMNS if col in df.columns]
+        table = pa.Table.from_pandas(df[columns], preserve_index=False)
+
+        path = self._partition_path(code)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Dot-prefixed temp files are ignored by dataset discovery
+        tmp_path = os.path.join(os.path.dirname(path), f".{PARTITION_FILE}.{os.getpid()}.tmp")
+        pq.write_table(table, tmp_path, compression='zstd')
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            entry = {
+                'start_date': str(df['date'].iloc[0]),
+                'end_date': str(df['date'].iloc[-1]),
+                'rows': len(df),
+                'updated_at': time.time()
+            }
+            self._manifest[code] = entry
+            self._pending[code] = entry
+            if len(self._pending) >= MANIFEST_FLUSH_INTERVAL:
+                self.flush()
+
+    def append(self, code: str, df: pd.DataFrame) -> None:
+        """
+        Append new rows to the stored K-line data of a stock.
+        Rows whose date already exists are replaced by the new ones.
+        """
+        if df.empty:
+            return
+
+        existing = self.read(code)
+        if not existing.empty:
+            df = pd.concat([existing, df], ignore_index=True)
+        self.write(code, df)
+
+    def delete(self, code: str) -> None:
+        """Remove a stock from the store."""
+        path = self._partition_path(code)
+        if os.path.exists(path):
+            os.remove(path)
+        with self._lock:
+            if self._manifest.pop(code, None) is not None:
+                self._pending[code] = None
+
+    # --- Reading ---
+
+    @staticmethod
+    def _date_filter(start_date: Optional[str], end_date: Optional[str]):
+        expr = None
+        if start_date:
+            expr = ds.field('date') >= start_date
+        if end_date:
+            end_expr = ds.field('date') <= end_date
+            expr = end_expr if expr is None else expr & end_expr
+        return expr
+
+    def read(self, code: str,
+             columns: Optional[List[str]] = None,
+             start_date: Optional[str] = None,
+             end_date: Optional[str] = None) -> pd.DataFrame:
+        """
+        Read K-line data of a single stock.
+
+        Args:
+            code: Stock code
+            columns: Columns to load (default: all)
+            start_date: Inclusive start date in 'YYYY-MM-DD' format
+            end_date: Inclusive end date in 'YYYY-MM-DD' format
+
+        Returns:
+            pd.DataFrame: K-line data sorted by date, empty if the stock is not stored
+        """
+        path = self._partition_path(code)
+        if not os.path.exists(path):
+            return pd.DataFrame()
+
+        filters = self._date_filter(start_date, end_date)
+        table = pq.read_table(path, columns=columns, filters=filters)
+        return table.to_pandas()
+
+    def read_many(self, codes: Optional[List[str]] = None,
+                  columns: Optional[List[str]] = None,
+                  start_date: Optional[str] = None,
+                  end_date: Optional[str] = None) -> pd.DataFrame:
+        """
+        Read K-line data of many stocks with a single dataset scan.
+
+        Args:
+            codes: Stock codes to load (default: every stored stock)
+            columns: Columns to load besides 'code' (default: all)
+            start_date: Inclusive start date in 'YYYY-MM-DD' format
+            end_date: Inclusive end date in 'YYYY-MM-DD' format
+
+        Returns:
+            pd.DataFrame: Long-format K-line data with a 'code' column, sorted by code and date
+        """
+        if not os.path.exists(self.root) or not self.list_codes():
+            return pd.DataFrame()
+
+        dataset = ds.dataset(self.root, format='parquet', partitioning='hive')
+
+        filters = self._date_filter(start_date, end_date)
+        if codes is not None:
+            code_filter = ds.field('code').isin(list(codes))
+            filters = code_filter if filters is None else filters & code_filter
+
+        if columns is not None:
+            columns = ['code'] + [col for col in columns if col != 'code']
+
+        table = dataset.to_table(columns=columns, filter=filters)
+        df = table.to_pandas()
+        if df.empty:
+            return df
+
+        df['code'] = df['code'].astype(str)
+        sort_keys = ['code', 'date'] if 'date' in df.columns else ['code']
+        return df.sort_values(sort_keys, kind='stable').reset_index(drop=True)
+
+    def iter_frames(self, codes: Optional[List[str]] = None,
+                    columns: Optional[List[str]] = None,
+                    start_date: Optional[str] = None,
+                    end_date: Optional[str] = None):
+        """
+        Load many stocks at once and yield (code, DataFrame) pairs.
+        """
+        df = self.read_many(codes, columns, start_date, end_date)
+        if df.empty:
+            return
+        for code, group in df.groupby('code', sort=False):
+            yield code, group.drop(columns='code').reset_index(drop=True)
+
+    # --- Migration ---
+
+    def import_legacy_cache(self, legacy_dir: Optional[str] = None) -> int:
+        """
+        Import per-stock pickle files from the legacy data/cache/stocks directory.
+
+        Returns:
+            Number of stocks imported
+        """
+        legacy_dir = legacy_dir or default_legacy_dir()
+        if not os.path.exists(legacy_dir):
+            return 0
+
+        imported = 0
+        for filename in sorted(os.listdir(legacy_dir)):
+            if not filename.endswith('.pkl'):
+                continue
+            code = filename.split('_', 1)[0]
+            try:
+                df = pd.read_pickle(os.path.join(legacy_dir, filename))
+            except Exception as e:
+                print(f"{Fore.YELLOW}Warning: Failed to import {filename}: {e}{Style.RESET_ALL}")
+                continue
+            if isinstance(df, pd.DataFrame) and not df.empty:
+                self.append(code, df)
+                imported += 1
+
+        self.flush()
+        print(f"{Fore.GREEN}Imported {imported} stocks from legacy cache {legacy_dir}{Style.RESET_ALL}")
+        return imported
+
+
+_default_store: Optional[KlineStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_kline_store() -> KlineStore:
+    """Get the process-wide K-line store at the default location."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = KlineStore()
+        return _default_store
+
+
+if __name__ == '__main__':
+    # Migrate the legacy pickle cache into the columnar store
+    get_kline_store().import_legacy_cache()
@@ -0,0 +1,146 @@
+"""
+K-line Sync module for keeping the local K-line store up to date.
+
+Instead of re-downloading the full history of every stock, the sync reads the
+last stored date per code from the K-line store and only requests the missing
+tail from Baostock. A few already-stored rows are re-fetched with the tail so
+that forward-adjustment (adjustflag=2) restatements can be detected: when a
+dividend or split rewrites the adjusted history, the overlapping rows no longer
+match and a full refetch is performed.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional
+
+import numpy as np
+import pandas as pd
+from colorama import Fore, Style
+
+from .data_fetcher import fetch_kline_data
+from .kline_store import KlineStore
+
+# Default length of the history kept in the store
+DEFAULT_HISTORY_DAYS = 5 * 365
+
+# Number of already-stored rows re-fetched to detect restatements
+OVERLAP_ROWS = 3
+
+# Relative tolerance when comparing re-fetched prices with stored ones
+PRICE_TOLERANCE = 1e-4
+
+# Sync results
+SYNC_FULL = "full"
+SYNC_APPENDED = "appended"
+SYNC_RESTATED = "restated"
+SYNC_UP_TO_DATE = "up_to_date"
+SYNC_EMPTY = "empty"
+
+
+def default_history_range(end_date: Optional[str] = None,
+                          history_days: int = DEFAULT_HISTORY_DAYS) -> Dict[str, str]:
+    """
+    Get the default full-history date range ending at end_date (default: today).
+    """
+    end = datetime.strptime(end_date, '%Y-%m-%d') if end_date else datetime.now()
+    return {
+        "start_date": (end - timedelta(days=history_days)).strftime('%Y-%m-%d'),
+        "end_date": end.strftime('%Y-%m-%d')
+    }
+
+
+def is_restated(stored_df: pd.DataFrame, fetched_df: pd.DataFrame,
+                tolerance: float = PRICE_TOLERANCE) -> bool:
+    """
+    Check whether re-fetched rows disagree with the stored ones.
+
+    Forward-adjusted prices of past days only change when the adjustment
+    factor changes, so any mismatch on overlapping dates means the stored
+    history has been restated.
+
+    Args:
+        stored_df: Stored K-line rows
+        fetched_df: Freshly fetched K-line rows
+        tolerance: Relative tolerance for price comparison
+
+    Returns:
+        True if the stored history needs a full refetch
+    """
+    overlap = stored_df.merge(fetched_df, on='date', suffixes=('_stored', '_fetched'))
+    if overlap.empty:
+        # The overlap rows could not be re-fetched; be conservative
+        return not fetched_df.empty and fetched_df['date'].min() <= stored_df['date'].max()
+
+    for col in ['open', 'high', 'low', 'close']:
+        stored = overlap[f'{col}_stored'].to_numpy(dtype=float)
+        fetched = overlap[f'{col}_fetched'].to_numpy(dtype=float)
+        if not np.allclose(stored, fetched, rtol=tolerance, atol=0, equal_nan=True):
+            return True
+
+    return False
+
+
+def sync_stock_kline(code: str,
+                     store: KlineStore,
+                     end_date: str,
+                     full_start_date: str,
+                     full_refresh: bool = False,
+                     retry_attempts: int = 3,
+                     retry_delay: int = 1) -> Dict[str, Any]:
+    """
+    Bring the stored K-line data of one stock up to end_date.
+
+    Args:
+        code: Stock code (e.g., 'sh.600000')
+        store: K-line store to update
+        end_date: Last date to sync, in 'YYYY-MM-DD' format
+        full_start_date: Start date used when the full history has to be fetched
+        full_refresh: Always refetch the full history
+        retry_attempts: Maximum number of retry attempts per request
+        retry_delay: Delay between retries in seconds
+
+    Returns:
+        Dict with the sync 'status' and number of 'rows' written
+    """
+    entry = None if full_refresh else store.get_entry(code)
+
+    stored_tail = None
+    if entry is not None and entry['end_date'] < end_date:
+        stored_tail = store.read(code, columns=['date', 'open', 'high', 'low', 'close']).tail(OVERLAP_ROWS)
+        if stored_tail.empty:
+            # The manifest lists the stock but its partition is missing or
+            # empty; refetch the full range so the entry is rewritten
+            print(f"{Fore.YELLOW}Stored K-line data of {code} is missing, refetching full range{Style.RESET_ALL}")
+            entry = None
+
+    if entry is None:
+        df = fetch_kline_data(code, full_start_date, end_date, retry_attempts, retry_delay)
+        if df.empty:
+            return {"code": code, "status": SYNC_EMPTY, "rows": 0}
+        store.write(code, df)
+        return {"code": code, "status": SYNC_FULL, "rows": len(df)}
+
+    if entry['end_date'] >= end_date:
+        return {"code": code, "status": SYNC_UP_TO_DATE, "rows": 0}
+
+    # Re-fetch the last few stored rows together with the missing tail
+    tail_start = str(stored_tail['date'].iloc[0])
+    tail_df = fetch_kline_data(code, tail_start, end_date, retry_attempts, retry_delay)
+
+    if tail_df.empty:
+        # The request covers already-stored days, so no rows means the fetch failed
+        return {"code": code, "status": SYNC_EMPTY, "rows": 0}
+
+    if is_restated(stored_tail, tail_df):
+        print(f"{Fore.YELLOW}Forward-adjusted history of {code} was restated, refetching full range{Style.RESET_ALL}")
+        df = fetch_kline_data(code, min(entry['start_date'], full_start_date), end_date,
+                              retry_attempts, retry_delay)
+        if df.empty:
+            return {"code": code, "status": SYNC_EMPTY, "rows": 0}
+        store.write(code, df)
+        return {"code": code, "status": SYNC_RESTATED, "rows": len(df)}
+
+    new_rows = tail_df[tail_df['date'] > entry['end_date']]
+    if new_rows.empty:
+        return {"code": code, "status": SYNC_UP_TO_DATE, "rows": 0}
+
+    store.append(code, new_rows)
+    return {"code": code, "status": SYNC_APPENDED, "rows": len(new_rows)}
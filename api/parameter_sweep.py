@@ -0,0 +1,414 @@
+"""
+Parameter Sweep module for evaluating a grid of ScanConfig variants in one pass.
+
+Tuning the scan thresholds used to mean one full scan per combination. A sweep
+loads the K-line data of every stock once and extracts the features the
+platform decision depends on (window price/volume/box features, decline and
+position metrics). Every config of the grid is then evaluated against the
+feature table with vectorized comparisons, so hundreds of configurations cost
+about as much as a single scan.
+
+Threshold parameters (box_threshold, ma_diff_threshold, volatility_threshold,
+volume_change_threshold, volume_stability_threshold, box_quality_threshold,
+decline_threshold, rapid_decline_threshold) only enter the comparisons.
+Structural parameters (windows, the *_days settings and the use_* switches)
+select which features are extracted; each distinct value is computed once.
+
+The hits of a config are the stocks analyze_stock marks as platform stocks,
+before the fundamental and industry diversity filters of a scan.
+"""
+import os
+import time
+import itertools
+from contextlib import closing
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from colorama import Fore, Style
+
+from .config import ScanConfig
+from .data_source import create_data_source
+from .platform_scanner import run_analysis_pipeline
+from .analyzers.feature_engine import WindowFeatureEngine
+from .analyzers.price_analyzer import calculate_price_features
+from .analyzers.volume_analyzer import calculate_volume_features
+from .analyzers.box_detector import analyze_box_patterns
+from .analyzers.decline_analyzer import analyze_decline_speed
+from .analyzers.position_analyzer import analyze_position
+
+# Parameters that only enter the threshold comparisons
+THRESHOLD_PARAMS = (
+    'box_threshold',
+    'ma_diff_threshold',
+    'volatility_threshold',
+    'volume_change_threshold',
+    'volume_stability_threshold',
+    'box_quality_threshold',
+    'decline_threshold',
+    'rapid_decline_threshold',
+)
+
+# Parameters that change which features are extracted
+STRUCTURAL_PARAMS = (
+    'windows',
+    'use_volume_analysis',
+    'use_low_position',
+    'high_point_lookback_days',
+    'decline_period_days',
+    'use_rapid_decline_detection',
+    'rapid_decline_days',
+    'use_box_detection',
+)
+
+SWEEP_PARAMS = THRESHOLD_PARAMS + STRUCTURAL_PARAMS
+
+
+def build_sweep_configs(base_config: ScanConfig,
+                        grid: Dict[str, List[Any]]) -> List[Tuple[Dict[str, Any], ScanConfig]]:
+    """
+    Expand a parameter grid into ScanConfig variants of a base config.
+
+    Args:
+        base_config: Config providing the values of the parameters not swept
+        grid: Mapping of parameter name to the list of values to try
+
+    Returns:
+        List of (swept parameter values, ScanConfig) in grid order
+
+    Raises:
+        ValueError: If a parameter cannot be swept or has no values
+    """
+    for name, values in grid.items():
+        if name not in SWEEP_PARAMS:
+            raise ValueError(
+                f"Parameter '{name}' cannot be swept, expected one of {', '.join(SWEEP_PARAMS)}")
+        if not values:
+            raise ValueError(f"Parameter '{name}' has no values to sweep")
+
+    names = list(grid)
+    base = base_config.model_dump()
+    configs = []
+    for values in itertools.product(*(grid[name] for name in names)):
+        params = dict(zip(names, values))
+        configs.append((params, ScanConfig(**{**base, **params})))
+    return configs
+
+
+def _scan_start_date(config: ScanConfig, now: datetime) -> str:
+    # Same date range as scan_stocks, so every config sees the data of its own scan
+    max_window = max(config.windows) if config.windows else 90
+    return (now - timedelta(days=max_window * 2)).strftime('%Y-%m-%d')
+
+
+def build_sweep_plan(configs: List[ScanConfig], now: datetime) -> Dict[str, Dict[str, List]]:
+    """
+    Collect the features needed by a list of configs.
+
+    Configs are grouped by the start date of their scan; each group lists the
+    windows and the decline / position settings used by its configs.
+
+    Args:
+        configs: Configs of the sweep
+        now: Reference time of the scan date ranges
+
+    Returns:
+        Mapping of start date to {'windows', 'decline', 'position'} lists
+    """
+    plan: Dict[str, Dict[str, set]] = {}
+    for config in configs:
+        group = plan.setdefault(_scan_start_date(config, now),
+                                {'windows': set(), 'decline': set(), 'position': set()})
+        group['windows'].update(config.windows)
+        if config.windows:
+            group['windows'].add(max(config.windows))
+        if config.use_low_position:
+            if config.use_rapid_decline_detection:
+                group['decline'].add((config.high_point_lookback_days,
+                                      config.decline_period_days,
+                                      config.rapid_decline_days))
+            else:
+                group['position'].add((config.high_point_lookback_days,
+                                       config.decline_period_days))
+
+    return {start: {key: sorted(values) for key, values in group.items()}
+            for start, group in plan.items()}
+
+
+def _window_key(start: str, window: int, name: str) -> str:
+    return f"{start}|w{window}|{name}"
+
+
+def _decline_key(start: str, spec: Tuple[int, int, int], name: str) -> str:
+    return f"{start}|decline{spec[0]}_{spec[1]}_{spec[2]}|{name}"
+
+
+def _position_key(start: str, spec: Tuple[int, int]) -> str:
+    return f"{start}|position{spec[0]}_{spec[1]}"
+
+
+def extract_sweep_features(df: pd.DataFrame, plan: Dict[str, Dict[str, List]]) -> Dict[str, float]:
+    """
+    Extract the threshold-independent features of a stock (sweep worker entry point).
+
+    Args:
+        df: K-line data covering the widest date range of the plan
+        plan: Sweep plan from build_sweep_plan
+
+    Returns:
+        Flat mapping of feature name to value
+    """
+    features = {}
+    dates = df['date'].astype(str)
+
+    for start, group in plan.items():
+        # Cut the data to the date range of this group's scans
+        group_df = df[dates >= start].reset_index(drop=True)
+        if group_df.empty:
+            features[f"{start}|rows"] = 0
+            continue
+        features[f"{start}|rows"] = len(group_df)
+        features[f"{start}|has_volume"] = float('volume' in group_df.columns)
+
+        engine = WindowFeatureEngine(group_df, group['windows'])
+        boxes = analyze_box_patterns(group_df, group['windows'], engine)
+        for window in group['windows']:
+            price = calculate_price_features(group_df, window, engine)
+            for name in ('box_range', 'ma_diff', 'volatility'):
+                features[_window_key(start, window, name)] = price[name]
+
+            if 'volume' in group_df.columns:
+                volume = calculate_volume_features(group_df, window, engine)
+                features[_window_key(start, window, 'volume_change_ratio')] = volume['volume_change_ratio']
+                features[_window_key(start, window, 'volume_stability')] = volume['volume_stability']
+
+            box = boxes[window]
+            box_volatility = box.get('volatility')
+            features[_window_key(start, window, 'is_box_pattern')] = float(bool(box.get('is_box_pattern', False)))
+            features[_window_key(start, window, 'box_quality')] = box.get('box_quality', 0)
+            features[_window_key(start, window, 'box_volatility')] = \
+                box_volatility if box_volatility is not None else np.nan
+
+        # Specs that differ only in the rapid decline period share one analysis
+        rapid_days_by_spec: Dict[Tuple[int, int], List[int]] = {}
+        for spec in group['decline']:
+            rapid_days_by_spec.setdefault((spec[0], spec[1]), []).append(spec[2])
+
+        for (lookback_days, period_days), rapid_days in rapid_days_by_spec.items():
+            analysis = analyze_decline_speed(group_df, lookback_days, period_days, 0.0,
+                                             rapid_days[0], 0.0, rapid_days)
+            details = analysis.get('details', {})
+            analyzed = analysis.get('status') == 'analyzed'
+            # -inf never reaches a threshold, like a failed analysis
+            low_decline = details['decline_percentage'] \
+                if analyzed and details['decline_period_satisfied'] else -np.inf
+            for days in rapid_days:
+                spec = (lookback_days, period_days, days)
+                rapid_decline = details['rapid_decline_profile'][days] if analyzed else -np.inf
+                features[_decline_key(start, spec, 'low_decline')] = low_decline
+                features[_decline_key(start, spec, 'rapid_decline')] = rapid_decline
+
+        for spec in group['position']:
+            # With an unbounded threshold only the decline period decides
+            position = analyze_position(group_df, spec[0], spec[1], -np.inf)
+            if position['is_low_position']:
+                sorted_df = group_df.sort_values('date')
+                historical_high = sorted_df.iloc[-min(len(sorted_df), spec[0]):]['high'].max()
+                decline_pct = (historical_high - sorted_df['close'].iloc[-1]) / historical_high
+            else:
+                decline_pct = -np.inf
+            features[_position_key(start, spec)] = decline_pct
+
+    return features
+
+
+def evaluate_config(table: pd.DataFrame, config: ScanConfig, start: str) -> np.ndarray:
+    """
+    Evaluate the platform decision of one config for every stock of a feature table.
+
+    Mirrors analyze_stock(...)['is_platform'] using the extracted features.
+
+    Args:
+        table: Feature table with one row per stock
+        config: Config to evaluate
+        start: Start date of the config's scan
+
+    Returns:
+        Boolean array, True for platform stocks
+    """
+    n = len(table)
+    if not config.windows or f"{start}|has_volume" not in table:
+        return np.zeros(n, dtype=bool)
+
+    def column(key: str) -> np.ndarray:
+        if key not in table:
+            return np.full(n, np.nan)
+        return table[key].to_numpy(dtype=float)
+
+    has_volume = column(f"{start}|has_volume") > 0
+    is_platform = np.zeros(n, dtype=bool)
+
+    for window in config.windows:
+        is_window_platform = (
+            (column(_window_key(start, window, 'box_range')) <= config.box_threshold) &
+            (column(_window_key(start, window, 'ma_diff')) <= config.ma_diff_threshold) &
+            (column(_window_key(start, window, 'volatility')) <= config.volatility_threshold)
+        )
+
+        volume_ok = (
+            (column(_window_key(start, window, 'volume_change_ratio')) <= config.volume_change_threshold) &
+            (column(_window_key(start, window, 'volume_stability')) <= config.volume_stability_threshold)
+        )
+
+        if config.use_box_detection:
+            # The enhanced analysis checks volume whenever there is volume data
+            is_box = (
+                (column(_window_key(start, window, 'is_box_pattern')) > 0) &
+                (column(_window_key(start, window, 'box_quality')) >= config.box_quality_threshold) &
+                (column(_window_key(start, window, 'box_volatility')) <= config.volatility_threshold)
+            )
+            is_window_platform &= np.where(has_volume, volume_ok, True) & is_box
+        elif config.use_volume_analysis:
+            is_window_platform &= np.where(has_volume, volume_ok, True)
+
+        is_platform |= is_window_platform
+
+    if config.use_low_position:
+        if config.use_rapid_decline_detection:
+            spec = (config.high_point_lookback_days, config.decline_period_days, config.rapid_decline_days)
+            is_platform &= column(_decline_key(start, spec, 'low_decline')) >= config.decline_threshold
+            is_platform &= column(_decline_key(start, spec, 'rapid_decline')) >= config.rapid_decline_threshold
+        else:
+            spec = (config.high_point_lookback_days, config.decline_period_days)
+            is_platform &= column(_position_key(start, spec)) >= config.decline_threshold
+
+    if config.use_box_detection:
+        max_window = max(config.windows)
+        is_platform &= column(_window_key(start, max_window, 'is_box_pattern')) > 0
+
+    return is_platform
+
+
+def run_parameter_sweep(stock_list: List[Dict[str, Any]],
+                        base_config: ScanConfig,
+                        grid: Dict[str, List[Any]],
+                        update_progress: Optional[callable] = None) -> Dict[str, Any]:
+    """
+    Evaluate a grid of scan configs over a stock list.
+
+    Args:
+        stock_list: List of stocks to scan
+        base_config: Config providing the data source, system settings and
+            the values of the parameters not swept
+        grid: Mapping of parameter name to the list of values to try
+        update_progress: Optional callback for updating progress
+
+    Returns:
+        Dict with the sweep summary and, per config, the swept parameter
+        values, hit count and hit codes (in stock list order)
+    """
+    sweep_start = time.time()
+    configs = build_sweep_configs(base_config, grid)
+    now = datetime.now()
+    end_date = now.strftime('%Y-%m-%d')
+    plan = build_sweep_plan([config for _, config in configs], now)
+    fetch_start_date = min(plan)
+
+    data_source = create_data_source(
+        base_config.data_source,
+        retry_attempts=base_config.retry_attempts,
+        retry_delay=base_config.retry_delay,
+        max_staleness_days=base_config.cache_max_staleness_days
+    )
+    max_workers = base_config.max_workers
+    if data_source.is_local:
+        max_workers = max(max_workers, os.cpu_count() or 1)
+    analysis_workers = base_config.analysis_workers or os.cpu_count() or 1
+
+    print(f"{Fore.CYAN}======================================{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}Starting parameter sweep{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}======================================{Style.RESET_ALL}")
+    print(f"  - Configurations: {Fore.GREEN}{len(configs)}{Style.RESET_ALL}")
+    for name, values in grid.items():
+        print(f"    - {name}: {Fore.GREEN}{values}{Style.RESET_ALL}")
+    print(f"  - Date range: {Fore.GREEN}{fetch_start_date} to {end_date}{Style.RESET_ALL}")
+    print(f"  - Data source: {Fore.GREEN}{data_source.name}{Style.RESET_ALL}")
+    print(f"  - Stock count: {Fore.GREEN}{len(stock_list)}{Style.RESET_ALL}")
+
+    # Stage 1: load every stock once and extract its features
+    codes = [stock['code'] for stock in stock_list]
+    rows = {}
+    empty_count = 0
+    error_count = 0
+    processed = 0
+
+    with closing(run_analysis_pipeline(
+        data_source, codes, fetch_start_date, end_date,
+        extract_sweep_features, (plan,),
+        max_workers=max_workers,
+        analysis_workers=analysis_workers,
+        queue_size=base_config.pipeline_queue_size
+    )) as pipeline:
+        for stock_code, df, features, error in pipeline:
+            processed += 1
+            if df.empty:
+                empty_count += 1
+            elif error is not None:
+                error_count += 1
+                print(f"{Fore.RED}Error extracting features of {stock_code}: {error}{Style.RESET_ALL}")
+            else:
+                rows[stock_code] = features
+
+            if update_progress and (processed % 10 == 0 or processed == len(codes)):
+                update_progress(
+                    progress=int(processed / len(codes) * 90),
+                    message=f"Extracted features of {processed}/{len(codes)} stocks."
+                )
+
+    feature_time = time.time() - sweep_start
+
+    # Stage 2: evaluate every config against the feature table
+    ordered_codes = [code for code in codes if code in rows]
+    table = pd.DataFrame.from_records([rows[code] for code in ordered_codes])
+    code_array = np.array(ordered_codes, dtype=object)
+
+    results = []
+    for index, (params, config) in enumerate(configs):
+        hits = evaluate_config(table, config, _scan_start_date(config, now)) if len(table) else \
+            np.zeros(0, dtype=bool)
+        results.append({
+            'index': index,
+            'params': params,
+            'hit_count': int(hits.sum()),
+            'hits': code_array[hits].tolist()
+        })
+
+    evaluate_time = time.time() - sweep_start - feature_time
+
+    print(f"{Fore.CYAN}======================================{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}Parameter sweep completed{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}======================================{Style.RESET_ALL}")
+    print(f"  - Stocks analyzed: {Fore.GREEN}{len(ordered_codes)}{Style.RESET_ALL}")
+    print(f"  - Empty data: {Fore.YELLOW}{empty_count}{Style.RESET_ALL}")
+    print(f"  - Errors: {Fore.RED}{error_count}{Style.RESET_ALL}")
+    print(f"  - Feature extraction: {Fore.GREEN}{feature_time:.2f}s{Style.RESET_ALL}")
+    print(f"  - Evaluation of {len(configs)} configs: {Fore.GREEN}{evaluate_time:.2f}s{Style.RESET_ALL}")
+    for result in sorted(results, key=lambda r: r['hit_count'], reverse=True)[:10]:
+        print(f"    {result['hit_count']:>5} hits: {result['params']}")
+
+    if update_progress:
+        update_progress(
+            progress=100,
+            message=f"Sweep completed. Evaluated {len(configs)} configurations over {len(ordered_codes)} stocks."
+        )
+
+    return {
+        'config_count': len(configs),
+        'stock_count': len(ordered_codes),
+        'empty_count': empty_count,
+        'error_count': error_count,
+        'feature_time': round(feature_time, 3),
+        'evaluate_time': round(evaluate_time, 3),
+        'results': results
+    }
@@ -3,75 +3,338 @@ Platform Scanner module for scanning stocks for platform consolidation patterns.
 """
 import pandas as pd
 import numpy as np
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Callable, Iterator
+import os
 import time
+import queue
+import threading
+from collections import deque
+from contextlib import closing
+from functools import partial
 from datetime import datetime, timedelta
-from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from tqdm import tqdm
 from colorama import Fore, Style
 
-from .data_fetcher import fetch_kline_data, baostock_login
+from .data_source import create_data_source
 from .industry_filter import apply_industry_diversity_filter
 from .config import ScanConfig
+from .reference_data import get_reference_data
+from .universe import build_universe, universe_records
 
 # Import analyzers
 from .analyzers.price_analyzer import analyze_price
 from .analyzers.volume_analyzer import analyze_volume
 from .analyzers.combined_analyzer import analyze_stock
 from .analyzers.fundamental_analyzer import analyze_fundamentals
+from .analyzers.prefilter import prefilter_platform_candidates
 
+# Marks the end of the fetch stage in the pipeline queue
+_FETCH_DONE = object()
 
-def prepare_stock_list(stock_basics_df: pd.DataFrame,
-                       industry_df: pd.DataFrame) -> List[Dict[str, Any]]:
+# Seconds the pipeline waits for fetched data while analyses are running
+PIPELINE_POLL_INTERVAL = 0.05
+
+
+def prepare_stock_list(stock_basics_df: Optional[pd.DataFrame] = None,
+                       industry_df: Optional[pd.DataFrame] = None,
+                       code_prefixes: Optional[List[str]] = None,
+                       include_codes: Optional[List[str]] = None,
+                       exclude_codes: Optional[List[str]] = None) -> List[Dict[str, Any]]:
     """
     Prepare a list of stocks for scanning, excluding indices and merging industry data.
 
     Args:
         stock_basics_df: DataFrame containing stock basic information
+            (defaults to the cached reference data)
         industry_df: DataFrame containing industry classification
+            (defaults to the cached reference data)
+        code_prefixes: Keep only codes starting with one of these prefixes
+        include_codes: Keep only these codes
+        exclude_codes: Drop these codes
 
     Returns:
         List of dictionaries with stock information
     """
-    # Filter out indices (type=2) and non-active stocks (status=0)
-    stock_list = []
+    if stock_basics_df is None and industry_df is None:
+        # Served from the universe cached with the reference data
+        universe = get_reference_data().get_universe(code_prefixes, include_codes, exclude_codes)
+    else:
+        if stock_basics_df is None:
+            stock_basics_df = get_reference_data().get_stock_basics()
+        universe = build_universe(stock_basics_df, industry_df, code_prefixes, include_codes, exclude_codes)
+
+    return universe_records(universe)
+
+
+def _analyze_kline(df: pd.DataFrame, config: ScanConfig) -> Dict[str, Any]:
+    """Run analyze_stock with the thresholds of a scan config (analysis worker entry point)."""
+    return analyze_stock(
+        df,
+        config.windows,
+        config.box_threshold,
+        config.ma_diff_threshold,
+        config.volatility_threshold,
+        config.volume_change_threshold,
+        config.volume_stability_threshold,
+        config.volume_increase_threshold,
+        config.use_volume_analysis,
+        config.use_breakthrough_prediction,
+        config.use_window_weights,
+        config.window_weights,
+        config.use_low_position,
+        config.high_point_lookback_days,
+        config.decline_period_days,
+        config.decline_threshold,
+        config.use_rapid_decline_detection,
+        config.rapid_decline_days,
+        config.rapid_decline_threshold,
+        config.use_breakthrough_confirmation,
+        config.breakthrough_confirmation_days,
+        config.use_box_detection,
+        config.box_quality_threshold,
+        # Only platform stocks are kept, so the others can stop at the first failed check
+        full_detail=False
+    )
+
 
-    for _, row in stock_basics_df.iterrows():
-        # Skip indices and inactive stocks
-        if row['type'] == '2' or row['status'] == '0':
-            continue
+def _prefilter_klines(frames: List[pd.DataFrame], config: ScanConfig) -> np.ndarray:
+    """Run the vectorized prefilter with the thresholds of a scan config."""
+    return prefilter_platform_candidates(
+        frames,
+        config.windows,
+        config.box_threshold,
+        config.volatility_threshold,
+        config.use_low_position,
+        config.high_point_lookback_days,
+        config.decline_threshold,
+        config.use_rapid_decline_detection,
+        config.rapid_decline_threshold
+    )
 
-        stock_info = {
-            'code': row['code'],
-            'name': row['code_name'],
-            'type': row['type'],
-            'status': row['status'],
-            'industry': 'Unknown'  # Default value
-        }
 
-        # Add to list
-        stock_list.append(stock_info)
+def _build_platform_stock(stock: Dict[str, Any],
+                          df: pd.DataFrame,
+                          analysis_result: Dict[str, Any],
+                          config: ScanConfig) -> Dict[str, Any]:
+    """Create the result object of a stock that matched the platform criteria."""
+    stock_code = stock['code']
+    platform_stock = {
+        'code': stock_code,
+        'name': stock['name'],
+        'industry': stock.get('industry', 'Unknown'),
+        'platform_windows': analysis_result["platform_windows"],
+        'details': analysis_result["details"],
+        'selection_reasons': analysis_result["selection_reasons"],
+        'kline_data': df.to_dict(orient='records')
+    }
+
+    # Add mark lines if available
+    if "mark_lines" in analysis_result:
+        platform_stock['mark_lines'] = analysis_result["mark_lines"]
+        print(
+            f"{Fore.GREEN}添加标记线数据到股票 {stock_code}: {analysis_result['mark_lines']}{Style.RESET_ALL}")
+
+    # Add volume analysis results if available
+    if config.use_volume_analysis and "volume_analysis" in analysis_result:
+        platform_stock['volume_analysis'] = analysis_result["volume_analysis"]
+
+    # Add breakthrough prediction results if available
+    if config.use_breakthrough_prediction and "breakthrough_prediction" in analysis_result:
+        platform_stock['breakthrough_prediction'] = analysis_result["breakthrough_prediction"]
+
+    # Add window weight results if available
+    if config.use_window_weights and "weighted_score" in analysis_result:
+        platform_stock['weighted_score'] = analysis_result["weighted_score"]
+        platform_stock['weight_details'] = analysis_result.get(
+            "weight_details", {})
+
+    return platform_stock
+
+
+def run_analysis_pipeline(data_source,
+                          codes: List[str],
+                          start_date: str,
+                          end_date: str,
+                          analyze: Callable,
+                          args: Tuple = (),
+                          max_workers: int = 1,
+                          analysis_workers: int = 1,
+                          queue_size: int = 64,
+                          prefilter: Optional[Callable[[List[pd.DataFrame]], np.ndarray]] = None,
+                          prefilter_batch_size: int = 256) -> Iterator[Tuple[str, pd.DataFrame, Any, Optional[Exception]]]:
+    """
+    Fetch K-line data and analyze it as an overlapping pipeline.
 
-    # Add industry information if available
-    if not industry_df.empty:
-        industry_dict = dict(zip(industry_df['code'], industry_df['industry']))
-        for stock in stock_list:
-            if stock['code'] in industry_dict:
-                stock['industry'] = industry_dict[stock['code']]
+    A producer thread pulls K-line data from the data source into a bounded
+    queue and a pool of analysis worker processes consumes it, so both stages
+    overlap. Stocks without data are yielded without being analyzed. With a
+    prefilter, fetched stocks are taken from the queue in batches and only the
+    stocks the prefilter keeps are analyzed. Closing the generator early, or
+    abandoning it after an exception, stops the producer and closes the fetch
+    generator of the data source.
+
+    Args:
+        data_source: KlineDataSource to fetch from
+        codes: Stock codes
+        start_date: Start date in 'YYYY-MM-DD' format
+        end_date: End date in 'YYYY-MM-DD' format
+        analyze: Picklable function called as analyze(df, *args) in a worker process
+        args: Extra arguments for analyze
+        max_workers: Number of fetch workers
+        analysis_workers: Number of analysis worker processes
+        queue_size: Maximum fetched stocks waiting for analysis
+        prefilter: Optional function called in this process with a batch of
+            DataFrames, returning one boolean per DataFrame; False skips the
+            analysis of the stock
+        prefilter_batch_size: Maximum number of stocks per prefilter call
+
+    Yields:
+        (code, df, result, error) tuples in completion order; result is None
+        for empty data and for stocks rejected by the prefilter, and error is
+        the exception raised by analyze, if any
+    """
+    # Stage 1: a producer thread fetches K-line data into a bounded queue
+    fetch_queue = queue.Queue(maxsize=max(1, queue_size))
+    producer_errors = []
+    # Set when the consumer stops, so that the producer never blocks on a
+    # queue nobody reads any more
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                fetch_queue.put(item, timeout=PIPELINE_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        items = data_source.fetch_many(codes, start_date, end_date, max_workers)
+        try:
+            for item in items:
+                if not put(item):
+                    break
+        except Exception as e:
+            producer_errors.append(e)
+        finally:
+            # The generator runs in this thread, so it is closed here; this
+            # releases the fetch sessions and worker processes of the source
+            try:
+                items.close()
+            except Exception as e:
+                producer_errors.append(e)
+            put(_FETCH_DONE)
+
+    producer = threading.Thread(target=produce, name="scan-fetch-producer", daemon=True)
+    producer.start()
+
+    # Stage 2: analysis workers consume the queue; results are yielded as soon
+    # as each stock is done
+    fetch_done = False
+    pending = {}
+    max_pending = analysis_workers * 2
+    batch_size = max(1, prefilter_batch_size) if prefilter is not None else 1
+    # Fetched stocks waiting for an analysis worker
+    ready = deque()
+
+    analysis_pool = ProcessPoolExecutor(max_workers=analysis_workers)
+    try:
+        while not fetch_done or ready or pending:
+            # Pull a batch of fetched stocks when the analysis pool has room;
+            # block only when there is nothing else to wait for
+            batch = []
+            while not fetch_done and not ready and len(pending) < max_pending and len(batch) < batch_size:
+                try:
+                    if batch:
+                        # Take what is already waiting instead of holding the batch back
+                        item = fetch_queue.get_nowait()
+                    else:
+                        item = fetch_queue.get(timeout=PIPELINE_POLL_INTERVAL if pending else None)
+                except queue.Empty:
+                    break
+
+                if item is _FETCH_DONE:
+                    fetch_done = True
+                else:
+                    stock_code, df = item
+                    if df.empty:
+                        yield stock_code, df, None, None
+                    else:
+                        batch.append(item)
+
+            if batch:
+                keep = [True] * len(batch)
+                if prefilter is not None:
+                    try:
+                        keep = prefilter([df for _, df in batch])
+                    except Exception as e:
+                        print(f"{Fore.YELLOW}Warning: Prefilter failed, analyzing the whole batch: {e}{Style.RESET_ALL}")
+                for item, is_kept in zip(batch, keep):
+                    if is_kept:
+                        ready.append(item)
+                    else:
+                        yield item[0], item[1], None, None
+
+            while ready and len(pending) < max_pending:
+                stock_code, df = ready.popleft()
+                future = analysis_pool.submit(analyze, df, *args)
+                pending[future] = (stock_code, df)
+
+            if not pending:
+                continue
+
+            if not fetch_done and not ready and len(pending) < max_pending:
+                # Collect whatever has finished without waiting
+                timeout = 0
+            else:
+                timeout = None
+
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                stock_code, df = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    import traceback
+                    traceback.print_exc()
+                    yield stock_code, df, None, e
+                else:
+                    yield stock_code, df, result, None
+    finally:
+        # Also reached when the caller abandons the generator or a callback of
+        # the caller raises: stop the producer and release its queue slots
+        stop.set()
+        analysis_pool.shutdown(wait=True, cancel_futures=True)
+        while True:
+            try:
+                fetch_queue.get_nowait()
+            except queue.Empty:
+                break
+        producer.join()
 
-    return stock_list
+    if producer_errors:
+        raise producer_errors[0]
 
 
 def scan_stocks(stock_list: List[Dict[str, Any]],
                 config: ScanConfig,
-                update_progress: Optional[callable] = None) -> List[Dict[str, Any]]:
+                update_progress: Optional[callable] = None,
+                on_result: Optional[callable] = None) -> List[Dict[str, Any]]:
     """
     Scan stocks for platform consolidation patterns.
 
+    Fetching and analysis run as a pipeline: a producer thread pulls K-line
+    data from the data source into a bounded queue and a pool of analysis
+    worker processes consumes it, so both stages overlap.
+
     Args:
         stock_list: List of stocks to scan
         config: Scan configuration
         update_progress: Optional callback for updating progress
+        on_result: Optional callback receiving each platform stock as soon as
+            its analysis is done (before the final filters are applied)
 
     Returns:
         List of stocks that meet platform criteria
@@ -83,12 +346,28 @@ def scan_stocks(stock_list: List[Dict[str, Any]],
     start_date = (datetime.now() - timedelta(days=max_window * 2)
                   ).strftime('%Y-%m-%d')
 
+    # Create the K-line data source
+    data_source = create_data_source(
+        config.data_source,
+        retry_attempts=config.retry_attempts,
+        retry_delay=config.retry_delay,
+        max_staleness_days=config.cache_max_staleness_days
+    )
+
+    # Local reads are only bound by CPU and disk, so use every core for them
+    max_workers = config.max_workers
+    if data_source.is_local:
+        max_workers = max(max_workers, os.cpu_count() or 1)
+    analysis_workers = config.analysis_workers or os.cpu_count() or 1
+
     print(f"{Fore.CYAN}======================================{Style.RESET_ALL}")
     print(f"{Fore.CYAN}Starting stock platform scan{Style.RESET_ALL}")
     print(f"{Fore.CYAN}======================================{Style.RESET_ALL}")
     print(f"{Fore.YELLOW}Scan parameters:{Style.RESET_ALL}")
     print(
         f"  - Date range: {Fore.GREEN}{start_date} to {end_date}{Style.RESET_ALL}")
+    print(
+        f"  - Data source: {Fore.GREEN}{data_source.name}{Style.RESET_ALL}")
     print(f"  - Windows: {Fore.GREEN}{config.windows}{Style.RESET_ALL}")
     print(
         f"  - Box threshold: {Fore.GREEN}{config.box_threshold}{Style.RESET_ALL}")
@@ -119,149 +398,100 @@ def scan_stocks(stock_list: List[Dict[str, Any]],
         print(f"  - Window weights: {Fore.YELLOW}Disabled{Style.RESET_ALL}")
 
     print(
-        f"  - Max workers: {Fore.GREEN}{config.max_workers}{Style.RESET_ALL}")
+        f"  - Max workers: {Fore.GREEN}{max_workers}{Style.RESET_ALL}")
+    print(
+        f"  - Analysis workers: {Fore.GREEN}{analysis_workers}{Style.RESET_ALL}")
+    print(
+        f"  - Prefilter: {Fore.GREEN if config.use_prefilter else Fore.YELLOW}"
+        f"{'Enabled' if config.use_prefilter else 'Disabled'}{Style.RESET_ALL}")
     print(f"  - Stock count: {Fore.GREEN}{len(stock_list)}{Style.RESET_ALL}")
     print(f"{Fore.CYAN}======================================{Style.RESET_ALL}")
 
-    # Try to use ProcessPoolExecutor, fall back to ThreadPoolExecutor if needed
-    try:
-        executor_class = ProcessPoolExecutor
-        print(
-            f"{Fore.GREEN}Using ProcessPoolExecutor for concurrent data fetching{Style.RESET_ALL}")
-    except Exception as e:
-        print(
-            f"{Fore.RED}ProcessPoolExecutor initialization failed: {e}{Style.RESET_ALL}")
-        print(f"{Fore.YELLOW}Falling back to ThreadPoolExecutor{Style.RESET_ALL}")
-        executor_class = ThreadPoolExecutor
-
     # Initialize counters
     success_count = 0
     empty_count = 0
     error_count = 0
     platform_count = 0
+    prefiltered_count = 0
 
     # List to store platform stocks
     platform_stocks = []
 
-    # Use executor for concurrent processing
-    with executor_class(max_workers=config.max_workers, initializer=baostock_login) as executor:
-        # Submit tasks
-        future_to_stock = {
-            executor.submit(fetch_kline_data, s['code'], start_date, end_date,
-                            config.retry_attempts, config.retry_delay): s
-            for s in stock_list
-        }
-
-        # Create progress bar
-        total_stocks = len(future_to_stock)
-        pbar = tqdm(total=total_stocks, desc="Fetching stock data",
-                    bar_format="{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}, {rate_fmt}]")
-
-        # Process results as they complete
-        for i, future in enumerate(future_to_stock):
-            stock = future_to_stock[future]
-            stock_code = stock['code']
-            stock_name = stock['name']
-
-            try:
-                # Get K-line data
-                df = future.result()
-
-                if df.empty:
-                    empty_count += 1
-                    pbar.set_postfix(success=success_count, empty=empty_count,
-                                     error=error_count, platform=platform_count)
-                    pbar.update(1)
-                    continue
-
-                # Analyze for platform periods
-                analysis_result = analyze_stock(
-                    df,
-                    config.windows,
-                    config.box_threshold,
-                    config.ma_diff_threshold,
-                    config.volatility_threshold,
-                    config.volume_change_threshold,
-                    config.volume_stability_threshold,
-                    config.volume_increase_threshold,
-                    config.use_volume_analysis,
-                    config.use_breakthrough_prediction,
-                    config.use_window_weights,
-                    config.window_weights,
-                    config.use_low_position,
-                    config.high_point_lookback_days,
-                    config.decline_period_days,
-                    config.decline_threshold,
-                    config.use_rapid_decline_detection,
-                    config.rapid_decline_days,
-                    config.rapid_decline_threshold,
-                    config.use_breakthrough_confirmation,
-                    config.breakthrough_confirmation_days,
-                    config.use_box_detection,
-                    config.box_quality_threshold
-                )
-
-                success_count += 1
-
-                # If it's a platform stock, add to results
-                if analysis_result["is_platform"]:
-                    platform_count += 1
-
-                    # Create result object
-                    platform_stock = {
-                        'code': stock_code,
-                        'name': stock_name,
-                        'industry': stock.get('industry', 'Unknown'),
-                        'platform_windows': analysis_result["platform_windows"],
-                        'details': analysis_result["details"],
-                        'selection_reasons': analysis_result["selection_reasons"],
-                        'kline_data': df.to_dict(orient='records')
-                    }
-
-                    # Add mark lines if available
-                    if "mark_lines" in analysis_result:
-                        platform_stock['mark_lines'] = analysis_result["mark_lines"]
-                        print(
-                            f"{Fore.GREEN}添加标记线数据到股票 {stock_code}: {analysis_result['mark_lines']}{Style.RESET_ALL}")
-
-                    # Add volume analysis results if available
-                    if config.use_volume_analysis and "volume_analysis" in analysis_result:
-                        platform_stock['volume_analysis'] = analysis_result["volume_analysis"]
-
-                    # Add breakthrough prediction results if available
-                    if config.use_breakthrough_prediction and "breakthrough_prediction" in analysis_result:
-                        platform_stock['breakthrough_prediction'] = analysis_result["breakthrough_prediction"]
-
-                    # Add window weight results if available
-                    if config.use_window_weights and "weighted_score" in analysis_result:
-                        platform_stock['weighted_score'] = analysis_result["weighted_score"]
-                        platform_stock['weight_details'] = analysis_result.get(
-                            "weight_details", {})
-
-                    platform_stocks.append(platform_stock)
-
-                # Update progress
-                if update_progress and i % 10 == 0:  # Update every 10 stocks
-                    progress_pct = (i + 1) / total_stocks * 100
-                    update_progress(
-                        progress=int(progress_pct),
-                        message=f"Processed {i+1}/{total_stocks} stocks. Found {platform_count} platform stocks."
-                    )
-
-            except Exception as e:
+    # Results arrive in completion order; remember the submission order
+    stock_by_code = {s['code']: s for s in stock_list}
+    stock_order = {s['code']: i for i, s in enumerate(stock_list)}
+
+    # Create progress bar
+    total_stocks = len(stock_by_code)
+    pbar = tqdm(total=total_stocks, desc="Scanning stocks",
+                bar_format="{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}, {rate_fmt}]")
+
+    def finish_stock():
+        processed = success_count + empty_count + error_count
+        pbar.set_postfix(success=success_count, empty=empty_count,
+                         error=error_count, platform=platform_count)
+        pbar.update(1)
+        if update_progress and (processed % 10 == 0 or processed == total_stocks):
+            update_progress(
+                progress=int(processed / total_stocks * 100),
+                message=f"Processed {processed}/{total_stocks} stocks. Found {platform_count} platform stocks."
+            )
+
+    with closing(run_analysis_pipeline(
+        data_source, list(stock_by_code), start_date, end_date,
+        _analyze_kline, (config,),
+        max_workers=max_workers,
+        analysis_workers=analysis_workers,
+        queue_size=config.pipeline_queue_size,
+        prefilter=partial(_prefilter_klines, config=config) if config.use_prefilter else None,
+        prefilter_batch_size=config.prefilter_batch_size
+    )) as pipeline:
+        for stock_code, df, analysis_result, error in pipeline:
+            if df.empty:
+                empty_count += 1
+            elif error is not None:
                 error_count += 1
                 print(
-                    f"{Fore.RED}Error processing stock {stock_code}: {e}{Style.RESET_ALL}")
-                import traceback
-                traceback.print_exc()
+                    f"{Fore.RED}Error processing stock {stock_code}: {error}{Style.RESET_ALL}")
+            else:
+                platform_stock = None
+                try:
+                    success_count += 1
+
+                    if analysis_result is None:
+                        # Rejected by the prefilter without a full analysis
+                        prefiltered_count += 1
+
+                    # If it's a platform stock, add to results
+                    elif analysis_result["is_platform"]:
+                        platform_count += 1
+                        platform_stock = _build_platform_stock(
+                            stock_by_code[stock_code], df, analysis_result, config)
+                        platform_stocks.append(platform_stock)
+
+                except Exception as e:
+                    error_count += 1
+                    print(
+                        f"{Fore.RED}Error processing stock {stock_code}: {e}{Style.RESET_ALL}")
+                    import traceback
+                    traceback.print_exc()
+
+                # A failing callback loses only the early notification; the stock
+                # stays a counted platform stock in the scan result
+                if platform_stock is not None and on_result:
+                    try:
+                        on_result(platform_stock)
+                    except Exception as e:
+                        print(
+                            f"{Fore.YELLOW}Warning: Failed to publish result of stock {stock_code}: {e}{Style.RESET_ALL}")
+
+            finish_stock()
 
-            # Update progress bar
-            pbar.set_postfix(success=success_count, empty=empty_count,
-                             error=error_count, platform=platform_count)
-            pbar.update(1)
+    # Close progress bar
+    pbar.close()
 
-        # Close progress bar
-        pbar.close()
+    # Keep the stock list order so the industry diversity filter is deterministic
+    platform_stocks.sort(key=lambda s: stock_order[s['code']])
 
     # Apply fundamental analysis filter if enabled
     if config.use_fundamental_filter:
@@ -275,7 +505,8 @@ def scan_stocks(stock_list: List[Dict[str, Any]],
             liability_percentile=config.liability_percentile,
             pe_percentile=config.pe_percentile,
             pb_percentile=config.pb_percentile,
-            years_to_check=config.fundamental_years_to_check
+            years_to_check=config.fundamental_years_to_check,
+            max_workers=config.max_workers
         )
         fundamental_count = len(fundamental_filtered_stocks)
         print(f"{Fore.GREEN}Fundamental analysis complete. {fundamental_count} stocks passed out of {platform_count}.{Style.RESET_ALL}")
@@ -297,6 +528,8 @@ def scan_stocks(stock_list: List[Dict[str, Any]],
     print(
         f"Total stocks processed: {Fore.GREEN}{success_count + empty_count + error_count}{Style.RESET_ALL}")
     print(f"  - Success: {Fore.GREEN}{success_count}{Style.RESET_ALL}")
+    if config.use_prefilter:
+        print(f"    - Rejected by prefilter: {Fore.GREEN}{prefiltered_count}{Style.RESET_ALL}")
     print(f"  - Empty data: {Fore.YELLOW}{empty_count}{Style.RESET_ALL}")
     print(f"  - Errors: {Fore.RED}{error_count}{Style.RESET_ALL}")
     print(
@@ -0,0 +1,228 @@
+"""
+Reference Data module for stock basics and industry classification.
+
+Stock basics and industry classification change at most once a day, yet every
+scan used to query both from Baostock. They are now kept as Parquet files and
+in memory: data younger than REFERENCE_DATA_TTL is served as is, older data is
+still served while a background thread refreshes it, and Baostock is queried
+synchronously only when no data has been stored yet.
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import pandas as pd
+from colorama import Fore, Style
+
+from .data_fetcher import fetch_stock_basics, fetch_industry_data
+from .universe import build_universe
+
+# Seconds after which stored reference data is refreshed
+REFERENCE_DATA_TTL = 12 * 3600
+
+# Number of universes (distinct filter combinations) kept in memory
+UNIVERSE_CACHE_SIZE = 8
+
+STOCK_BASICS = 'stock_basics'
+INDUSTRY = 'industry'
+
+
+def default_reference_dir() -> str:
+    """
+    Get the default reference data directory.
+
+    Follows the same layout as the K-line store: /app/data inside the Docker
+    image, api/data otherwise.
+    """
+    if os.path.exists('/app/api'):
+        return '/app/data/cache/reference'
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'cache', 'reference')
+
+
+class ReferenceDataCache:
+    """Stale-while-revalidate cache of Baostock reference tables."""
+
+    def __init__(self, root: Optional[str] = None, ttl: float = REFERENCE_DATA_TTL,
+                 fetchers: Optional[Dict[str, Callable[[], pd.DataFrame]]] = None):
+        self.root = root or default_reference_dir()
+        self.ttl = ttl
+        self.fetchers = fetchers or {
+            STOCK_BASICS: fetch_stock_basics,
+            INDUSTRY: fetch_industry_data,
+        }
+        # name -> (file mtime, DataFrame)
+        self._frames: Dict[str, Tuple[float, pd.DataFrame]] = {}
+        self._refreshing = set()
+        # filters -> (stock basics, industry, universe)
+        self._universes: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, f"{name}.parquet")
+
+    def _load(self, name: str) -> Optional[Tuple[float, pd.DataFrame]]:
+        """Get a table and its fetch time, re-reading the file when it changed."""
+        path = self._path(name)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return None
+
+        with self._lock:
+            entry = self._frames.get(name)
+        if entry is not None and entry[0] == mtime:
+            return entry
+
+        try:
+            df = pd.read_parquet(path)
+        except Exception as e:
+            print(f"{Fore.YELLOW}Warning: Failed to read reference data {path}: {e}{Style.RESET_ALL}")
+            return None
+        entry = (mtime, df)
+        with self._lock:
+            self._frames[name] = entry
+        return entry
+
+    def _store(self, name: str, df: pd.DataFrame) -> None:
+        path = self._path(name)
+        # Write to a temporary file first so readers never see a partial file
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._frames[name] = (os.stat(path).st_mtime, df)
+
+    def refresh(self, name: str) -> pd.DataFrame:
+        """
+        Fetch a table from Baostock and store it.
+
+        Args:
+            name: STOCK_BASICS or INDUSTRY
+
+        Returns:
+            The fetched DataFrame
+        """
+        df = self.fetchers[name]()
+        self._store(name, df)
+        print(f"{Fore.GREEN}Reference data refreshed: {name} ({len(df)} rows){Style.RESET_ALL}")
+        return df
+
+    def _refresh_in_background(self, name: str) -> None:
+        with self._lock:
+            if name in self._refreshing:
+                return
+            self._refreshing.add(name)
+
+        def run():
+            try:
+                self.refresh(name)
+            except Exception as e:
+                print(f"{Fore.YELLOW}Warning: Background refresh of {name} failed, "
+                      f"keeping the stored data: {e}{Style.RESET_ALL}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(name)
+
+        threading.Thread(target=run, name=f"reference-refresh-{name}", daemon=True).start()
+
+    def get(self, name: str) -> pd.DataFrame:
+        """
+        Get a reference table.
+
+        Stored data is returned immediately; when older than the TTL it is
+        refreshed in the background. Without stored data the table is fetched
+        synchronously.
+
+        Args:
+            name: STOCK_BASICS or INDUSTRY
+
+        Returns:
+            The reference DataFrame
+        """
+        entry = self._load(name)
+        if entry is None:
+            # Only one thread fetches; the others wait and read its result
+            with self._fetch_lock:
+                entry = self._load(name)
+                if entry is None:
+                    return self.refresh(name)
+
+        fetched_at, df = entry
+        if time.time() - fetched_at > self.ttl:
+            self._refresh_in_background(name)
+        return df
+
+    def get_stock_basics(self) -> pd.DataFrame:
+        """Get the basic information of all stocks."""
+        return self.get(STOCK_BASICS)
+
+    def get_industry_data(self) -> pd.DataFrame:
+        """
+        Get the industry classification of all stocks.
+
+        Returns:
+            The industry DataFrame, or an empty DataFrame if it is not stored
+            and cannot be fetched
+        """
+        try:
+            return self.get(INDUSTRY)
+        except Exception as e:
+            print(f"{Fore.YELLOW}Warning: Failed to fetch industry data: {e}{Style.RESET_ALL}")
+            return pd.DataFrame()
+
+    def get_universe(self, code_prefixes: Optional[Iterable[str]] = None,
+                     include_codes: Optional[Iterable[str]] = None,
+                     exclude_codes: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """
+        Get the stock universe built from the cached reference tables.
+        Universes are kept until the tables they were built from are refreshed.
+
+        Args:
+            code_prefixes: Keep only codes starting with one of these prefixes
+            include_codes: Keep only these codes
+            exclude_codes: Drop these codes
+
+        Returns:
+            Universe DataFrame (see universe.build_universe)
+        """
+        stock_basics_df = self.get_stock_basics()
+        industry_df = self.get_industry_data()
+        key = (tuple(code_prefixes or ()), frozenset(include_codes or ()), frozenset(exclude_codes or ()))
+
+        with self._lock:
+            entry = self._universes.get(key)
+            if entry is not None and entry[0] is stock_basics_df and entry[1] is industry_df:
+                self._universes.move_to_end(key)
+                return entry[2]
+
+        universe = build_universe(stock_basics_df, industry_df, code_prefixes, include_codes, exclude_codes)
+        with self._lock:
+            self._universes[key] = (stock_basics_df, industry_df, universe)
+            self._universes.move_to_end(key)
+            while len(self._universes) > UNIVERSE_CACHE_SIZE:
+                self._universes.popitem(last=False)
+        return universe
+
+    def warm_up(self) -> None:
+        """Load or refresh all tables in the background, e.g. at startup."""
+        for name in self.fetchers:
+            entry = self._load(name)
+            if entry is None or time.time() - entry[0] > self.ttl:
+                self._refresh_in_background(name)
+
+
+_default_reference_data: Optional[ReferenceDataCache] = None
+_default_reference_data_lock = threading.Lock()
+
+
+def get_reference_data() -> ReferenceDataCache:
+    """Get the process-wide reference data cache at the default location."""
+    global _default_reference_data
+    with _default_reference_data_lock:
+        if _default_reference_data is None:
+            _default_reference_data = ReferenceDataCache()
+        return _default_reference_data
@@ -0,0 +1,309 @@
+"""
+Result History module for completed scan runs.
+
+Every completed scan is kept in a SQLite store keyed by task ID and completion
+time, with one row per matched stock. This replaces the data/result-YYYY-MM-DD.json
+files, which kept only the last run of each day and had to be listed, parsed
+and re-sanitized on every request: the latest run is found through an index,
+single stocks can be read without loading the whole run, and recently served
+runs are kept in memory until the database file changes.
+"""
+import os
+import re
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+from colorama import Fore, Style
+
+from .json_utils import dumps_json_str, loads_json, load_json_file
+
+# Number of runs kept in the in-memory cache
+RESULT_CACHE_SIZE = 4
+
+# Legacy per-day result files written to the data directory
+LEGACY_RESULT_PATTERN = re.compile(r"^result-(\d{4}-\d{2}-\d{2})\.json$")
+
+
+def default_history_db_path() -> str:
+    """
+    Get the default result history location.
+
+    Follows the same layout as the task store: /app/data inside the Docker
+    image, api/data otherwise.
+    """
+    if os.path.exists('/app/api'):
+        return '/app/data/results.db'
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'results.db')
+
+
+class ResultHistoryStore:
+    """SQLite-backed history of completed scan runs."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or default_history_db_path()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._cache: OrderedDict = OrderedDict()
+        self._cache_version = None
+        self._latest_id = None
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._connect()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS runs (
+                task_id TEXT PRIMARY KEY,
+                created_at REAL NOT NULL,
+                completed_at REAL NOT NULL,
+                message TEXT,
+                stock_count INTEGER NOT NULL,
+                config TEXT,
+                source TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_runs_completed ON runs (completed_at);
+            CREATE TABLE IF NOT EXISTS run_stocks (
+                task_id TEXT NOT NULL,
+                item_index INTEGER NOT NULL,
+                code TEXT NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (task_id, item_index)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_run_stocks_code ON run_stocks (code, task_id);
+        """)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get the connection of the current thread."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # --- Cache ---
+
+    def _version(self) -> tuple:
+        # With WAL, commits only touch the -wal file until the next checkpoint
+        version = []
+        for path in (self.path, f"{self.path}-wal"):
+            try:
+                stat = os.stat(path)
+                version.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                version.append(None)
+        return tuple(version)
+
+    def _check_cache(self) -> None:
+        """Drop the cache when the database changed, e.g. by another process."""
+        version = self._version()
+        if version != self._cache_version:
+            self._cache.clear()
+            self._latest_id = None
+            self._cache_version = version
+
+    # --- Writing ---
+
+    def save_run(self, task_id: str, stocks: List[Dict[str, Any]],
+                 created_at: Optional[float] = None,
+                 completed_at: Optional[float] = None,
+                 message: Optional[str] = None,
+                 config: Optional[Dict[str, Any]] = None,
+                 source: Optional[str] = None) -> None:
+        """
+        Save a completed scan run.
+
+        Args:
+            task_id: Task ID of the scan
+            stocks: Result stocks (dictionaries with at least 'code')
+            created_at: Task creation time (defaults to completed_at)
+            completed_at: Completion time (defaults to now)
+            message: Final task message
+            config: Scan configuration used
+            source: Origin of the run, e.g. an imported legacy file name
+        """
+        completed_at = completed_at or time.time()
+        created_at = created_at or completed_at
+        rows = [(task_id, index, str(stock.get('code', '')), dumps_json_str(stock))
+                for index, stock in enumerate(stocks)]
+
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM run_stocks WHERE task_id = ?", (task_id,))
+            conn.execute(
+                "INSERT OR REPLACE INTO runs (task_id, created_at, completed_at, message,"
+                " stock_count, config, source) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (task_id, created_at, completed_at, message, len(rows),
+                 dumps_json_str(config) if config is not None else None, source))
+            conn.executemany(
+                "INSERT INTO run_stocks (task_id, item_index, code, data) VALUES (?, ?, ?, ?)", rows)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def import_legacy_results(self, data_dir: str) -> int:
+        """
+        Import the legacy result-YYYY-MM-DD.json files of a directory.
+        Files already imported are skipped.
+
+        Args:
+            data_dir: Directory containing the result files
+
+        Returns:
+            Number of imported runs
+        """
+        if not os.path.isdir(data_dir):
+            return 0
+
+        imported = {row['source'] for row in self._connect().execute(
+            "SELECT source FROM runs WHERE source IS NOT NULL")}
+        count = 0
+        for filename in sorted(os.listdir(data_dir)):
+            match = LEGACY_RESULT_PATTERN.match(filename)
+            if not match or filename in imported:
+                continue
+            try:
+                file_date = datetime.strptime(match.group(1), '%Y-%m-%d')
+                content = load_json_file(os.path.join(data_dir, filename)) or {}
+            except (OSError, ValueError) as e:
+                print(f"{Fore.YELLOW}Warning: Skipping result file {filename}: {e}{Style.RESET_ALL}")
+                continue
+
+            completed_at = content.get('completed_at') or content.get('updated_at') or file_date.timestamp()
+            self.save_run(content.get('task_id') or f"legacy-{match.group(1)}",
+                          content.get('result') or [],
+                          created_at=content.get('created_at'),
+                          completed_at=completed_at,
+                          message=content.get('message'),
+                          source=filename)
+            count += 1
+
+        if count:
+            print(f"{Fore.GREEN}Imported {count} legacy result files into the result history{Style.RESET_ALL}")
+        return count
+
+    # --- Reading ---
+
+    def list_runs(self, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        List runs, newest first, without their stocks.
+
+        Args:
+            limit: Maximum number of runs
+            offset: Number of runs to skip
+
+        Returns:
+            List of run metadata
+        """
+        rows = self._connect().execute(
+            "SELECT task_id, created_at, completed_at, message, stock_count, source FROM runs"
+            " ORDER BY completed_at DESC LIMIT ? OFFSET ?", (limit, offset)).fetchall()
+        return [dict(row) for row in rows]
+
+    def latest_run_id(self) -> Optional[str]:
+        """Get the task ID of the most recently completed run."""
+        with self._lock:
+            self._check_cache()
+            if self._latest_id is None:
+                row = self._connect().execute(
+                    "SELECT task_id FROM runs ORDER BY completed_at DESC LIMIT 1").fetchone()
+                self._latest_id = row['task_id'] if row else None
+            return self._latest_id
+
+    def get_run(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a run with all its stocks, in the format of a completed task.
+        Runs are served from the in-memory cache while the database is unchanged.
+
+        Args:
+            task_id: Task ID of the run
+
+        Returns:
+            Task dictionary with the result stocks, or None if the run does not exist
+        """
+        with self._lock:
+            self._check_cache()
+            if task_id in self._cache:
+                self._cache.move_to_end(task_id)
+                return self._cache[task_id]
+
+        conn = self._connect()
+        row = conn.execute("SELECT * FROM runs WHERE task_id = ?", (task_id,)).fetchone()
+        if row is None:
+            return None
+        stocks = [loads_json(r['data']) for r in conn.execute(
+            "SELECT data FROM run_stocks WHERE task_id = ? ORDER BY item_index", (task_id,))]
+
+        run = {
+            "task_id": task_id,
+            "status": "completed",
+            "progress": 100,
+            "message": row['message'],
+            "result": stocks,
+            "error": None,
+            "created_at": row['created_at'],
+            "updated_at": row['completed_at'],
+            "completed_at": row['completed_at'],
+            "config": loads_json(row['config']) if row['config'] else None
+        }
+
+        with self._lock:
+            self._cache[task_id] = run
+            while len(self._cache) > RESULT_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return run
+
+    def get_stock(self, task_id: str, code: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a single stock of a run without loading the rest of it.
+
+        Args:
+            task_id: Task ID of the run
+            code: Stock code
+
+        Returns:
+            The result stock, or None if the run does not contain it
+        """
+        row = self._connect().execute(
+            "SELECT data FROM run_stocks WHERE task_id = ? AND code = ? LIMIT 1",
+            (task_id, code)).fetchone()
+        return loads_json(row['data']) if row else None
+
+    def get_stock_history(self, code: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Get the runs in which a stock was selected, newest first.
+
+        Args:
+            code: Stock code
+            limit: Maximum number of runs
+
+        Returns:
+            List of dictionaries with task_id, completed_at and the result stock
+        """
+        rows = self._connect().execute(
+            "SELECT s.task_id, r.completed_at, s.data FROM run_stocks s"
+            " JOIN runs r ON r.task_id = s.task_id WHERE s.code = ?"
+            " ORDER BY r.completed_at DESC LIMIT ?", (code, limit)).fetchall()
+        return [{"task_id": row['task_id'], "completed_at": row['completed_at'],
+                 "stock": loads_json(row['data'])} for row in rows]
+
+
+_default_history: Optional[ResultHistoryStore] = None
+_default_history_lock = threading.Lock()
+
+
+def get_result_history() -> ResultHistoryStore:
+    """Get the process-wide result history at the default location."""
+    global _default_history
+    with _default_history_lock:
+        if _default_history is None:
+            _default_history = ResultHistoryStore()
+        return _default_history
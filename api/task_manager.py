@@ -1,79 +1,138 @@
 """
 Task Manager module for handling long-running tasks.
-Implements a simple in-memory task queue with status tracking.
+
+Tasks are kept in a persistent SQLite store shared by every API worker process,
+so tasks survive restarts and any worker can report the status of a task
+started by another one. Task results are stored out-of-line in their own table
+and only loaded when requested; list results (such as scan results) are stored
+one row per item, so they can be read page by page.
+
+Tasks run on a bounded worker pool shared by all workers: a task is queued as
+data, a registered task kind plus its JSON arguments, and the dispatcher of any
+worker that registered the kind claims it while the number of running tasks
+across all workers stays below max_concurrent_tasks. Running tasks of a worker
+that stopped sending heartbeats are requeued, up to MAX_TASK_ATTEMPTS runs.
+Running tasks are cancelled cooperatively: their next update_task call raises
+TaskCancelledError. Finished tasks are removed after the retention age.
+
+Tasks can also publish events (such as each matched stock of a scan) that
+clients read incrementally instead of re-downloading the whole result.
 """
+import os
 import uuid
 import time
-from enum import Enum
-from typing import Dict, Any, Optional, List, Callable
+import socket
+import sqlite3
 import threading
 import traceback
+from enum import Enum
+from typing import Dict, Any, Optional, List, Callable, NamedTuple
 
 try:
-    from api.json_utils import sanitize_task_result
+    from api.json_utils import dumps_json, dumps_json_str, loads_json
 except ImportError:
     # 如果绝对导入失败，尝试相对导入（本地开发环境）
-    from .json_utils import sanitize_task_result
+    from .json_utils import dumps_json, dumps_json_str, loads_json
 
 
 class TaskStatus(Enum):
     """Enum representing the possible states of a task."""
     PENDING = "pending"
+    QUEUED = "queued"
     RUNNING = "running"
     COMPLETED = "completed"
     FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+# States a task never leaves
+TERMINAL_STATUSES = (TaskStatus.COMPLETED, TaskStatus.FAILED, TaskStatus.CANCELLED)
+
+# Maximum number of tasks running at once across all workers sharing the store
+DEFAULT_MAX_CONCURRENT_TASKS = 2
+
+# Seconds between dispatcher passes over the queued tasks
+DISPATCH_INTERVAL = 0.5
+# Seconds between worker heartbeats (and retention passes)
+HEARTBEAT_INTERVAL = 10
+# Running tasks of workers without a heartbeat for this long are requeued
+WORKER_STALE_SECONDS = 60
+# Maximum number of times a task is started before it is marked as failed
+MAX_TASK_ATTEMPTS = 3
+# Finished tasks older than this are removed (0 = keep forever)
+DEFAULT_TASK_RETENTION_SECONDS = 7 * 24 * 3600
+
+# Columns added to the tasks table after its first release
+_TASK_COLUMN_MIGRATIONS = {
+    'kind': "TEXT",
+    'payload': "TEXT",
+    'attempts': "INTEGER NOT NULL DEFAULT 0",
+}
+
+
+class TaskCancelledError(Exception):
+    """Raised inside a running task when it was cancelled or exceeded its time limit."""
+
+
+class TaskLimits(NamedTuple):
+    """Per-task resource limits."""
+    # Maximum run time in seconds (None = unlimited)
+    timeout_seconds: Optional[float] = 4 * 3600
+    # Maximum size of the serialized result in bytes (None = unlimited)
+    max_result_bytes: Optional[int] = 256 * 1024 * 1024
+
+
+def default_task_db_path() -> str:
+    """
+    Get the default task store location.
+
+    Follows the same layout as the K-line store: /app/data inside the Docker
+    image, api/data otherwise.
+    """
+    if os.path.exists('/app/api'):
+        return '/app/data/tasks.db'
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'tasks.db')
 
 
 class Task:
     """Represents a background task with status tracking."""
 
-    def __init__(self, task_id: str):
+    def __init__(self, task_id: str, result_loader: Optional[Callable[[str], Any]] = None):
         self.task_id = task_id
         self.status = TaskStatus.PENDING
-        self.result = None
         self.error = None
         self.progress = 0
         self.message = "Task initialized"
         self.created_at = time.time()
         self.updated_at = time.time()
+        self.started_at = None
         self.completed_at = None
+        self.cancel_requested = False
+        self.limits = TaskLimits()
+        self.worker_id = None
+        self.has_result = False
+        self._result_loader = result_loader
+        self._result = None
+        self._result_loaded = False
 
-    def update(self, status: Optional[TaskStatus] = None,
-               progress: Optional[int] = None,
-               message: Optional[str] = None,
-               result: Any = None,
-               error: Optional[str] = None) -> None:
-        """Update task status and details."""
-        if status:
-            self.status = status
-            if status == TaskStatus.COMPLETED or status == TaskStatus.FAILED:
-                self.completed_at = time.time()
-
-        if progress is not None:
-            self.progress = progress
-
-        if message:
-            self.message = message
-
-        if result is not None:
-            self.result = result
-
-        if error is not None:
-            self.error = error
-
-        self.updated_at = time.time()
+    @property
+    def result(self) -> Any:
+        """Task result, loaded from the result store on first access."""
+        if not self._result_loaded:
+            if self.has_result and self._result_loader:
+                self._result = self._result_loader(self.task_id)
+            self._result_loaded = True
+        return self._result
 
-    def to_dict(self) -> Dict[str, Any]:
+    def to_dict(self, include_result: bool = True) -> Dict[str, Any]:
         """Convert task to dictionary for API responses."""
-        # Sanitize result to handle NaN and Infinity values
-        sanitized_result = sanitize_task_result(self.result)
-
+        # Results are serialized NaN-safe once when they are stored
         return {
             "task_id": self.task_id,
             "status": self.status.value,
             "progress": self.progress,
             "message": self.message,
-            "result": sanitized_result,
+            "result": self.result if include_result else None,
             "error": self.error,
             "created_at": self.created_at,
             "updated_at": self.updated_at,
@@ -81,90 +140,650 @@ class Task:
         }
 
 
+class SQLiteTaskStore:
+    """SQLite-backed task store shared by all processes using the same database file."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or default_task_db_path()
+        self._local = threading.local()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._connect()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                task_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                progress INTEGER NOT NULL DEFAULT 0,
+                message TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                started_at REAL,
+                completed_at REAL,
+                cancel_requested INTEGER NOT NULL DEFAULT 0,
+                timeout_seconds REAL,
+                max_result_bytes INTEGER,
+                worker_id TEXT,
+                has_result INTEGER NOT NULL DEFAULT 0,
+                kind TEXT,
+                payload TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status);
+            CREATE TABLE IF NOT EXISTS task_results (
+                task_id TEXT PRIMARY KEY,
+                result TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS task_result_items (
+                task_id TEXT NOT NULL,
+                item_index INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (task_id, item_index)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS task_events (
+                event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                task_id TEXT NOT NULL,
+                event TEXT NOT NULL,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_task_events_task ON task_events (task_id, event_id);
+            CREATE TABLE IF NOT EXISTS workers (
+                worker_id TEXT PRIMARY KEY,
+                heartbeat_at REAL NOT NULL
+            );
+        """)
+        columns = {row['name'] for row in conn.execute("PRAGMA table_info(tasks)")}
+        for name, definition in _TASK_COLUMN_MIGRATIONS.items():
+            if name not in columns:
+                conn.execute(f"ALTER TABLE tasks ADD COLUMN {name} {definition}")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_completed_at ON tasks (completed_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get the connection of the current thread."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _row_to_task(self, row: sqlite3.Row) -> Task:
+        task = Task(row['task_id'], self.load_result)
+        task.status = TaskStatus(row['status'])
+        task.progress = row['progress']
+        task.message = row['message']
+        task.error = row['error']
+        task.created_at = row['created_at']
+        task.updated_at = row['updated_at']
+        task.started_at = row['started_at']
+        task.completed_at = row['completed_at']
+        task.cancel_requested = bool(row['cancel_requested'])
+        task.limits = TaskLimits(row['timeout_seconds'], row['max_result_bytes'])
+        task.worker_id = row['worker_id']
+        task.has_result = bool(row['has_result'])
+        return task
+
+    def insert(self, task: Task) -> None:
+        self._connect().execute(
+            "INSERT INTO tasks (task_id, status, progress, message, created_at, updated_at,"
+            " timeout_seconds, max_result_bytes, worker_id)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (task.task_id, task.status.value, task.progress, task.message,
+             task.created_at, task.updated_at, task.limits.timeout_seconds,
+             task.limits.max_result_bytes, task.worker_id))
+
+    def get(self, task_id: str) -> Optional[Task]:
+        row = self._connect().execute(
+            "SELECT * FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        return self._row_to_task(row) if row else None
+
+    def list(self) -> List[Task]:
+        rows = self._connect().execute(
+            "SELECT * FROM tasks ORDER BY created_at").fetchall()
+        return [self._row_to_task(row) for row in rows]
+
+    def update(self, task_id: str, only_active: bool = True, **fields) -> bool:
+        """
+        Update columns of a task.
+
+        Args:
+            task_id: Task ID
+            only_active: Leave tasks in a terminal state unchanged
+            **fields: Column values
+
+        Returns:
+            bool: Whether a task was updated
+        """
+        fields['updated_at'] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        sql = f"UPDATE tasks SET {assignments} WHERE task_id = ?"
+        params = list(fields.values()) + [task_id]
+        if only_active:
+            sql += f" AND status NOT IN ({', '.join('?' * len(TERMINAL_STATUSES))})"
+            params += [status.value for status in TERMINAL_STATUSES]
+        return self._connect().execute(sql, params).rowcount > 0
+
+    def save_result(self, task_id: str, payload: Optional[str] = None,
+                    items: Optional[List[str]] = None) -> None:
+        # Either a single JSON payload or one JSON payload per list item
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM task_results WHERE task_id = ?", (task_id,))
+            conn.execute("DELETE FROM task_result_items WHERE task_id = ?", (task_id,))
+            if items is None:
+                conn.execute("INSERT INTO task_results (task_id, result) VALUES (?, ?)",
+                             (task_id, payload))
+            else:
+                conn.executemany(
+                    "INSERT INTO task_result_items (task_id, item_index, data) VALUES (?, ?, ?)",
+                    ((task_id, index, item) for index, item in enumerate(items)))
+            conn.execute("UPDATE tasks SET has_result = 1 WHERE task_id = ?", (task_id,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def load_result(self, task_id: str) -> Any:
+        row = self._connect().execute(
+            "SELECT result FROM task_results WHERE task_id = ?", (task_id,)).fetchone()
+        if row:
+            return loads_json(row['result'])
+        return self.load_result_items(task_id)[1]
+
+    def load_result_items(self, task_id: str, offset: int = 0,
+                          limit: Optional[int] = None) -> tuple:
+        conn = self._connect()
+        total = conn.execute("SELECT COUNT(*) FROM task_result_items WHERE task_id = ?",
+                             (task_id,)).fetchone()[0]
+        rows = conn.execute(
+            "SELECT data FROM task_result_items WHERE task_id = ? AND item_index >= ?"
+            " ORDER BY item_index LIMIT ?",
+            (task_id, offset, -1 if limit is None else limit)).fetchall()
+        return total, [loads_json(row['data']) for row in rows]
+
+    def append_event(self, task_id: str, event: str, data: str) -> int:
+        cursor = self._connect().execute(
+            "INSERT INTO task_events (task_id, event, data) VALUES (?, ?, ?)",
+            (task_id, event, data))
+        return cursor.lastrowid
+
+    def events_after(self, task_id: str, after_id: int, limit: int) -> List[tuple]:
+        rows = self._connect().execute(
+            "SELECT event_id, event, data FROM task_events WHERE task_id = ? AND event_id > ?"
+            " ORDER BY event_id LIMIT ?", (task_id, after_id, limit)).fetchall()
+        return [(row['event_id'], row['event'], row['data']) for row in rows]
+
+    def claim_next(self, worker_id: str, max_running: int,
+                   kinds: List[str]) -> Optional[tuple]:
+        """
+        Move the oldest queued task of one of the given kinds to running if
+        fewer than max_running tasks are running.
+
+        Returns:
+            (task_id, kind, payload) of the claimed task, or None
+        """
+        if not kinds:
+            return None
+        kind_placeholders = ", ".join("?" * len(kinds))
+        conn = self._connect()
+        # Look without taking the write lock first; most passes find nothing
+        if conn.execute(
+                f"SELECT 1 FROM tasks WHERE status = ? AND kind IN ({kind_placeholders}) LIMIT 1",
+                [TaskStatus.QUEUED.value] + list(kinds)).fetchone() is None:
+            return None
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            running = conn.execute(
+                "SELECT COUNT(*) FROM tasks WHERE status = ?",
+                (TaskStatus.RUNNING.value,)).fetchone()[0]
+            row = None
+            if running < max_running:
+                row = conn.execute(
+                    f"SELECT task_id, kind, payload FROM tasks WHERE status = ?"
+                    f" AND kind IN ({kind_placeholders}) ORDER BY created_at LIMIT 1",
+                    [TaskStatus.QUEUED.value] + list(kinds)).fetchone()
+            if row is not None:
+                now = time.time()
+                conn.execute(
+                    "UPDATE tasks SET status = ?, started_at = ?, updated_at = ?, worker_id = ?,"
+                    " message = ?, attempts = attempts + 1 WHERE task_id = ?",
+                    (TaskStatus.RUNNING.value, now, now, worker_id, "Task started", row['task_id']))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        if row is None:
+            return None
+        payload = loads_json(row['payload']) if row['payload'] else {}
+        return row['task_id'], row['kind'], payload
+
+    def heartbeat(self, worker_id: str) -> None:
+        self._connect().execute(
+            "INSERT OR REPLACE INTO workers (worker_id, heartbeat_at) VALUES (?, ?)",
+            (worker_id, time.time()))
+
+    def requeue_orphaned_tasks(self, stale_seconds: float, max_attempts: int) -> int:
+        """
+        Requeue the running tasks of workers without a recent heartbeat.
+
+        The partial results and events of a requeued task are removed. Tasks
+        that were cancelled, ran max_attempts times, or were queued without a
+        task kind (and so can only run in the process that queued them) are
+        finished instead.
+
+        Returns:
+            int: Number of tasks requeued or finished
+        """
+        now = time.time()
+        terminal = ("status = ?, error = ?, message = ?, updated_at = ?, completed_at = ?")
+        orphaned = ("(worker_id IS NULL OR worker_id NOT IN"
+                    " (SELECT worker_id FROM workers WHERE heartbeat_at >= ?))")
+        running = TaskStatus.RUNNING.value
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            changed = conn.execute(
+                f"UPDATE tasks SET {terminal} WHERE status = ? AND cancel_requested = 1 AND {orphaned}",
+                (TaskStatus.CANCELLED.value, None, "Task cancelled", now, now,
+                 running, now - stale_seconds)).rowcount
+            changed += conn.execute(
+                f"UPDATE tasks SET {terminal} WHERE {orphaned} AND"
+                " ((status = ? AND (kind IS NULL OR attempts >= ?)) OR (status = ? AND kind IS NULL))",
+                (TaskStatus.FAILED.value, "Task interrupted: its worker process exited",
+                 "Task interrupted", now, now, now - stale_seconds,
+                 running, max_attempts, TaskStatus.QUEUED.value)).rowcount
+
+            task_ids = [row['task_id'] for row in conn.execute(
+                f"SELECT task_id FROM tasks WHERE status = ? AND {orphaned}",
+                (running, now - stale_seconds)).fetchall()]
+            if task_ids:
+                placeholders = ", ".join("?" * len(task_ids))
+                for table in ('task_results', 'task_result_items', 'task_events'):
+                    conn.execute(f"DELETE FROM {table} WHERE task_id IN ({placeholders})", task_ids)
+                conn.execute(
+                    "UPDATE tasks SET status = ?, progress = 0, message = ?, updated_at = ?,"
+                    " started_at = NULL, worker_id = NULL, has_result = 0"
+                    f" WHERE task_id IN ({placeholders})",
+                    [TaskStatus.QUEUED.value, "Task requeued: its worker process exited", now] + task_ids)
+                changed += len(task_ids)
+
+            conn.execute("DELETE FROM workers WHERE heartbeat_at < ?", (now - stale_seconds,))
+            conn.execute("COMMIT")
+            return changed
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def delete(self, task_ids: List[str]) -> None:
+        if not task_ids:
+            return
+        placeholders = ", ".join("?" * len(task_ids))
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(f"DELETE FROM task_results WHERE task_id IN ({placeholders})", task_ids)
+            conn.execute(f"DELETE FROM task_result_items WHERE task_id IN ({placeholders})", task_ids)
+            conn.execute(f"DELETE FROM task_events WHERE task_id IN ({placeholders})", task_ids)
+            conn.execute(f"DELETE FROM tasks WHERE task_id IN ({placeholders})", task_ids)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def finished_before(self, timestamp: float) -> List[str]:
+        rows = self._connect().execute(
+            f"SELECT task_id FROM tasks WHERE status IN ({', '.join('?' * len(TERMINAL_STATUSES))})"
+            " AND completed_at IS NOT NULL AND completed_at < ?",
+            [status.value for status in TERMINAL_STATUSES] + [timestamp]).fetchall()
+        return [row['task_id'] for row in rows]
+
+
 class TaskManager:
     """Manages background tasks and their statuses."""
     _instance = None
-    _tasks: Dict[str, Task] = {}
     _lock = threading.Lock()
 
     def __new__(cls):
         """Singleton pattern to ensure only one TaskManager exists."""
         if cls._instance is None:
             cls._instance = super(TaskManager, cls).__new__(cls)
+            cls._instance._store = None
+            cls._instance._db_path = None
+            cls._instance.max_concurrent_tasks = DEFAULT_MAX_CONCURRENT_TASKS
+            cls._instance.task_retention_seconds = DEFAULT_TASK_RETENTION_SECONDS
+            cls._instance._kinds = {}
         return cls._instance
 
-    def create_task(self) -> str:
+    def configure(self, db_path: Optional[str] = None,
+                  max_concurrent_tasks: Optional[int] = None,
+                  task_retention_seconds: Optional[float] = None) -> None:
+        """
+        Configure the task store location, the worker pool size and the age
+        after which finished tasks are removed (0 keeps them forever).
+        Must be called before the first task is created.
+        """
+        with self._lock:
+            if db_path is not None:
+                self._db_path = db_path
+                self._store = None
+            if max_concurrent_tasks is not None:
+                self.max_concurrent_tasks = max(1, max_concurrent_tasks)
+            if task_retention_seconds is not None:
+                self.task_retention_seconds = max(0, task_retention_seconds)
+
+    @property
+    def store(self) -> SQLiteTaskStore:
+        """Task store, opened on first use."""
+        with self._lock:
+            if self._store is None:
+                self._store = SQLiteTaskStore(self._db_path)
+                self._worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+                self._wakeup = threading.Event()
+                self._dispatcher = None
+                self._store.heartbeat(self._worker_id)
+                self._store.requeue_orphaned_tasks(WORKER_STALE_SECONDS, MAX_TASK_ATTEMPTS)
+            return self._store
+
+    def register_task_kind(self, kind: str, func: Callable) -> None:
+        """
+        Register the function that runs the tasks of a kind.
+
+        Every worker process sharing the store must register the same kinds,
+        since any of them may claim a queued task.
+
+        Args:
+            kind: Task kind name
+            func: Function called as func(task_id, **payload) on a worker thread
+        """
+        with self._lock:
+            self._kinds[kind] = func
+
+    def create_task(self, limits: Optional[TaskLimits] = None) -> str:
         """Create a new task and return its ID."""
         task_id = str(uuid.uuid4())
-        with self._lock:
-            self._tasks[task_id] = Task(task_id)
+        task = Task(task_id)
+        task.limits = limits or TaskLimits()
+        store = self.store
+        task.worker_id = self._worker_id
+        store.insert(task)
         return task_id
 
     def get_task(self, task_id: str) -> Optional[Task]:
         """Get a task by its ID."""
-        with self._lock:
-            return self._tasks.get(task_id)
+        return self.store.get(task_id)
 
-    def update_task(self, task_id: str, **kwargs) -> None:
-        """Update a task's status and details."""
-        with self._lock:
-            task = self._tasks.get(task_id)
-            if task:
-                task.update(**kwargs)
+    def update_task(self, task_id: str,
+                    status: Optional[TaskStatus] = None,
+                    progress: Optional[int] = None,
+                    message: Optional[str] = None,
+                    result: Any = None,
+                    error: Optional[str] = None) -> None:
+        """
+        Update a task's status and details.
 
-    def run_task_in_background(self, task_id: str, func: Callable, *args, **kwargs) -> None:
-        """Run a function in a background thread and track its status."""
-        def wrapper():
-            task = self.get_task(task_id)
-            if not task:
-                return
+        Tasks in a terminal state are left unchanged. When called for a running
+        task that was cancelled or ran past its time limit, TaskCancelledError
+        is raised so the task stops at its next progress update.
+
+        Raises:
+            TaskCancelledError: If the task should stop
+            ValueError: If the result exceeds the task's result size limit
+        """
+        store = self.store
+        task = store.get(task_id)
+        if task is None or task.status in TERMINAL_STATUSES:
+            return
+
+        if status == TaskStatus.FAILED and task.cancel_requested:
+            # The task failed because it was stopped on request
+            status, message, error = TaskStatus.CANCELLED, "Task cancelled", None
+        elif task.status == TaskStatus.RUNNING and status not in TERMINAL_STATUSES:
+            if task.cancel_requested:
+                raise TaskCancelledError("Task cancelled")
+            timeout = task.limits.timeout_seconds
+            if timeout and task.started_at and time.time() - task.started_at > timeout:
+                raise TaskCancelledError(f"Task exceeded its time limit of {timeout:g} seconds")
+
+        if result is not None:
+            # Serialize once in a single NaN-safe pass; reads return the stored
+            # JSON as is. List items are serialized separately so they can be paged
+            if isinstance(result, list):
+                encoded = [dumps_json(item) for item in result]
+                size = sum(len(item) for item in encoded)
+                payload, items = None, [item.decode('utf-8') for item in encoded]
+            else:
+                encoded = dumps_json(result)
+                size = len(encoded)
+                payload, items = encoded.decode('utf-8'), None
+            max_bytes = task.limits.max_result_bytes
+            if max_bytes and size > max_bytes:
+                raise ValueError(
+                    f"Task result of {size} bytes exceeds the limit of {max_bytes} bytes")
+            store.save_result(task_id, payload, items)
+
+        fields = {}
+        if status:
+            fields['status'] = status.value
+            if status in TERMINAL_STATUSES:
+                fields['completed_at'] = time.time()
+        if progress is not None:
+            fields['progress'] = progress
+        if message:
+            fields['message'] = message
+        if error is not None:
+            fields['error'] = error
+        store.update(task_id, **fields)
+
+    def get_result_page(self, task_id: str, offset: int = 0, limit: int = 50,
+                        fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Get a page of a list result without loading the rest of it.
+
+        Args:
+            task_id: Task ID
+            offset: Index of the first item
+            limit: Maximum number of items
+            fields: Keys to keep in each item (None = all keys)
+
+        Returns:
+            Dictionary with total, offset, limit and items, or None if the
+            task does not exist
+        """
+        task = self.store.get(task_id)
+        if task is None:
+            return None
 
-            self.update_task(task_id, status=TaskStatus.RUNNING,
-                             message="Task started")
+        total, items = self.store.load_result_items(task_id, offset, limit)
+        if fields:
+            items = [{key: item[key] for key in fields if key in item} for item in items]
+
+        return {
+            "task_id": task_id,
+            "status": task.status.value,
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+            "items": items
+        }
+
+    def publish_event(self, task_id: str, event: str, data: Any) -> int:
+        """
+        Append an event to the event stream of a task.
+
+        Events are serialized NaN-safe once here; stream readers send the
+        stored JSON as is.
+
+        Args:
+            task_id: Task ID
+            event: Event name (e.g., 'match')
+            data: JSON-serializable event data
+
+        Returns:
+            int: Event ID, increasing within the store
+        """
+        payload = dumps_json_str(data)
+        return self.store.append_event(task_id, event, payload)
+
+    def get_events(self, task_id: str, after_id: int = 0, limit: int = 500) -> List[tuple]:
+        """
+        Get the events of a task published after an event ID.
+
+        Returns:
+            List of (event_id, event, JSON data) tuples in publishing order
+        """
+        return self.store.events_after(task_id, after_id, limit)
+
+    def cancel_task(self, task_id: str) -> bool:
+        """
+        Cancel a task.
+
+        Queued tasks are cancelled right away; running tasks stop at their next
+        progress update.
+
+        Returns:
+            bool: Whether the task was still active
+        """
+        store = self.store
+        task = store.get(task_id)
+        if task is None or task.status in TERMINAL_STATUSES:
+            return False
+
+        if task.status == TaskStatus.RUNNING:
+            return store.update(task_id, cancel_requested=1, message="Cancellation requested")
+
+        now = time.time()
+        cancelled = store.update(task_id, status=TaskStatus.CANCELLED.value,
+                                 message="Task cancelled", completed_at=now)
+        if not cancelled:
+            # The task was claimed in the meantime
+            return store.update(task_id, cancel_requested=1, message="Cancellation requested")
+        return True
+
+    def run_task_in_background(self, task_id: str, kind: str, **payload) -> None:
+        """
+        Queue a task to run on the bounded worker pool and track its status.
+
+        The task is stored as its kind and JSON arguments, so the dispatcher of
+        any worker can claim it, and it is requeued if that worker exits. The
+        task's status becomes queued until a worker slot is free. If the
+        function returns without completing the task itself, the task is marked
+        as completed with the return value as its result.
+
+        Args:
+            task_id: Task ID
+            kind: Task kind registered with register_task_kind
+            **payload: JSON-serializable keyword arguments of the task function
+
+        Raises:
+            ValueError: If the task kind is not registered
+        """
+        if kind not in self._kinds:
+            raise ValueError(f"Unknown task kind '{kind}'")
+        self.store.update(task_id, status=TaskStatus.QUEUED.value, message="Task queued",
+                          kind=kind, payload=dumps_json_str(payload), worker_id=None)
+        self.start_dispatcher()
+        self._wakeup.set()
+
+    def start_dispatcher(self) -> None:
+        """Start the dispatcher thread of this process if it is not running."""
+        # Opening the store sets up the worker ID and the dispatcher state
+        self.store
+        with self._lock:
+            if self._dispatcher is None or not self._dispatcher.is_alive():
+                self._dispatcher = threading.Thread(
+                    target=self._dispatch_loop, name="task-dispatcher", daemon=True)
+                self._dispatcher.start()
+
+    def _dispatch_loop(self) -> None:
+        """
+        Start queued tasks while worker slots are free; keep the worker
+        heartbeat and remove old finished tasks.
+        """
+        last_heartbeat = 0.0
+        while True:
+            self._wakeup.wait(DISPATCH_INTERVAL)
+            self._wakeup.clear()
 
             try:
-                result = func(*args, **kwargs)
-                self.update_task(
-                    task_id,
-                    status=TaskStatus.COMPLETED,
-                    result=result,
-                    progress=100,
-                    message="Task completed successfully"
-                )
+                now = time.time()
+                if now - last_heartbeat >= HEARTBEAT_INTERVAL:
+                    self.store.heartbeat(self._worker_id)
+                    self.store.requeue_orphaned_tasks(WORKER_STALE_SECONDS, MAX_TASK_ATTEMPTS)
+                    if self.task_retention_seconds:
+                        self.clean_old_tasks(self.task_retention_seconds)
+                    last_heartbeat = now
+
+                while True:
+                    with self._lock:
+                        kinds = dict(self._kinds)
+                    claimed = self.store.claim_next(
+                        self._worker_id, self.max_concurrent_tasks, list(kinds))
+                    if claimed is None:
+                        break
+                    task_id, kind, payload = claimed
+                    thread = threading.Thread(target=self._run_task, name=f"task-{task_id[:8]}",
+                                              args=(task_id, kinds[kind], payload), daemon=True)
+                    thread.start()
             except Exception as e:
-                error_msg = f"Task failed: {str(e)}"
-                error_traceback = traceback.format_exc()
-                self.update_task(
-                    task_id,
-                    status=TaskStatus.FAILED,
-                    error=f"{error_msg}\n{error_traceback}",
-                    message=error_msg
-                )
-
-        # Start the background thread
-        thread = threading.Thread(target=wrapper)
-        thread.daemon = True  # Allow the thread to be terminated when the main process exits
-        thread.start()
-
-    def clean_old_tasks(self, max_age_seconds: int = 3600) -> None:
-        """Remove tasks older than the specified age."""
-        current_time = time.time()
-        with self._lock:
-            task_ids_to_remove = []
-            for task_id, task in self._tasks.items():
-                # Remove completed or failed tasks that are older than max_age_seconds
-                if (task.status in (TaskStatus.COMPLETED, TaskStatus.FAILED) and
-                    task.completed_at and
-                        current_time - task.completed_at > max_age_seconds):
-                    task_ids_to_remove.append(task_id)
+                print(f"Task dispatcher error: {e}")
+                traceback.print_exc()
+
+    def _run_task(self, task_id: str, func: Callable, payload: Dict[str, Any]) -> None:
+        """Run a claimed task and record how it ended."""
+        try:
+            result = func(task_id, **payload)
+            task = self.get_task(task_id)
+            if task and task.status not in TERMINAL_STATUSES:
+                if task.cancel_requested:
+                    self._finish_cancelled(task_id, "Task cancelled")
+                else:
+                    self.update_task(
+                        task_id,
+                        status=TaskStatus.COMPLETED,
+                        result=result,
+                        progress=100,
+                        message="Task completed successfully"
+                    )
+        except TaskCancelledError as e:
+            self._finish_cancelled(task_id, str(e))
+        except Exception as e:
+            error_msg = f"Task failed: {str(e)}"
+            error_traceback = traceback.format_exc()
+            self.update_task(
+                task_id,
+                status=TaskStatus.FAILED,
+                error=f"{error_msg}\n{error_traceback}",
+                message=error_msg
+            )
+        finally:
+            # A worker slot is free again
+            self._wakeup.set()
+
+    def _finish_cancelled(self, task_id: str, reason: str) -> None:
+        task = self.get_task(task_id)
+        if task is None or task.status in TERMINAL_STATUSES:
+            return
+        # Tasks stopped by their time limit failed; the others were cancelled
+        status = TaskStatus.CANCELLED if task.cancel_requested else TaskStatus.FAILED
+        self.store.update(task_id, status=status.value, message=reason,
+                          error=None if status == TaskStatus.CANCELLED else reason,
+                          completed_at=time.time())
 
-            for task_id in task_ids_to_remove:
-                del self._tasks[task_id]
+    def clean_old_tasks(self, max_age_seconds: float = DEFAULT_TASK_RETENTION_SECONDS) -> None:
+        """Remove finished tasks that completed longer ago than the specified age."""
+        store = self.store
+        store.delete(store.finished_before(time.time() - max_age_seconds))
 
     def get_all_tasks(self) -> List[Dict[str, Any]]:
-        """Get all tasks as dictionaries."""
-        with self._lock:
-            return [task.to_dict() for task in self._tasks.values()]
+        """Get all tasks as dictionaries (without their results)."""
+        return [task.to_dict(include_result=False) for task in self.store.list()]
 
 
 # Create a singleton instance
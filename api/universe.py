@@ -0,0 +1,97 @@
+"""
+Universe module for building the set of stocks a scan or fetch covers.
+
+The universe is built from the stock basics and industry classification tables
+with vectorized DataFrame operations: indices and inactive stocks are dropped,
+optional code prefix, include and exclude filters are applied, and the industry
+is joined by code. The result is a compact DataFrame with one row per stock
+(categorical type, status and industry columns).
+"""
+from typing import List, Dict, Any, Optional, Iterable
+
+import pandas as pd
+
+# Shanghai main board, Shenzhen main board and ChiNext
+MAIN_BOARD_PREFIXES = ('sh.60', 'sz.00', 'sz.30')
+
+# Columns of a universe, in the order of the stock dictionaries used by scans
+UNIVERSE_COLUMNS = ['code', 'name', 'type', 'status', 'industry']
+
+# Industry of stocks without an industry classification
+UNKNOWN_INDUSTRY = 'Unknown'
+
+# Baostock stock type of indices and status of inactive stocks
+INDEX_TYPE = '2'
+INACTIVE_STATUS = '0'
+
+
+def build_universe(stock_basics_df: pd.DataFrame,
+                   industry_df: Optional[pd.DataFrame] = None,
+                   code_prefixes: Optional[Iterable[str]] = None,
+                   include_codes: Optional[Iterable[str]] = None,
+                   exclude_codes: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """
+    Build a stock universe from the reference tables.
+
+    Args:
+        stock_basics_df: DataFrame containing stock basic information
+        industry_df: DataFrame containing industry classification (optional)
+        code_prefixes: Keep only codes starting with one of these prefixes,
+            e.g. MAIN_BOARD_PREFIXES (default: all codes)
+        include_codes: Keep only these codes (default: all codes)
+        exclude_codes: Drop these codes
+
+    Returns:
+        DataFrame with UNIVERSE_COLUMNS, one row per stock in basics order
+    """
+    if stock_basics_df is None or stock_basics_df.empty:
+        return _empty_universe()
+
+    codes = stock_basics_df['code'].astype(str)
+    types = stock_basics_df['type'].astype(str)
+    statuses = stock_basics_df['status'].astype(str)
+
+    mask = (types != INDEX_TYPE) & (statuses != INACTIVE_STATUS)
+    prefixes = tuple(code_prefixes or ())
+    if prefixes:
+        mask &= codes.str.startswith(prefixes)
+    if include_codes:
+        mask &= codes.isin(list(include_codes))
+    if exclude_codes:
+        mask &= ~codes.isin(list(exclude_codes))
+
+    universe = pd.DataFrame({
+        'code': codes[mask].to_numpy(dtype=object),
+        'name': stock_basics_df.loc[mask, 'code_name'].to_numpy(dtype=object),
+        'type': types[mask].to_numpy(dtype=object),
+        'status': statuses[mask].to_numpy(dtype=object),
+    })
+
+    industry = pd.Series(UNKNOWN_INDUSTRY, index=universe.index, dtype=object)
+    if industry_df is not None and not industry_df.empty:
+        # The last classification of a code wins, as with a dict built from the rows
+        mapping = (industry_df.drop_duplicates('code', keep='last')
+                   .set_index('code')['industry'])
+        matched = universe['code'].map(mapping)
+        industry = matched.where(universe['code'].isin(mapping.index), industry)
+    universe['industry'] = industry
+
+    return universe.astype({'type': 'category', 'status': 'category', 'industry': 'category'})
+
+
+def _empty_universe() -> pd.DataFrame:
+    return pd.DataFrame({column: pd.Series(dtype=object) for column in UNIVERSE_COLUMNS})
+
+
+def universe_records(universe: pd.DataFrame) -> List[Dict[str, Any]]:
+    """
+    Convert a universe to the list of stock dictionaries used by scans.
+
+    Args:
+        universe: Universe DataFrame from build_universe
+
+    Returns:
+        List of dictionaries with code, name, type, status and industry
+    """
+    columns = [universe[column].astype(object).tolist() for column in UNIVERSE_COLUMNS]
+    return [dict(zip(UNIVERSE_COLUMNS, values)) for values in zip(*columns)]